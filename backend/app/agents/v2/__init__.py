@@ -10,7 +10,9 @@ PeerPortal AI智能体架构 v2.0
 __version__ = "2.0.0"
 __author__ = "PeerPortal Team"
 
-# 导入核心组件
+import importlib
+
+# 导入核心组件（轻量：异常与工具函数）
 from .core_infrastructure.error.exceptions import (
     PlatformException, LLMException, MemoryException, 
     RAGException, AgentException, OSSException
@@ -18,22 +20,35 @@ from .core_infrastructure.error.exceptions import (
 from .core_infrastructure.utils.helpers import (
     generate_unique_id, generate_session_id, get_current_timestamp
 )
-from .core_infrastructure.oss.storage_manager import storage_manager
+from app.core.deadline import DeadlineExceeded
 
-from .ai_foundation.llm.manager import llm_manager, embedding_manager
-from .ai_foundation.memory.memory_bank import memory_bank
-from .ai_foundation.agents.agent_factory import agent_factory
-from .data_communication.rag.rag_manager import rag_manager
+# 依赖 langchain / langgraph / 外部客户端的组件按需加载：
+# 首次访问 app.agents.v2.<名称> 时才导入对应模块，仅使用 CRUD 路由的进程不会加载 AI 依赖
+_LAZY_EXPORTS = {
+    "storage_manager": ".core_infrastructure.oss.storage_manager",
+    "llm_manager": ".ai_foundation.llm.manager",
+    "embedding_manager": ".ai_foundation.llm.manager",
+    "memory_bank": ".ai_foundation.memory.memory_bank",
+    "agent_factory": ".ai_foundation.agents.agent_factory",
+    "rag_manager": ".data_communication.rag.rag_manager",
+    "config_manager": ".config",
+    "init_v2_from_settings": ".config",
+    "init_v2_from_env": ".config",
+    "find_mentors_tool": ".tools.study_tools",
+    "find_services_tool": ".tools.study_tools",
+    "get_platform_stats_tool": ".tools.study_tools",
+    "web_search_tool": ".tools.study_tools",
+}
 
-from .config import config_manager, init_v2_from_settings, init_v2_from_env
 
-# 导入原有工具功能
-from .tools.study_tools import (
-    find_mentors_tool,
-    find_services_tool, 
-    get_platform_stats_tool,
-    web_search_tool
-)
+def __getattr__(name: str):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
 
 # 智能体类型枚举
 from enum import Enum
@@ -82,6 +97,7 @@ class StudyPlannerAgent:
     
     def _initialize(self):
         """初始化智能体"""
+        from .ai_foundation.agents.agent_factory import agent_factory
         try:
             self.agent_executor = agent_factory.get_agent_executor(self.config)
         except Exception as e:
@@ -89,6 +105,7 @@ class StudyPlannerAgent:
     
     async def execute(self, query: str) -> str:
         """执行留学规划查询"""
+        from .ai_foundation.memory.memory_bank import memory_bank
         try:
             if not self.agent_executor:
                 raise AgentException("智能体未正确初始化", tenant_id=self.tenant_id)
@@ -143,6 +160,8 @@ class StudyPlannerAgent:
             
             return response
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise AgentException(f"留学规划师执行失败: {e}", tenant_id=self.tenant_id, agent_type="study_planner")
 
@@ -163,6 +182,7 @@ class StudyConsultantAgent:
     
     def _initialize(self):
         """初始化智能体"""
+        from .ai_foundation.agents.agent_factory import agent_factory
         try:
             self.agent_executor = agent_factory.get_agent_executor(self.config)
         except Exception as e:
@@ -199,6 +219,8 @@ class StudyConsultantAgent:
             
             return response
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise AgentException(f"留学咨询师执行失败: {e}", tenant_id=self.tenant_id, agent_type="study_consultant")
 
@@ -8,6 +8,8 @@ from enum import Enum
 import logging
 
 from langgraph.graph import StateGraph
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded, deadline_scope, with_deadline
 from ...core_infrastructure.error.exceptions import AgentException, ErrorCode
 
 
@@ -167,6 +169,8 @@ class AgentExecutor:
             
             return state
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise AgentException(
                 error_code=ErrorCode.AGENT_EXECUTION_ERROR,
@@ -225,9 +229,9 @@ class AgentExecutor:
                 tool_name = tool_call.get("name")
                 tool_args = tool_call.get("arguments", {})
                 
-                # 获取并执行工具
+                # 获取并执行工具（不超过请求剩余时间）
                 tool_func = self.tool_registry.get_tool(tool_name)
-                result = await tool_func(**tool_args)
+                result = await with_deadline(tool_func(**tool_args))
                 
                 # 添加工具结果到上下文
                 if "tool_results" not in state.context:
@@ -243,6 +247,8 @@ class AgentExecutor:
             state.tool_calls = []
             return state
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise AgentException(
                 error_code=ErrorCode.AGENT_TOOL_ERROR,
@@ -278,6 +284,8 @@ class AgentExecutor:
             
             return state
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise AgentException(
                 error_code=ErrorCode.AGENT_EXECUTION_ERROR,
@@ -366,7 +374,7 @@ class AgentExecutor:
         return "\n".join(formatted)
     
     async def execute(self, user_input: str, context: Dict[str, Any] = None) -> str:
-        """执行智能体"""
+        """执行智能体，整体耗时不超过 AGENT_TIMEOUT_SECONDS（请求截止时间更早时以请求为准）"""
         try:
             # 初始化状态
             initial_state = AgentState(
@@ -377,11 +385,14 @@ class AgentExecutor:
             )
             
             # 执行状态图
-            final_state = await self.graph.ainvoke(initial_state)
+            with deadline_scope(settings.AGENT_TIMEOUT_SECONDS):
+                final_state = await with_deadline(self.graph.ainvoke(initial_state))
             
             # LangGraph 返回的是字典，需要正确访问 final_response
             return final_state.get("final_response", "抱歉，我无法处理您的请求。")
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise AgentException(
                 error_code=ErrorCode.AGENT_EXECUTION_ERROR,
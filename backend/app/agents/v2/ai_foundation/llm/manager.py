@@ -9,6 +9,7 @@ from enum import Enum
 import time
 import logging
 
+from app.core.deadline import DeadlineExceeded, with_deadline
 from ...core_infrastructure.error.exceptions import LLMException, ErrorCode
 from .providers.base_provider import LLMResponse
 
@@ -39,7 +40,7 @@ class ModelConfig:
     base_url: Optional[str] = None
     max_tokens: int = 4096
     temperature: float = 0.7
-    timeout: int = 30
+    timeout: int = 30  # 单次调用超时（秒），请求截止时间更早时按剩余时间
     rate_limit: int = 60  # requests per minute
     enabled: bool = True
 
@@ -100,9 +101,12 @@ class LLMManager:
             # 检查速率限制
             await self._check_rate_limit(tenant_id, model_name)
             
-            # 获取提供商并调用
+            # 获取提供商并调用（不超过模型超时与请求剩余时间）
             provider = self.providers[model_name]
-            response = await provider.chat(messages, model=model_name, **kwargs)
+            response = await with_deadline(
+                provider.chat(messages, model=model_name, **kwargs),
+                default=self.models[model_name].timeout
+            )
             
             # 记录使用统计
             latency = time.time() - start_time
@@ -118,8 +122,14 @@ class LLMManager:
                 tool_calls=response.tool_calls
             )
             
-        except LLMException:
+        except (LLMException, DeadlineExceeded):
             raise
+        except asyncio.TimeoutError:
+            raise LLMException(
+                message=f"模型调用超时: {model_name}",
+                tenant_id=tenant_id,
+                model_name=model_name
+            )
         except Exception as e:
             raise LLMException(
                 error_code=ErrorCode.LLM_PROVIDER_ERROR,
@@ -146,7 +156,14 @@ class LLMManager:
             await self._check_rate_limit(tenant_id, model_name)
             
             provider = self.providers[model_name]
-            async for chunk in provider.stream_chat(messages, model=model_name, **kwargs):
+            stream = provider.stream_chat(messages, model=model_name, **kwargs)
+            timeout = self.models[model_name].timeout
+            while True:
+                # 每个数据块的等待时间都不超过模型超时与请求剩余时间
+                try:
+                    chunk = await with_deadline(stream.__anext__(), default=timeout)
+                except StopAsyncIteration:
+                    break
                 yield StreamChunk(
                     content=chunk.content,
                     delta=chunk.delta,
@@ -154,8 +171,14 @@ class LLMManager:
                     usage=chunk.usage
                 )
                 
-        except LLMException:
+        except (LLMException, DeadlineExceeded):
             raise
+        except asyncio.TimeoutError:
+            raise LLMException(
+                message=f"流式调用超时: {model_name}",
+                tenant_id=tenant_id,
+                model_name=model_name
+            )
         except Exception as e:
             raise LLMException(
                 error_code=ErrorCode.LLM_PROVIDER_ERROR,
@@ -235,9 +258,14 @@ class EmbeddingManager:
                 )
             
             provider = self.providers[model_name]
-            embeddings = await provider.embed_texts(texts, model=model_name)
+            embeddings = await with_deadline(
+                provider.embed_texts(texts, model=model_name),
+                default=self.models[model_name].timeout
+            )
             return embeddings
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise LLMException(
                 error_code=ErrorCode.LLM_PROVIDER_ERROR,
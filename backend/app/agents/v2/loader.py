@@ -0,0 +1,108 @@
+"""
+v2.0 智能体系统的按需初始化
+应用启动时不再同步初始化智能体系统（导入 langchain / langgraph、创建模型与外部服务客户端），
+而是在后台预热任务或第一次使用智能体接口时初始化，并发调用共享同一次初始化。
+本模块不导入任何 AI 依赖，可以在 CRUD 路由与 lifespan 中直接使用。
+"""
+import asyncio
+import logging
+import sys
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_init_task: Optional[asyncio.Task] = None
+
+
+def is_loaded() -> bool:
+    """智能体系统模块是否已经导入（未导入时说明进程尚未使用过 AI 功能）"""
+    return "app.agents.v2.config" in sys.modules
+
+
+def is_ready() -> bool:
+    """智能体系统是否已初始化完成"""
+    if not is_loaded():
+        return False
+    from app.agents.v2.config import config_manager
+    return config_manager.is_initialized
+
+
+async def _initialize() -> bool:
+    logger.info("🤖 正在初始化AI智能体系统 v2.0...")
+    try:
+        from app.agents.v2.config import init_v2_from_settings, config_manager
+
+        logger.info("📦 导入v2配置模块成功")
+        logger.info(f"🔑 API密钥已配置: {'是' if settings.OPENAI_API_KEY else '否'}")
+
+        success = await init_v2_from_settings(settings)
+        logger.info(f"🎯 v2初始化结果: {success}")
+
+        if success:
+            status = config_manager.get_config_status()
+            logger.info(f"📊 配置状态: {status}")
+            logger.info("✅ AI智能体系统 v2.0 初始化成功")
+            logger.info("🤖 可用智能体: 留学规划师, 留学咨询师")
+        else:
+            logger.warning("⚠️ AI智能体系统 v2.0 初始化失败，将在下次使用时重试")
+        return success
+
+    except Exception as e:
+        logger.error(f"❌ AI智能体系统 v2.0 初始化异常: {e}", exc_info=True)
+        return False
+
+
+def _start() -> asyncio.Task:
+    global _init_task
+    if _init_task is None or (_init_task.done() and (_init_task.cancelled() or not _init_task.result())):
+        # 首次初始化，或上次初始化失败后重试
+        _init_task = asyncio.get_running_loop().create_task(_initialize())
+    return _init_task
+
+
+async def ensure_initialized() -> bool:
+    """
+    确保智能体系统已初始化，返回是否可用
+    初始化在独立任务中进行：等待它的请求被取消（如请求超时）不会中断初始化本身
+    """
+    if is_ready():
+        return True
+    return await asyncio.shield(_start())
+
+
+def start_warmup() -> Optional[asyncio.Task]:
+    """在后台预热智能体系统（lifespan 启动时调用），AI_WARMUP_ON_STARTUP=false 时跳过，首次使用时再初始化"""
+    if not settings.AI_WARMUP_ON_STARTUP:
+        logger.info("跳过AI智能体系统预热，将在首次使用时初始化")
+        return None
+    return _start()
+
+
+async def stop_warmup() -> None:
+    """应用关闭时取消尚未完成的预热任务"""
+    global _init_task
+    if _init_task is not None and not _init_task.done():
+        _init_task.cancel()
+        try:
+            await _init_task
+        except (asyncio.CancelledError, Exception):
+            pass
+    _init_task = None
+
+
+def get_status() -> Dict[str, Any]:
+    """智能体系统状态；尚未导入时不会为了查询状态而加载 AI 依赖"""
+    if is_loaded():
+        from app.agents.v2.config import config_manager
+        status = config_manager.get_config_status()
+    else:
+        status = {
+            "is_initialized": False,
+            "config_loaded": False,
+            "debug_mode": None,
+            "external_services": {"redis": False, "milvus": False, "mongodb": False, "elasticsearch": False},
+        }
+    status["initializing"] = _init_task is not None and not _init_task.done()
+    return status
@@ -2,6 +2,7 @@
 留学规划和咨询工具集
 融合并改进了原有agents的工具功能
 """
+import asyncio
 import logging
 from typing import List, Dict, Any, Optional
 from langchain.tools import tool
@@ -48,19 +49,33 @@ async def find_mentors_tool(university: str = None, major: str = None, degree_le
             return "🔍 未在平台上找到任何引路人。建议您稍后再试或联系平台客服。"
         
         mentor_ids = [user['id'] for user in users_response]
+        users_by_id = {user['id']: user for user in users_response}
+        
+        # 一次请求查询所有引路人的详细资料（mentor_id=in.(...)），避免逐个查询
+        profiles_response = await supabase_client.select(
+            table="mentorship_relationships",
+            columns="*",
+            filters={"mentor_id": mentor_ids},
+            order="id.asc"
+        )
+        profiles_by_mentor = {}
+        for profile in profiles_response or []:
+            profiles_by_mentor.setdefault(profile['mentor_id'], profile)
+        
+        # 语义相似度：导师资料与检索条件最相近的 top-k 名导师（一次向量检索，嵌入不可用时为空）
+        semantic = {}
+        query_text = " ".join(filter(None, [university, major, degree_level]))
+        if query_text:
+            from app.core.mentor_embeddings import mentor_embeddings
+            semantic = await mentor_embeddings.search(query_text)
         
         # 查询引路人详细资料
         mentors_data = []
         for mentor_id in mentor_ids:
-            mentor_profile = await supabase_client.select(
-                table="mentorship_relationships",
-                columns="*",
-                filters={"mentor_id": mentor_id}
-            )
+            profile = profiles_by_mentor.get(mentor_id)
             
-            if mentor_profile:
-                profile = mentor_profile[0]
-                user_info = next((u for u in users_response if u['id'] == mentor_id), {})
+            if profile:
+                user_info = users_by_id.get(mentor_id, {})
                 
                 mentor_info = {
                     "mentor_id": mentor_id,
@@ -83,6 +98,8 @@ async def find_mentors_tool(university: str = None, major: str = None, degree_le
                     match_score += 3
                 if degree_level and degree_level.lower() in description_text:
                     match_score += 2
+                # 语义相似度加分（0-3 分），资料中没有出现检索词但内容相近的导师也能被找到
+                match_score += round(semantic.get(profile.get('id'), 0.0) * 3, 2)
                 
                 if not any([university, major, degree_level]) or match_score > 0:
                     mentor_info['match_score'] = match_score
@@ -137,27 +154,25 @@ async def find_services_tool(category: str = None, max_price: int = None) -> str
         
         supabase_client = await get_supabase_client()
         
-        # 构建查询条件
+        # 构建查询条件（价格在数据库端过滤）
         filters = {"is_active": True}
         if category:
             filters["category"] = category
+        if max_price:
+            filters["price"] = {"lte": max_price}
         
         services_response = await supabase_client.select(
             table="services",
             columns="*",
-            filters=filters
+            filters=filters,
+            limit=6
         )
         
         if not services_response:
+            if max_price:
+                return f"❌ 未找到符合价格条件（≤{max_price}元）的服务。\n\n💡 建议：\n- 调整价格预算\n- 查看其他服务分类\n- 联系引路人获取定制服务"
             return "🔍 未找到任何可用的服务。建议您联系平台客服了解最新服务。"
         
-        # 价格筛选
-        if max_price:
-            services_response = [s for s in services_response if s.get('price', 0) <= max_price]
-        
-        if not services_response:
-            return f"❌ 未找到符合价格条件（≤{max_price}元）的服务。\n\n💡 建议：\n- 调整价格预算\n- 查看其他服务分类\n- 联系引路人获取定制服务"
-        
         # 限制返回数量
         services_response = services_response[:6]
         
@@ -178,6 +193,44 @@ async def find_services_tool(category: str = None, max_price: int = None) -> str
         return f"😅 查询服务时遇到技术问题，请稍后重试。错误信息: {str(e)}"
 
 
+async def _load_platform_stats() -> Dict[str, Any]:
+    """查询平台统计数据（结果由查询缓存按 users / services 表失效）"""
+    from app.core.supabase_client import get_supabase_client
+    
+    supabase_client = await get_supabase_client()
+    
+    # 统计引路人、学生数量（count=exact，只返回总数，两个请求并发执行）
+    mentor_count, student_count = await asyncio.gather(
+        supabase_client.count(table="users", filters={"role": "mentor", "is_active": True}),
+        supabase_client.count(table="users", filters={"role": "student", "is_active": True}),
+    )
+    
+    # 统计服务数量
+    services_response = await supabase_client.select(
+        table="services",
+        columns="category",
+        filters={"is_active": True}
+    )
+    service_count = len(services_response) if services_response else 0
+    
+    # 服务分类统计
+    if services_response:
+        categories = {}
+        for service in services_response:
+            cat = service.get('category', '其他')
+            categories[cat] = categories.get(cat, 0) + 1
+        category_stats = ", ".join([f"{k}: {v}个" for k, v in categories.items()])
+    else:
+        category_stats = "暂无服务分类统计"
+    
+    return {
+        "mentor_count": mentor_count,
+        "student_count": student_count,
+        "service_count": service_count,
+        "category_stats": category_stats,
+    }
+
+
 @tool
 async def get_platform_stats_tool() -> str:
     """
@@ -195,41 +248,16 @@ async def get_platform_stats_tool() -> str:
             logger.warning("Supabase客户端不可用，返回模拟数据")
             return _get_mock_platform_stats()
         
-        supabase_client = await get_supabase_client()
-        
-        # 统计引路人数量
-        mentors_response = await supabase_client.select(
-            table="users",
-            columns="id",
-            filters={"role": "mentor", "is_active": True}
-        )
-        mentor_count = len(mentors_response) if mentors_response else 0
-        
-        # 统计学生数量
-        students_response = await supabase_client.select(
-            table="users", 
-            columns="id",
-            filters={"role": "student", "is_active": True}
-        )
-        student_count = len(students_response) if students_response else 0
+        from app.core.cache import query_cache
         
-        # 统计服务数量
-        services_response = await supabase_client.select(
-            table="services",
-            columns="id,category",
-            filters={"is_active": True}
+        stats = await query_cache.get_or_set(
+            "platform_stats", {}, _load_platform_stats,
+            tables=("users", "services"), ttl=600
         )
-        service_count = len(services_response) if services_response else 0
-        
-        # 服务分类统计
-        if services_response:
-            categories = {}
-            for service in services_response:
-                cat = service.get('category', '其他')
-                categories[cat] = categories.get(cat, 0) + 1
-            category_stats = ", ".join([f"{k}: {v}个" for k, v in categories.items()])
-        else:
-            category_stats = "暂无服务分类统计"
+        mentor_count = stats["mentor_count"]
+        student_count = stats["student_count"]
+        service_count = stats["service_count"]
+        category_stats = stats["category_stats"]
         
         result = f"""📊 **PeerPortal 启航引路人平台数据概览**
 
@@ -8,10 +8,15 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from pydantic import ValidationError
 from typing import Optional, Union
-from supabase import create_client
 
 from app.core.config import settings
-from app.core.db import get_db_connection
+from app.core.db import get_lazy_connection
+from app.core.deadline import DeadlineExceeded
+from app.core.supabase_adapter import AsyncSupabaseAdapter
+from app.core.stateless_auth import has_stateless_claims, is_current_version, token_revocations
+from app.core.statements import statement_registry
+from app.core.user_cache import user_cache
+from app.crud.crud_user import USER_BY_USERNAME
 from app.schemas.token_schema import TokenPayload, AuthenticatedUser
 
 # OAuth2 方案，用于从请求头中提取 Bearer Token
@@ -20,22 +25,38 @@ oauth2_scheme = OAuth2PasswordBearer(
     description="使用用户名和密码获取访问令牌"
 )
 
-# 创建 Supabase 客户端作为备用
-supabase_client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+# Supabase 客户端作为备用（包装为异步适配器，避免阻塞事件循环）
+# 仅在降级模式下首次使用时创建，连接池可用时进程不会导入 supabase 包
+supabase_client: Optional[AsyncSupabaseAdapter] = None
+
+
+def get_supabase_fallback() -> AsyncSupabaseAdapter:
+    """获取降级模式使用的 Supabase 客户端（按需创建）"""
+    global supabase_client
+    if supabase_client is None:
+        from supabase import create_client
+        supabase_client = AsyncSupabaseAdapter(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
+    return supabase_client
 
 # 数据库连接依赖（支持降级模式）
 async def get_db_or_supabase():
     """
     获取数据库连接或Supabase客户端
     优先使用连接池，失败时降级到Supabase客户端
+    连接池模式下返回惰性连接句柄：不在依赖解析时占用连接，
+    每次查询时获取、查询结束即归还，事务块内固定同一连接
     """
     try:
-        async for conn in get_db_connection():
-            yield {"type": "asyncpg", "connection": conn}
-            return
+        conn = get_lazy_connection()
     except RuntimeError:
         # 连接池未初始化，使用Supabase客户端
-        yield {"type": "supabase", "connection": supabase_client}
+        yield {"type": "supabase", "connection": get_supabase_fallback()}
+        return
+
+    try:
+        yield {"type": "asyncpg", "connection": conn}
+    finally:
+        await conn.close()
 
 async def get_user_by_username(
     username: str, 
@@ -47,22 +68,21 @@ async def get_user_by_username(
     """
     try:
         if db_conn["type"] == "asyncpg":
-            # 使用连接池
+            # 使用连接池（鉴权读取主库，不受只读副本复制延迟影响）
             conn = db_conn["connection"]
-            result = await conn.fetchrow(
-                "SELECT id, username, email, password_hash, role, is_active FROM users WHERE username = $1",
-                username
-            )
+            result = await statement_registry.fetchrow(conn, USER_BY_USERNAME, username)
             return dict(result) if result else None
         else:
             # 使用Supabase客户端
             client = db_conn["connection"]
-            result = client.table('users').select(
+            result = await client.table('users').select(
                 'id, username, email, password_hash, role, is_active'
             ).eq('username', username).execute()
             
             return result.data[0] if result.data else None
             
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取用户失败: {e}")
         return None
@@ -73,6 +93,7 @@ async def get_current_user(
 ) -> AuthenticatedUser:
     """
     解码JWT并验证用户，返回当前用户信息
+    启用无状态令牌时，携带 uid / role / ver 声明的令牌只校验吊销列表与用户版本号，不访问数据库
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -92,12 +113,26 @@ async def get_current_user(
         if username is None:
             raise credentials_exception
             
-        token_data = TokenPayload(sub=username)
+        token_data = TokenPayload(**payload)
     except (JWTError, ValidationError):
         raise credentials_exception
+
+    if token_data.jti and await token_revocations.is_revoked(token_data.jti):
+        raise credentials_exception
+
+    if settings.AUTH_STATELESS_TOKENS and has_stateless_claims(payload):
+        # 用户信息变更后版本号递增，此前签发的令牌需要重新登录
+        if not await is_current_version(payload):
+            raise credentials_exception
+        return AuthenticatedUser(
+            id=token_data.uid,
+            username=username,
+            email=token_data.email,
+            role=token_data.role
+        )
     
-    # 获取用户信息
-    user = await get_user_by_username(username, db_conn)
+    # 获取用户信息（优先读取鉴权用户缓存，命中时不访问数据库）
+    user = await user_cache.get_by_username(username, lambda: get_user_by_username(username, db_conn))
     if user is None:
         raise credentials_exception
         
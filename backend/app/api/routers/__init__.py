@@ -4,5 +4,6 @@ from . import user_router
 from . import matching_router
 from . import session_router
 from . import review_router
-from . import message_router 
+from . import message_router
+from . import admin_router 
 # mentor_router, student_router, service_router 已移动到 _fixed 版本 
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""
+管理员运维相关的 API 路由
+包括连接池、查询耗时、慢查询与语句统计等运行指标，以及批量匹配任务
+"""
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from app.api.deps import require_admin_role
+from app.schemas.token_schema import AuthenticatedUser
+from app.core import db
+from app.core.cache import query_cache
+from app.core.major_taxonomy import major_taxonomy
+from app.core.metrics import db_metrics
+from app.core.password import password_hasher
+from app.core.popularity import popular_mentors
+from app.core.rate_limit import rate_limiter
+from app.core.stateless_auth import token_revocations
+from app.core.statements import statement_registry
+from app.core.user_cache import user_cache
+
+router = APIRouter()
+
+
+@router.get(
+    "/metrics",
+    response_model=dict,
+    summary="数据库运行指标",
+    description="查看连接池占用、获取等待时间、每请求查询数、查询耗时直方图与慢查询日志"
+)
+async def get_metrics(
+    top: int = Query(20, ge=1, le=200, description="返回累计耗时最高的查询数量"),
+    current_user: AuthenticatedUser = Depends(require_admin_role())
+):
+    """
+    返回数据库访问指标快照
+
+    - **pool**: 连接池大小、空闲与占用连接数（配置只读副本时包含 replica）
+    - **acquire_wait_ms**: 获取连接的等待时间直方图
+    - **queries_per_request**: 每个请求执行的查询次数分布
+    - **queries**: 按归一化 SQL 分组的耗时直方图（按累计耗时排序）
+    - **slow_queries**: 最近的慢查询
+    - **cache**: 查询结果缓存命中率与各表失效版本号
+    - **user_cache**: 鉴权用户缓存命中率
+    - **password_hasher**: 密码哈希线程池的排队数、排队耗时与计算耗时
+    - **token_revocations**: 令牌吊销列表大小与拒绝次数
+    - **rate_limit**: 限流规则与各规则的放行 / 限流次数
+    - **mentor_index**: 导师匹配内存索引的规模、构建与增量刷新耗时
+    - **mentor_embeddings**: 导师语义检索索引的规模、嵌入计算次数与检索耗时
+    - **mentor_similarity**: 导师相似度矩阵的规模、构建时间与查找耗时
+    - **major_taxonomy**: 专业关系图的数据来源、规模与加载耗时
+    - **popular_mentors**: 热门导师排行榜的规模、增量更新次数与查找耗时
+    """
+    # 按需导入（依赖 NumPy，避免拖慢启动）
+    from app.core.mentor_embeddings import mentor_embeddings
+    from app.core.mentor_index import mentor_index
+    from app.core.mentor_similarity import mentor_similarity
+
+    snapshot = db_metrics.snapshot(pool=db.db_pool, top=top, replica_pool=db.db_replica_pool)
+    snapshot["statements"] = statement_registry.get_stats()
+    snapshot["cache"] = query_cache.get_stats()
+    snapshot["user_cache"] = user_cache.get_stats()
+    snapshot["password_hasher"] = password_hasher.get_stats()
+    snapshot["token_revocations"] = token_revocations.get_stats()
+    snapshot["rate_limit"] = rate_limiter.get_stats()
+    snapshot["mentor_index"] = mentor_index.get_stats()
+    snapshot["mentor_embeddings"] = mentor_embeddings.get_stats()
+    snapshot["mentor_similarity"] = mentor_similarity.get_stats()
+    snapshot["major_taxonomy"] = major_taxonomy.get_stats()
+    snapshot["popular_mentors"] = popular_mentors.get_stats()
+    return snapshot
+
+
+@router.post(
+    "/metrics/reset",
+    response_model=dict,
+    summary="重置运行指标",
+    description="清空数据库运行指标与慢查询日志"
+)
+async def reset_metrics(
+    current_user: AuthenticatedUser = Depends(require_admin_role())
+):
+    """重置运行指标"""
+    db_metrics.reset()
+    statement_registry.reset_stats()
+    return {"message": "运行指标已重置"}
+
+
+@router.post(
+    "/cache/invalidate",
+    response_model=dict,
+    summary="使查询缓存失效",
+    description="按表使查询结果缓存失效，按用户 ID 使鉴权用户缓存失效，都不指定时清空本进程缓存"
+)
+async def invalidate_cache(
+    tables: Optional[List[str]] = Query(None, description="要失效的表名，如 mentorship_relationships"),
+    user_id: Optional[int] = Query(None, description="要失效的用户 ID（如直接在数据库中修改了角色或启用状态），同时使其无状态令牌失效"),
+    current_user: AuthenticatedUser = Depends(require_admin_role())
+):
+    """手动使缓存失效（如直接修改数据库之后）"""
+    messages = []
+    if tables:
+        await query_cache.invalidate(*tables)
+        messages.append(f"已使 {', '.join(tables)} 相关缓存失效")
+    if user_id is not None:
+        await user_cache.invalidate(user_id)
+        messages.append(f"已使用户 {user_id} 的鉴权缓存失效")
+    if messages:
+        return {"message": "；".join(messages)}
+    query_cache.clear_local()
+    user_cache.clear_local()
+    return {"message": "本进程查询缓存与鉴权用户缓存已清空"}
+
+
+@router.get(
+    "/db/statements",
+    response_model=dict,
+    summary="预处理语句统计",
+    description="查看热点查询的预处理命中次数与耗时"
+)
+async def get_statement_stats(
+    current_user: AuthenticatedUser = Depends(require_admin_role())
+):
+    """
+    返回每条已注册语句的统计信息
+
+    - **hits**: 命中已预处理语句的次数
+    - **misses**: 首次使用时才预处理或退回普通查询的次数
+    - **prepare_ms**: 预处理累计耗时
+    - **avg_ms / max_ms**: 执行耗时
+    """
+    return {"statements": statement_registry.get_stats()}
+
+
+@router.post(
+    "/db/statements/reset",
+    response_model=dict,
+    summary="重置语句统计",
+    description="清空预处理语句的统计计数"
+)
+async def reset_statement_stats(
+    current_user: AuthenticatedUser = Depends(require_admin_role())
+):
+    """重置语句统计"""
+    statement_registry.reset_stats()
+    return {"message": "语句统计已重置"}
+
+
+@router.post(
+    "/matching/batch",
+    response_model=dict,
+    summary="启动批量匹配",
+    description="在后台为所有活跃学生重新计算导师匹配并批量写入结果"
+)
+async def start_batch_matching(
+    workers: Optional[int] = Query(None, ge=1, le=64, description="打分进程数，默认 MATCHING_BATCH_WORKERS 或 CPU 核数"),
+    chunk_size: Optional[int] = Query(None, ge=1, le=10000, description="每批学生数，默认 MATCHING_BATCH_CHUNK_SIZE"),
+    dry_run: bool = Query(False, description="只打分不写入，用于评估吞吐量"),
+    current_user: AuthenticatedUser = Depends(require_admin_role())
+):
+    """启动批量匹配，进度与报告通过 GET /matching/batch 查看"""
+    if not db.is_db_pool_available():
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="批量匹配需要数据库直连")
+    # 按需导入（依赖 NumPy，避免拖慢启动）
+    from app.core.batch_matching import batch_matching_job
+
+    try:
+        job_status = batch_matching_job.start(workers, chunk_size, dry_run)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"message": "批量匹配已启动", "job": job_status}
+
+
+@router.get(
+    "/matching/batch",
+    response_model=dict,
+    summary="批量匹配进度",
+    description="查看当前或最近一次批量匹配的进度与吞吐量"
+)
+async def get_batch_matching_status(
+    current_user: AuthenticatedUser = Depends(require_admin_role())
+):
+    """
+    返回批量匹配状态
+
+    - **state**: idle / running / completed / failed / cancelled
+    - **students / processed / saved**: 学生总数、已打分数、已写入数
+    - **students_per_second**: 打分与写入阶段的吞吐量
+    """
+    from app.core.batch_matching import batch_matching_job
+
+    return {"job": batch_matching_job.status}
@@ -5,12 +5,15 @@
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from jose import jwt
+from jose import JWTError, jwt
 
 from app.core.config import settings
-from app.api.deps import get_db_or_supabase, get_current_user
+from app.api.deps import get_db_or_supabase, get_current_user, oauth2_scheme
 from app.schemas.user_schema import UserCreate, UserRead
 from app.schemas.token_schema import Token
+from app.core.password import PasswordHasherBusy
+from app.core.stateless_auth import build_token_claims, token_revocations
+from app.core.user_cache import user_cache
 from app.crud.crud_user import create_user, authenticate_user
 
 router = APIRouter()
@@ -65,6 +68,10 @@ async def register(
             is_active=user.get("is_active", True),
             created_at=user["created_at"]
         )
+    except HTTPException:
+        raise
+    except PasswordHasherBusy:
+        raise
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -107,7 +114,7 @@ async def login(
     # 创建访问令牌
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user["username"]}, 
+        data=await build_token_claims(user), 
         expires_delta=access_token_expires
     )
     
@@ -144,7 +151,7 @@ async def refresh_token(
         # 创建新的访问令牌
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": current_user.username}, 
+            data=await build_token_claims(current_user.model_dump()), 
             expires_delta=access_token_expires
         )
         
@@ -161,4 +168,44 @@ async def refresh_token(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"刷新令牌失败: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+
+
+@router.post(
+    "/logout",
+    summary="退出登录",
+    description="吊销当前访问令牌；all_sessions=true 时使该用户此前签发的所有无状态令牌失效"
+)
+async def logout(
+    all_sessions: bool = False,
+    token: str = Depends(oauth2_scheme),
+    current_user = Depends(get_current_user)
+):
+    """
+    退出登录端点
+
+    - **all_sessions**: 是否同时退出所有设备（递增用户版本号）
+
+    只含 sub 的旧格式令牌没有 jti，无法单独吊销，将在过期后失效
+    """
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无法验证凭据",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    revoked = False
+    if payload.get("jti"):
+        await token_revocations.revoke(payload["jti"], payload.get("exp"))
+        revoked = True
+    if all_sessions:
+        await user_cache.invalidate(current_user.id, current_user.username)
+        revoked = True
+
+    return {
+        "message": "已退出登录" if revoked else "已退出登录，当前令牌将在过期后失效",
+        "revoked": revoked
+    }
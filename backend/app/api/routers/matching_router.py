@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from typing import List, Optional
 from app.api.deps import get_current_user, require_student_role, get_db_or_supabase
+from app.core.pagination import parse_cursor_param, set_next_cursor
 from app.schemas.token_schema import AuthenticatedUser
 from app.schemas.matching_schema import (
     MatchingRequest, MatchingResult, MatchingFilter, RecommendationRequest, RecommendationResult
@@ -79,18 +80,22 @@ async def get_filters(
     "/filter",
     response_model=List[dict],
     summary="高级筛选指导者",
-    description="使用高级筛选条件查找指导者"
+    description="使用高级筛选条件查找指导者，支持偏移量分页和游标分页（响应头 X-Next-Cursor）"
 )
 async def filter_mentors(
     filters: MatchingFilter,
+    response: Response,
     limit: int = Query(20, ge=1, le=100, description="返回数量"),
     offset: int = Query(0, ge=0, description="偏移量"),
+    cursor: Optional[str] = Query(None, description="游标（上一页响应头 X-Next-Cursor 的值），传入时忽略 offset"),
     db_conn=Depends(get_db_or_supabase),
     current_user: AuthenticatedUser = Depends(get_current_user)
 ):
     """高级筛选指导者"""
+    cursor_values = parse_cursor_param(cursor, crud_matching.FILTER_SORT_KEYS)
     try:
-        mentors = await crud_matching.apply_advanced_filters(db_conn, filters, limit, offset)
+        mentors = await crud_matching.apply_advanced_filters(db_conn, filters, limit, offset, cursor=cursor_values)
+        set_next_cursor(response, mentors, crud_matching.FILTER_SORT_KEYS, limit)
         return mentors
     except Exception as e:
         raise HTTPException(
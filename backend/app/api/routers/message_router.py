@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from typing import List, Optional
 from app.api.deps import get_current_user, get_db_or_supabase
+from app.core.pagination import parse_cursor_param, set_next_cursor
 from app.schemas.token_schema import AuthenticatedUser
 from app.schemas.message_schema import (
     MessageCreate, Message, ConversationListItem, 
     MessageListResponse, ConversationListResponse
 )
-from app.crud.crud_message import message_crud
+from app.crud.crud_message import message_crud, MESSAGE_SORT_KEYS, CONVERSATION_MESSAGE_SORT_KEYS
 
 router = APIRouter()
 
@@ -14,17 +15,23 @@ router = APIRouter()
     "",
     response_model=List[Message],
     summary="获取消息列表",
-    description="获取用户的消息列表"
+    description="获取用户的消息列表，支持偏移量分页和游标分页（响应头 X-Next-Cursor）"
 )
 async def get_messages(
+    response: Response,
     limit: int = Query(20, ge=1, le=100, description="返回数量"),
     offset: int = Query(0, ge=0, description="偏移量"),
+    cursor: Optional[str] = Query(None, description="游标（上一页响应头 X-Next-Cursor 的值），传入时忽略 offset"),
     db_conn=Depends(get_db_or_supabase),
     current_user: AuthenticatedUser = Depends(get_current_user)
 ):
     """获取消息列表"""
+    cursor_values = parse_cursor_param(cursor, MESSAGE_SORT_KEYS)
     try:
-        messages = await message_crud.get_messages(db_conn, int(current_user.id), limit, offset)
+        messages = await message_crud.get_messages(
+            db_conn, int(current_user.id), limit, offset, cursor=cursor_values
+        )
+        set_next_cursor(response, messages, MESSAGE_SORT_KEYS, limit)
         return messages
     except Exception as e:
         raise HTTPException(
@@ -136,20 +143,24 @@ async def get_conversations(
     "/conversations/{conversation_id}",
     response_model=List[Message],
     summary="获取对话消息",
-    description="获取指定对话的所有消息"
+    description="获取指定对话的所有消息，支持偏移量分页和游标分页（响应头 X-Next-Cursor）"
 )
 async def get_conversation_messages(
     conversation_id: int,
+    response: Response,
     limit: int = Query(50, ge=1, le=200, description="返回数量"),
     offset: int = Query(0, ge=0, description="偏移量"),
+    cursor: Optional[str] = Query(None, description="游标（上一页响应头 X-Next-Cursor 的值），传入时忽略 offset"),
     db_conn=Depends(get_db_or_supabase),
     current_user: AuthenticatedUser = Depends(get_current_user)
 ):
     """获取对话消息"""
+    cursor_values = parse_cursor_param(cursor, CONVERSATION_MESSAGE_SORT_KEYS)
     try:
         messages = await message_crud.get_conversation_messages(
-            db_conn, conversation_id, int(current_user.id), limit, offset
+            db_conn, conversation_id, int(current_user.id), limit, offset, cursor=cursor_values
         )
+        set_next_cursor(response, messages, CONVERSATION_MESSAGE_SORT_KEYS, limit)
         return messages
     except Exception as e:
         raise HTTPException(
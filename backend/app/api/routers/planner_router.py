@@ -12,6 +12,8 @@ from datetime import datetime
 
 from app.api.deps import get_current_user
 from app.agents.v2 import create_study_planner, StudyPlannerAgent
+from app.agents.v2 import loader as agent_loader
+from app.core.deadline import DeadlineExceeded
 
 router = APIRouter(prefix="/planner", tags=["AI留学规划师"])
 
@@ -58,6 +60,9 @@ async def invoke_planner(
     - 申请策略指导
     """
     try:
+        # 智能体系统按需初始化（后台预热未完成时等待）
+        if not await agent_loader.ensure_initialized():
+            raise HTTPException(status_code=503, detail="AI智能体系统尚未初始化，请稍后重试")
         agent = get_agent()
         
         if request.stream:
@@ -79,6 +84,11 @@ async def invoke_planner(
                 session_id=request.session_id
             )
             
+    except HTTPException:
+        raise
+    except DeadlineExceeded:
+        # 由全局处理器返回 504
+        raise
     except Exception as e:
         print(f"❌ AI规划师调用失败: {e}")
         raise HTTPException(status_code=500, detail=f"AI服务调用失败: {str(e)}")
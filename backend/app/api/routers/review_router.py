@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from typing import List, Optional
 from datetime import datetime
 from app.api.deps import get_current_user, require_student_role, get_db_or_supabase
+from app.core.pagination import parse_cursor_param, set_next_cursor
 from app.schemas.token_schema import AuthenticatedUser
 from app.schemas.review_schema import (
     ServiceReviewCreate, MentorReviewCreate, ReviewUpdate, ReviewFilter,
@@ -75,10 +76,11 @@ async def create_mentor_review(
     "/service/{service_id}",
     response_model=List[dict],
     summary="获取服务评价",
-    description="获取指定服务的所有评价"
+    description="获取指定服务的所有评价，支持偏移量分页和游标分页（响应头 X-Next-Cursor）"
 )
 async def get_service_reviews(
     service_id: int,
+    response: Response,
     rating_min: Optional[float] = Query(None, ge=1, le=5, description="最低评分"),
     rating_max: Optional[float] = Query(None, ge=1, le=5, description="最高评分"),
     verified_only: Optional[bool] = Query(None, description="仅显示已验证评价"),
@@ -89,21 +91,27 @@ async def get_service_reviews(
     sort_order: str = Query("desc", pattern="^(asc|desc)$", description="排序方向"),
     limit: int = Query(20, ge=1, le=100, description="返回数量"),
     offset: int = Query(0, ge=0, description="偏移量"),
+    cursor: Optional[str] = Query(None, description="游标（上一页响应头 X-Next-Cursor 的值），传入时忽略 offset"),
     db_conn=Depends(get_db_or_supabase)
 ):
     """获取服务评价"""
+    filters = ReviewFilter(
+        rating_min=rating_min,
+        rating_max=rating_max,
+        verified_only=verified_only,
+        date_from=date_from,
+        date_to=date_to,
+        has_content=has_content,
+        sort_by=sort_by,
+        sort_order=sort_order
+    )
+    sort_keys = crud_review.review_sort_keys(filters)
+    cursor_values = parse_cursor_param(cursor, sort_keys)
     try:
-        filters = ReviewFilter(
-            rating_min=rating_min,
-            rating_max=rating_max,
-            verified_only=verified_only,
-            date_from=date_from,
-            date_to=date_to,
-            has_content=has_content,
-            sort_by=sort_by,
-            sort_order=sort_order
+        reviews = await crud_review.get_reviews_by_target(
+            db_conn, "service", service_id, filters, limit, offset, cursor=cursor_values
         )
-        reviews = await crud_review.get_reviews_by_target(db_conn, "service", service_id, filters, limit, offset)
+        set_next_cursor(response, reviews, sort_keys, limit)
         return reviews
     except Exception as e:
         raise HTTPException(
@@ -115,10 +123,11 @@ async def get_service_reviews(
     "/mentor/{mentor_id}",
     response_model=List[dict],
     summary="获取指导者评价",
-    description="获取指定指导者的所有评价"
+    description="获取指定指导者的所有评价，支持偏移量分页和游标分页（响应头 X-Next-Cursor）"
 )
 async def get_mentor_reviews(
     mentor_id: int,
+    response: Response,
     rating_min: Optional[float] = Query(None, ge=1, le=5, description="最低评分"),
     rating_max: Optional[float] = Query(None, ge=1, le=5, description="最高评分"),
     date_from: Optional[datetime] = Query(None, description="开始日期"),
@@ -128,20 +137,26 @@ async def get_mentor_reviews(
     sort_order: str = Query("desc", pattern="^(asc|desc)$", description="排序方向"),
     limit: int = Query(20, ge=1, le=100, description="返回数量"),
     offset: int = Query(0, ge=0, description="偏移量"),
+    cursor: Optional[str] = Query(None, description="游标（上一页响应头 X-Next-Cursor 的值），传入时忽略 offset"),
     db_conn=Depends(get_db_or_supabase)
 ):
     """获取指导者评价"""
+    filters = ReviewFilter(
+        rating_min=rating_min,
+        rating_max=rating_max,
+        date_from=date_from,
+        date_to=date_to,
+        has_content=has_content,
+        sort_by=sort_by,
+        sort_order=sort_order
+    )
+    sort_keys = crud_review.review_sort_keys(filters)
+    cursor_values = parse_cursor_param(cursor, sort_keys)
     try:
-        filters = ReviewFilter(
-            rating_min=rating_min,
-            rating_max=rating_max,
-            date_from=date_from,
-            date_to=date_to,
-            has_content=has_content,
-            sort_by=sort_by,
-            sort_order=sort_order
+        reviews = await crud_review.get_reviews_by_target(
+            db_conn, "mentor", mentor_id, filters, limit, offset, cursor=cursor_values
         )
-        reviews = await crud_review.get_reviews_by_target(db_conn, "mentor", mentor_id, filters, limit, offset)
+        set_next_cursor(response, reviews, sort_keys, limit)
         return reviews
     except Exception as e:
         raise HTTPException(
@@ -14,7 +14,8 @@ from app.agents.v2 import (
     AgentException,
     PlatformException
 )
-from app.agents.v2.config import config_manager
+from app.agents.v2 import loader as agent_loader
+from app.core.deadline import DeadlineExceeded
 
 logger = logging.getLogger(__name__)
 
@@ -54,8 +55,8 @@ class ArchitectureInfoResponse(BaseModel):
 
 # 依赖注入：检查系统状态
 async def verify_system_ready():
-    """验证v2.0系统是否就绪"""
-    if not config_manager.is_initialized:
+    """验证v2.0系统是否就绪（尚未初始化时在此完成初始化，后台预热进行中则等待预热结果）"""
+    if not await agent_loader.ensure_initialized():
         raise HTTPException(
             status_code=503, 
             detail="AI智能体系统尚未初始化，请稍后重试"
@@ -70,7 +71,7 @@ async def get_system_status():
     返回系统初始化状态、可用服务等信息
     """
     try:
-        status = config_manager.get_config_status()
+        status = agent_loader.get_status()
         info = get_architecture_info()
         
         return SystemStatusResponse(
@@ -125,6 +126,9 @@ async def chat_with_planner(
             session_id=request.session_id
         )
         
+    except DeadlineExceeded:
+        # 由全局处理器返回 504
+        raise
     except AgentException as e:
         logger.error(f"留学规划师执行失败: {e}")
         raise HTTPException(status_code=400, detail=f"智能体错误: {e.message}")
@@ -163,6 +167,9 @@ async def chat_with_consultant(
             session_id=request.session_id
         )
         
+    except DeadlineExceeded:
+        # 由全局处理器返回 504
+        raise
     except AgentException as e:
         logger.error(f"留学咨询师执行失败: {e}")
         raise HTTPException(status_code=400, detail=f"智能体错误: {e.message}")
@@ -207,7 +214,7 @@ async def chat_with_auto_agent(
             session_id=request.session_id
         )
         
-    except HTTPException:
+    except (HTTPException, DeadlineExceeded):
         raise
     except AgentException as e:
         logger.error(f"智能体执行失败: {e}")
@@ -237,9 +244,9 @@ async def invoke_planner(
 async def health_check():
     """智能体系统健康检查"""
     try:
-        status = config_manager.get_config_status()
+        status = agent_loader.get_status()
         return {
-            "status": "healthy" if status['is_initialized'] else "initializing",
+            "status": "healthy" if status['is_initialized'] else ("initializing" if status['initializing'] else "not_loaded"),
             "system": "PeerPortal AI智能体系统 v2.0",
             "focus": "留学规划与咨询",
             "agents": ["study_planner", "study_consultant"],
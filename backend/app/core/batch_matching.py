@@ -0,0 +1,226 @@
+"""
+批量匹配
+为所有活跃学生重新计算导师匹配（每晚定时执行，或导师库有较大变化后由管理员触发），
+替代逐个学生通过 HTTP 调用 calculate_match_scores + save_matching_result：
+
+- 导师特征只从数据库加载一次（构建 MentorIndex），每个工作进程启动时收到一份；
+- 每个学生按其最近一次匹配请求的条件打分，学生按 MATCHING_BATCH_CHUNK_SIZE 分批提交到进程池；
+- 每批结果用一条多行 upsert 语句批量写入（crud_matching.save_matching_results）；
+- 报告处理的学生数与吞吐量（学生/秒）。
+
+命令行：python -m app.core.batch_matching [--workers N] [--chunk-size N] [--dry-run]
+管理接口：POST /api/v1/admin/matching/batch 在后台启动，GET 同一路径查看进度与报告。
+仅支持 PostgreSQL 直连（asyncpg）。
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.core.lazy_connection import read_connection
+from app.core.mentor_index import MentorIndex, build_index
+from app.crud import crud_matching
+from app.schemas.matching_schema import MatchingRequest
+
+logger = logging.getLogger(__name__)
+
+# 每个活跃学生最近一次匹配请求的条件
+STUDENT_REQUESTS_QUERY = """
+    SELECT DISTINCT ON (mm.student_id)
+        mm.id, mm.student_id, mm.target_universities, mm.target_majors, mm.degree_level,
+        mm.service_categories, mm.preferred_languages
+    FROM mentor_matches mm
+    JOIN users u ON u.id = mm.student_id
+    WHERE u.is_active
+    ORDER BY mm.student_id, mm.created_at DESC
+"""
+
+# (请求ID, 学生ID, 匹配条件)
+StudentRequest = Tuple[Any, int, Dict[str, Any]]
+
+# 工作进程中的导师索引（由进程池 initializer 设置）
+_worker_index: Optional[MentorIndex] = None
+
+
+def _init_worker(index: Optional[MentorIndex]) -> None:
+    global _worker_index
+    _worker_index = index
+
+
+def _score_chunk(chunk: List[StudentRequest]) -> Tuple[List[Tuple[Any, int, List[Dict]]], int]:
+    """为一批学生打分，返回 (每个请求保存的匹配, 条件无效的请求数)"""
+    results = []
+    invalid = 0
+    for request_id, student_id, fields in chunk:
+        try:
+            request = MatchingRequest(**fields)
+        except ValidationError:
+            invalid += 1
+            continue
+        matches = _worker_index.score(request, limit=crud_matching.SAVED_MATCHES_PER_REQUEST)
+        results.append((request_id, student_id, [
+            {"id": match["id"], "total_score": match["total_score"]} for match in matches
+        ]))
+    return results, invalid
+
+
+def _student_request(row: Any) -> StudentRequest:
+    return row["id"], row["student_id"], {
+        "target_universities": row["target_universities"] or [],
+        "target_majors": row["target_majors"] or [],
+        "degree_level": row["degree_level"],
+        "service_categories": row["service_categories"],
+        "preferred_languages": row["preferred_languages"],
+    }
+
+
+async def run_batch_matching(
+    conn: Any,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    dry_run: bool = False,
+    report: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    为所有活跃学生重新计算并保存匹配结果
+    report 传入时就地更新（供后台任务查询进度）；dry_run 时只打分不写入
+    """
+    workers = workers or settings.MATCHING_BATCH_WORKERS or os.cpu_count() or 1
+    chunk_size = chunk_size or settings.MATCHING_BATCH_CHUNK_SIZE
+    report = {} if report is None else report
+    report.update({"workers": workers, "chunk_size": chunk_size, "dry_run": dry_run,
+                   "students": 0, "processed": 0, "saved": 0, "invalid": 0, "write_errors": 0})
+    started = time.perf_counter()
+
+    reader = read_connection(conn, consistent=False)
+    index = await build_index(reader)
+    students = [_student_request(row) for row in await reader.fetch(STUDENT_REQUESTS_QUERY)]
+    chunks = [students[i:i + chunk_size] for i in range(0, len(students), chunk_size)]
+    report.update({"mentors": index.size, "students": len(students),
+                   "load_seconds": round(time.perf_counter() - started, 3)})
+    logger.info(f"批量匹配开始: {len(students)} 名学生，{index.size} 名导师，{len(chunks)} 批")
+
+    db_conn = {"type": "asyncpg", "connection": conn}
+    executor: Optional[Executor] = None
+    scoring_started = time.perf_counter()
+    try:
+        if workers > 1 and len(chunks) > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=min(workers, len(chunks)),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(index,),
+            )
+        else:
+            # 单进程：在默认线程池中打分，不阻塞事件循环
+            _init_worker(index)
+
+        loop = asyncio.get_running_loop()
+        futures = [loop.run_in_executor(executor, _score_chunk, chunk) for chunk in chunks]
+        for future in asyncio.as_completed(futures):
+            results, invalid = await future
+            report["processed"] += len(results) + invalid
+            report["invalid"] += invalid
+            if dry_run or not results:
+                continue
+            if await crud_matching.save_matching_results(db_conn, results):
+                report["saved"] += len(results)
+            else:
+                report["write_errors"] += len(results)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            _init_worker(None)
+
+    elapsed = time.perf_counter() - started
+    scoring_elapsed = time.perf_counter() - scoring_started
+    report.update({
+        "elapsed_seconds": round(elapsed, 3),
+        "students_per_second": round(report["processed"] / scoring_elapsed, 1) if scoring_elapsed > 0 else 0.0,
+    })
+    logger.info(
+        f"批量匹配完成: {report['processed']} 名学生，写入 {report['saved']}，"
+        f"耗时 {elapsed:.1f}s，{report['students_per_second']} 学生/秒"
+    )
+    return report
+
+
+class BatchMatchingJob:
+    """在后台运行批量匹配（管理接口使用），同一时间只运行一个"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.status: Dict[str, Any] = {"state": "idle"}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, workers: Optional[int] = None, chunk_size: Optional[int] = None, dry_run: bool = False) -> Dict[str, Any]:
+        if self.running:
+            raise RuntimeError("批量匹配正在运行")
+        self.status = {"state": "running", "started_at": datetime.now(timezone.utc).isoformat()}
+        # 在空上下文中运行：不继承触发请求的截止时间
+        self._task = asyncio.get_running_loop().create_task(
+            self._run(workers, chunk_size, dry_run), context=contextvars.Context()
+        )
+        return self.status
+
+    async def _run(self, workers: Optional[int], chunk_size: Optional[int], dry_run: bool) -> None:
+        from app.core import db
+        conn = db.get_lazy_connection()
+        try:
+            await run_batch_matching(conn, workers, chunk_size, dry_run, report=self.status)
+            self.status["state"] = "completed"
+        except asyncio.CancelledError:
+            self.status["state"] = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"批量匹配失败: {e}", exc_info=True)
+            self.status.update({"state": "failed", "error": str(e)})
+        finally:
+            self.status["finished_at"] = datetime.now(timezone.utc).isoformat()
+            await conn.close()
+
+    async def stop(self) -> None:
+        """应用关闭时取消正在运行的批量匹配"""
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+# 全局批量匹配任务
+batch_matching_job = BatchMatchingJob()
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    import asyncpg
+
+    conn = await asyncpg.connect(settings.postgres_url, command_timeout=None)
+    try:
+        return await run_batch_matching(conn, args.workers, args.chunk_size, args.dry_run)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="为所有活跃学生批量重新计算导师匹配")
+    parser.add_argument("--workers", type=int, default=None, help="打分进程数（默认 MATCHING_BATCH_WORKERS 或 CPU 核数）")
+    parser.add_argument("--chunk-size", type=int, default=None, help="每批学生数（默认 MATCHING_BATCH_CHUNK_SIZE）")
+    parser.add_argument("--dry-run", action="store_true", help="只打分，不写入数据库")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    print(json.dumps(asyncio.run(_main(parser.parse_args())), ensure_ascii=False, indent=2))
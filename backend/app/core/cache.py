@@ -0,0 +1,248 @@
+"""
+查询结果缓存
+两级缓存：进程内 LRU + 可选 Redis（配置 REDIS_URL 且安装了 redis 包时启用，多个进程共享）。
+每个缓存条目按读取的表打标签，crud_* 中的写操作调用 invalidate() 使相关表的缓存失效。
+
+失效通过表版本号实现：缓存键包含所涉及表的当前版本号，写操作递增版本号后旧条目不再被命中，
+随 LRU 淘汰或 TTL 过期自然清理。启用 Redis 时版本号保存在 Redis 中，所有进程同时失效。
+Redis 层按 JSON 存储，datetime / Decimal 等值读回后为字符串 / 浮点数。
+进程内缓存存取时都做深拷贝，调用方修改返回结果不会影响缓存中的条目。
+"""
+import asyncio
+import copy
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "qc"
+
+# 共享 Redis 客户端（查询缓存、用户缓存等共用，按需创建）
+_redis_client = None
+_redis_checked = False
+
+
+def get_redis():
+    """按需创建共享 Redis 客户端；未配置 REDIS_URL 或未安装 redis 包时返回 None"""
+    global _redis_client, _redis_checked
+    if not _redis_checked:
+        _redis_checked = True
+        if settings.REDIS_URL:
+            try:
+                import redis.asyncio as redis
+                _redis_client = redis.from_url(settings.REDIS_URL)
+                logger.info("缓存启用 Redis 共享层")
+            except ImportError:
+                logger.warning("redis package not installed, caches use local memory only")
+    return _redis_client
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, UUID):
+        return str(value)
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    return str(value)
+
+
+def _fingerprint(params: Any) -> str:
+    raw = json.dumps(params, sort_keys=True, default=_json_default, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class QueryCache:
+    """带表标签失效的两级查询结果缓存"""
+
+    def __init__(self, max_entries: int = None, default_ttl: int = None):
+        self.max_entries = max_entries or settings.QUERY_CACHE_MAX_ENTRIES
+        self.default_ttl = default_ttl or settings.QUERY_CACHE_DEFAULT_TTL
+        # key -> (过期时间, 值)
+        self._local: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "invalidations": 0, "redis_errors": 0}
+
+    # ---- Redis ----
+    def _get_redis(self):
+        """未配置 Redis 时只使用进程内缓存"""
+        return get_redis()
+
+    def _redis_failed(self, e: Exception) -> None:
+        self._stats["redis_errors"] += 1
+        logger.warning(f"查询缓存 Redis 操作失败，使用本地缓存: {e}")
+
+    # ---- 版本号 ----
+    async def _current_versions(self, tables: Tuple[str, ...]) -> List[int]:
+        redis = self._get_redis()
+        if redis is not None and tables:
+            try:
+                values = await redis.mget([f"{_KEY_PREFIX}:tbl:{t}" for t in tables])
+                versions = [int(v) if v is not None else 0 for v in values]
+                self._versions.update(zip(tables, versions))
+                return versions
+            except Exception as e:
+                self._redis_failed(e)
+        return [self._versions.get(t, 0) for t in tables]
+
+    async def table_versions(self, *tables: str) -> Dict[str, int]:
+        """各表当前的失效版本号（每次 invalidate 递增），供内存索引等判断数据是否变化"""
+        return dict(zip(tables, await self._current_versions(tuple(tables))))
+
+    # ---- 本地 LRU ----
+    def _local_get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._local.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._local[key]
+            return False, None
+        self._local.move_to_end(key)
+        return True, copy.deepcopy(value)
+
+    def _local_set(self, key: str, value: Any, ttl: int) -> None:
+        self._local[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    # ---- 对外接口 ----
+    async def get_or_set(self, namespace: str, params: Any, loader: Callable[[], Awaitable[Any]],
+                         tables: Iterable[str], ttl: Optional[int] = None,
+                         cache_empty: bool = False) -> Any:
+        """
+        读取缓存，未命中时调用 loader 加载并写入缓存
+        cache_empty=False 时不缓存空结果（crud 函数出错时通常返回空列表/空字典）
+        """
+        if not settings.QUERY_CACHE_ENABLED:
+            return await loader()
+
+        tables = tuple(sorted(set(tables)))
+        ttl = ttl or self.default_ttl
+        versions = await self._current_versions(tables)
+        key = f"{_KEY_PREFIX}:{namespace}:{_fingerprint([params, list(zip(tables, versions))])}"
+
+        hit, value = self._local_get(key)
+        if hit:
+            self._stats["local_hits"] += 1
+            return value
+
+        redis = self._get_redis()
+        if redis is not None:
+            try:
+                raw = await redis.get(key)
+                if raw is not None:
+                    value = json.loads(raw)
+                    self._stats["redis_hits"] += 1
+                    self._local_set(key, value, ttl)
+                    return value
+            except Exception as e:
+                self._redis_failed(e)
+
+        # 同一进程内相同查询并发未命中时只加载一次
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return copy.deepcopy(await asyncio.shield(pending))
+
+        self._stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+            future.set_result(value)
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        if value or cache_empty:
+            self._local_set(key, value, ttl)
+            if redis is not None:
+                try:
+                    await redis.set(key, json.dumps(value, default=_json_default, ensure_ascii=False), ex=ttl)
+                except Exception as e:
+                    self._redis_failed(e)
+        return value
+
+    async def invalidate(self, *tables: str) -> None:
+        """使涉及指定表的缓存失效（写操作成功后调用）"""
+        if not tables:
+            return
+        self._stats["invalidations"] += 1
+        for table in tables:
+            self._versions[table] = self._versions.get(table, 0) + 1
+        redis = self._get_redis()
+        if redis is not None:
+            try:
+                pipe = redis.pipeline()
+                for table in tables:
+                    pipe.incr(f"{_KEY_PREFIX}:tbl:{table}")
+                results = await pipe.execute()
+                self._versions.update(zip(tables, (int(v) for v in results)))
+            except Exception as e:
+                self._redis_failed(e)
+
+    def cached(self, tables: Iterable[str], ttl: Optional[int] = None, namespace: Optional[str] = None,
+               ignore: Iterable[str] = ("self", "db_conn")):
+        """
+        异步函数结果缓存装饰器
+        缓存键由函数名与参数组成，ignore 中的参数（数据库连接、self 等）不参与缓存键
+        """
+        tables = tuple(tables)
+        ignore = set(ignore)
+
+        def decorator(func):
+            signature = inspect.signature(func)
+            ns = namespace or f"{func.__module__}.{func.__qualname__}"
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                params = {k: v for k, v in bound.arguments.items() if k not in ignore}
+                return await self.get_or_set(ns, params, lambda: func(*args, **kwargs), tables, ttl)
+
+            wrapper.uncached = func
+            return wrapper
+
+        return decorator
+
+    def clear_local(self) -> None:
+        """清空进程内缓存"""
+        self._local.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._stats["local_hits"] + self._stats["redis_hits"] + self._stats["misses"]
+        hits = self._stats["local_hits"] + self._stats["redis_hits"]
+        return {
+            **self._stats,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "local_entries": len(self._local),
+            "max_entries": self.max_entries,
+            "redis_enabled": self._get_redis() is not None,
+            "table_versions": dict(self._versions),
+        }
+
+
+# 全局查询缓存实例
+query_cache = QueryCache()
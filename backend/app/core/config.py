@@ -4,7 +4,7 @@
 """
 from pydantic_settings import BaseSettings
 from pydantic import Field
-from typing import Optional
+from typing import Any, Dict, List, Optional
 import os
 
 
@@ -21,12 +21,79 @@ class Settings(BaseSettings):
     DATABASE_URL: Optional[str] = Field(default=None)
     DB_POOL_MIN_SIZE: int = Field(default=1)
     DB_POOL_MAX_SIZE: int = Field(default=10)
+    DB_COMMAND_TIMEOUT: float = Field(default=30.0)  # 单条查询的默认超时（秒）
+    # 只读副本（可选）：配置后匹配、筛选、推荐、列表等只读查询走副本连接池
+    DATABASE_REPLICA_URL: Optional[str] = Field(default=None)
+    DB_REPLICA_POOL_MIN_SIZE: int = Field(default=1)
+    DB_REPLICA_POOL_MAX_SIZE: int = Field(default=10)
+    SLOW_QUERY_THRESHOLD_MS: int = Field(default=200)  # 超过该耗时的查询记入慢查询日志
+    SLOW_QUERY_LOG_SIZE: int = Field(default=100)      # 慢查询日志保留条数
+    # 查询结果缓存（进程内 LRU，配置 REDIS_URL 时增加 Redis 共享层）
+    QUERY_CACHE_ENABLED: bool = Field(default=True)
+    QUERY_CACHE_MAX_ENTRIES: int = Field(default=1024)
+    QUERY_CACHE_DEFAULT_TTL: int = Field(default=300)  # 秒
+    # 鉴权用户缓存（get_current_user 按用户名缓存 role / is_active，用户信息变更时失效）
+    AUTH_USER_CACHE_ENABLED: bool = Field(default=True)
+    AUTH_USER_CACHE_MAX_ENTRIES: int = Field(default=10000)
+    AUTH_USER_CACHE_TTL: int = Field(default=60)  # 秒
+    # 无状态令牌：JWT 携带 uid / role / 用户版本号，鉴权时不查询 users 表（必须配置 REDIS_URL 共享版本号与吊销列表，否则拒绝启动）
+    AUTH_STATELESS_TOKENS: bool = Field(default=False)
+    TOKEN_REVOCATION_MAX_ENTRIES: int = Field(default=100000)
+    # 密码哈希：bcrypt 成本（变更后用户下次登录时自动按新成本重新哈希）与专用线程池大小
+    PASSWORD_BCRYPT_ROUNDS: int = Field(default=12)
+    PASSWORD_HASH_WORKERS: int = Field(default=4)
+    PASSWORD_HASH_MAX_WAITING: int = Field(default=100)  # 排队超过该数量时返回 503
+    # 导师匹配内存索引：已认证导师常驻内存，匹配打分为向量运算；变更后后台增量刷新，定期全量重建
+    MATCHING_INDEX_ENABLED: bool = Field(default=True)
+    MATCHING_INDEX_REFRESH_SECONDS: int = Field(default=30)
+    MATCHING_INDEX_FULL_REBUILD_SECONDS: int = Field(default=3600)
+    # 匹配结果缓存秒数（按规范化的匹配请求缓存，导师资料变更时失效），0 表示不缓存
+    MATCHING_CACHE_TTL: int = Field(default=300)
+    # 批量匹配：工作进程数（0 表示 CPU 核数）与每批学生数
+    MATCHING_BATCH_WORKERS: int = Field(default=0)
+    MATCHING_BATCH_CHUNK_SIZE: int = Field(default=200)
+    # 导师语义检索（默认关闭）：导师资料写入时计算嵌入，匹配打分增加语义相似度分项（最相近的 TOP_K 名导师按相似度 × 权重计分）
+    # 启用前先运行 python -m app.core.mentor_embeddings 补齐已有导师的嵌入；启用后未命中缓存的匹配请求会调用一次嵌入模型
+    MATCHING_SEMANTIC_ENABLED: bool = Field(default=False)
+    MATCHING_SEMANTIC_WEIGHT: float = Field(default=0.1)
+    MATCHING_SEMANTIC_TOP_K: int = Field(default=200)
+    MATCHING_EMBEDDING_MODEL: str = Field(default="text-embedding-3-small")
+    # 导师相似度矩阵（python -m app.core.mentor_similarity 离线构建）：文件路径、每名导师 / 学生保留的相似导师数、检查文件更新的间隔秒数
+    MATCHING_SIMILARITY_PATH: str = Field(default="data/mentor_similarity.npz")
+    MATCHING_SIMILARITY_TOP_K: int = Field(default=50)
+    MATCHING_SIMILARITY_REFRESH_SECONDS: int = Field(default=60)
+    # 专业关系图（相关专业 / 学科大类）重新加载间隔秒数；参考表经管理接口失效后也会重新加载
+    MAJOR_TAXONOMY_REFRESH_SECONDS: int = Field(default=600)
+    # 热门导师排行榜：热度 = 评分 + 权重 × 近期活跃度（已完成会话与评价次数，按半衰期天数衰减）；按间隔或导师表失效后重新加载
+    POPULARITY_ACTIVITY_WEIGHT: float = Field(default=0.1)
+    POPULARITY_HALF_LIFE_DAYS: float = Field(default=14.0)
+    POPULARITY_REFRESH_SECONDS: int = Field(default=300)
+    # 请求截止时间：数据库、Supabase、LLM 与工具调用的超时不超过请求剩余时间
+    REQUEST_TIMEOUT_SECONDS: float = Field(default=30.0)
+    # 按路径前缀覆盖超时秒数（JSON），如 {"/api/v1/files": 120}，值 <= 0 表示不限；智能体路由默认使用 AGENT_TIMEOUT_SECONDS
+    REQUEST_TIMEOUT_OVERRIDES: Dict[str, float] = Field(default_factory=dict)
+    # 令牌桶限流：默认按 IP 的全局限额，登录 / 注册按 IP、智能体按用户另有更严格的限额（配置 REDIS_URL 时多 worker 共享）
+    RATE_LIMIT_ENABLED: bool = Field(default=True)
+    RATE_LIMIT_DEFAULT_PER_MINUTE: float = Field(default=600)
+    RATE_LIMIT_DEFAULT_BURST: int = Field(default=100)
+    # 按路径前缀覆盖或新增规则（JSON），如 {"/api/v1/files": {"per_minute": 30, "burst": 10, "key": "user"}}
+    RATE_LIMIT_RULES: Dict[str, Dict[str, Any]] = Field(default_factory=dict)
+    RATE_LIMIT_EXEMPT_PATHS: List[str] = Field(default=["/health", "/docs", "/redoc", "/openapi.json", "/static"])
+    # 部署在反向代理之后时按 X-Forwarded-For 识别客户端 IP
+    RATE_LIMIT_TRUST_FORWARDED: bool = Field(default=False)
+    RATE_LIMIT_MAX_LOCAL_BUCKETS: int = Field(default=100000)
     
     # Supabase 配置
     SUPABASE_URL: str = Field(...)
     SUPABASE_KEY: str = Field(...)
     SUPABASE_JWT_SECRET: Optional[str] = Field(default=None)
+    # Supabase REST 共享 HTTP 客户端的连接池设置
+    SUPABASE_HTTP_MAX_CONNECTIONS: int = Field(default=50)
+    SUPABASE_HTTP_MAX_KEEPALIVE: int = Field(default=20)
+    SUPABASE_HTTP_KEEPALIVE_EXPIRY: float = Field(default=30.0)
+    SUPABASE_HTTP_TIMEOUT: float = Field(default=30.0)  # 单次请求默认超时（秒）
     SUPABASE_DB_PASSWORD: Optional[str] = Field(default=None)  # 添加缺失的字段
+    SUPABASE_FALLBACK_MAX_WORKERS: int = Field(default=16)  # 降级模式下同步 Supabase 调用的线程池大小
     
     # JWT 配置
     SECRET_KEY: str = Field(default="your-secret-key-change-in-production")
@@ -46,6 +113,8 @@ class Settings(BaseSettings):
     # Agent 性能配置
     AGENT_MAX_ITERATIONS: int = Field(default=10)
     AGENT_TIMEOUT_SECONDS: int = Field(default=300)
+    # 启动后在后台预热智能体系统；关闭时在首次使用智能体接口时才初始化
+    AI_WARMUP_ON_STARTUP: bool = Field(default=True)
     
     # === v2.0智能体架构配置 ===
     # AI模型配置
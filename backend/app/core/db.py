@@ -12,21 +12,53 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from typing import AsyncGenerator, Optional, Any
 import logging
+import sys
 
 from app.core.config import settings
 from app.core.supabase_client import get_supabase_client, close_supabase_client
+from app.core.supabase_adapter import shutdown_supabase_executor
+from app.core.statements import statement_registry, PreparedConnection
+from app.core.lazy_connection import LazyConnection
+from app.core.major_taxonomy import major_taxonomy
+from app.core.popularity import popular_mentors
+from app.core.password import password_hasher
+from app.core.stateless_auth import check_stateless_config
 
 # 全局数据库连接池
 db_pool = None
+# 只读副本连接池（可选，未配置或创建失败时为 None，只读查询回到主库）
+db_replica_pool = None
 logger = logging.getLogger(__name__)
 
+
+async def _create_pool(dsn: str, min_size: int, max_size: int):
+    """创建连接池并执行一次连通性检查"""
+    pool = await asyncpg.create_pool(
+        dsn=dsn,
+        min_size=min_size,
+        max_size=max_size,
+        command_timeout=settings.DB_COMMAND_TIMEOUT,  # 单条查询默认超时，请求截止时间更早时按剩余时间
+        server_settings={'jit': 'off'},
+        # 增加连接超时和重试设置
+        timeout=10,  # 连接超时时间
+        connection_class=PreparedConnection,  # 携带预处理语句的连接类
+        init=statement_registry.prepare_connection,  # 每个新连接预处理热点查询
+    )
+
+    # 测试连接池是否工作
+    async with pool.acquire() as connection:
+        await connection.fetchval("SELECT 1")
+    return pool
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     应用生命周期管理器
     初始化和清理应用资源
     """
-    global db_pool
+    global db_pool, db_replica_pool
+    check_stateless_config()
     logger.info("初始化数据库连接池...")
     
     try:
@@ -38,21 +70,7 @@ async def lifespan(app: FastAPI):
         postgres_url = settings.postgres_url
         
         # 创建连接池，增加超时设置和重试机制
-        db_pool = await asyncpg.create_pool(
-            dsn=postgres_url,
-            min_size=settings.DB_POOL_MIN_SIZE,
-            max_size=settings.DB_POOL_MAX_SIZE,
-            command_timeout=30,  # 减少命令超时时间
-            server_settings={'jit': 'off'},
-            # 增加连接超时和重试设置
-            timeout=10,  # 连接超时时间
-            connection_class=None,  # 使用默认连接类
-        )
-        
-        # 测试连接池是否工作
-        async with db_pool.acquire() as connection:
-            await connection.fetchval("SELECT 1")
-            
+        db_pool = await _create_pool(postgres_url, settings.DB_POOL_MIN_SIZE, settings.DB_POOL_MAX_SIZE)
         logger.info("数据库连接池创建成功")
         
     except ImportError as e:
@@ -66,40 +84,47 @@ async def lifespan(app: FastAPI):
         logger.error(f"数据库连接池创建失败: {e}")
         logger.info("回退到 Supabase REST API")
         db_pool = None
+
+    # 只读副本连接池（仅在主库可用时启用，副本不可用不影响启动）
+    if db_pool and settings.DATABASE_REPLICA_URL:
+        try:
+            db_replica_pool = await _create_pool(
+                settings.DATABASE_REPLICA_URL,
+                settings.DB_REPLICA_POOL_MIN_SIZE,
+                settings.DB_REPLICA_POOL_MAX_SIZE,
+            )
+            logger.info("只读副本连接池创建成功")
+        except Exception as e:
+            logger.warning(f"只读副本连接池创建失败，只读查询将使用主库: {e}")
+            db_replica_pool = None
     
-    # 初始化AI智能体系统 v2.0
-    logger.info("🤖 正在初始化AI智能体系统 v2.0...")
-    try:
-        from app.core.config import settings
-        from app.agents.v2.config import init_v2_from_settings, config_manager
-        
-        logger.info("📦 导入v2配置模块成功")
-        logger.info(f"🔑 API密钥已配置: {'是' if settings.OPENAI_API_KEY else '否'}")
-        
-        success = await init_v2_from_settings(settings)
-        logger.info(f"🎯 v2初始化结果: {success}")
-        
-        if success:
-            # 获取并显示配置状态
-            status = config_manager.get_config_status()
-            logger.info(f"📊 配置状态: {status}")
-            logger.info("✅ AI智能体系统 v2.0 初始化成功")
-            logger.info("🎯 专注功能: 留学规划与咨询")
-            logger.info("🤖 可用智能体: 留学规划师, 留学咨询师")
-        else:
-            logger.warning("⚠️ AI智能体系统 v2.0 初始化失败，将使用降级模式")
-            
-    except Exception as e:
-        logger.error(f"❌ AI智能体系统 v2.0 初始化异常: {e}")
-        logger.error("📋 异常详情:")
-        import traceback
-        traceback.print_exc()
-        logger.info("🔄 应用将继续启动，但AI功能可能不可用")
+    # 专业关系图在后台从参考表加载，加载完成前匹配打分使用内置数据
+    major_taxonomy.start()
+
+    # AI智能体系统 v2.0 在后台预热，不阻塞启动；预热完成前的智能体请求会等待同一次初始化
+    from app.agents.v2 import loader as agent_loader
+    agent_loader.start_warmup()
 
     # 应用运行期间
     yield
     
     # 清理资源
+    await agent_loader.stop_warmup()
+    password_hasher.shutdown()
+    await major_taxonomy.stop()
+    await popular_mentors.stop()
+    if "app.core.batch_matching" in sys.modules:
+        await sys.modules["app.core.batch_matching"].batch_matching_job.stop()
+    if "app.core.mentor_index" in sys.modules:
+        await sys.modules["app.core.mentor_index"].mentor_index.stop()
+    if "app.core.mentor_embeddings" in sys.modules:
+        await sys.modules["app.core.mentor_embeddings"].mentor_embeddings.stop()
+
+    if db_replica_pool:
+        logger.info("关闭只读副本连接池...")
+        await db_replica_pool.close()
+        db_replica_pool = None
+
     if db_pool:
         logger.info("关闭数据库连接池...")
         await db_pool.close()
@@ -107,6 +132,7 @@ async def lifespan(app: FastAPI):
     
     # 关闭 Supabase 客户端
     await close_supabase_client()
+    shutdown_supabase_executor()
     logger.info("Supabase 客户端已关闭")
 
 
@@ -156,14 +182,27 @@ def is_db_pool_available() -> bool:
     return db_pool is not None
 
 
+def get_lazy_connection() -> LazyConnection:
+    """
+    创建惰性连接句柄：首次查询时才从连接池获取连接，查询结束立即归还
+    配置了只读副本时，句柄的只读查询（read_connection）会路由到副本连接池
+    """
+    if not db_pool:
+        raise RuntimeError("数据库连接池未初始化")
+    return LazyConnection(db_pool, replica_pool=db_replica_pool)
+
+
 async def get_db_or_supabase():
     """
     获取可用的数据库访问方式
-    优先使用连接池，如果不可用则使用 Supabase 客户端
+    优先使用连接池（惰性获取连接），如果不可用则使用 Supabase 客户端
     """
     if db_pool:
-        async with db_pool.acquire() as connection:
+        connection = get_lazy_connection()
+        try:
             yield connection, "postgres"
+        finally:
+            await connection.close()
     else:
         client = await get_supabase_client()
         yield client, "supabase"
@@ -0,0 +1,165 @@
+"""
+请求级截止时间（deadline）
+请求中间件根据路由为每个请求设置截止时间，之后的数据库查询、Supabase 调用、LLM 调用和工具调用
+都以 "剩余时间" 与各自默认超时中的较小值作为超时，到期后取消等待并抛出 DeadlineExceeded。
+注定超时的请求不再继续占用连接池连接和模型 token。
+
+截止时间保存在 ContextVar 中，在请求处理协程及其创建的子任务中自动可见；
+请求之外（脚本、后台任务）没有截止时间，各调用按原有默认超时执行。
+"""
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 截止时间（time.monotonic() 时间点），None 表示不限
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """请求截止时间已到"""
+
+    def __init__(self, message: str = "请求处理超时"):
+        super().__init__(message)
+        self.message = message
+
+
+def route_timeout(path: str) -> Optional[float]:
+    """
+    按路径前缀查找路由的超时秒数（最长前缀优先），未匹配时使用 REQUEST_TIMEOUT_SECONDS
+    智能体相关路由默认使用 AGENT_TIMEOUT_SECONDS；REQUEST_TIMEOUT_OVERRIDES 可覆盖任意前缀，值 <= 0 表示不限
+    """
+    routes = {
+        "/api/v2/agents": settings.AGENT_TIMEOUT_SECONDS,
+        "/api/v1/planner": settings.AGENT_TIMEOUT_SECONDS,
+        **settings.REQUEST_TIMEOUT_OVERRIDES,
+    }
+    seconds = settings.REQUEST_TIMEOUT_SECONDS
+    matched = ""
+    for prefix, value in routes.items():
+        if path.startswith(prefix) and len(prefix) > len(matched):
+            matched, seconds = prefix, value
+    if seconds is None or seconds <= 0:
+        return None
+    return float(seconds)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[float]]:
+    """在块内设置截止时间；已有更早的截止时间时保留较早者"""
+    current = _deadline.get()
+    deadline = current
+    if seconds is not None:
+        candidate = time.monotonic() + seconds
+        deadline = candidate if current is None else min(current, candidate)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """剩余秒数（可能为负），未设置截止时间时返回 None"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline() -> None:
+    """截止时间已到时抛出 DeadlineExceeded，用于在发起下一次调用前快速失败"""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded()
+
+
+def timeout_for(default: Optional[float] = None) -> Optional[float]:
+    """
+    本次调用应使用的超时：剩余时间与默认超时中的较小值
+    截止时间已到时直接抛出 DeadlineExceeded
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded()
+    return left if default is None else min(left, default)
+
+
+def expired(slack: float = 0.01) -> bool:
+    """截止时间是否已到（slack 容忍事件循环定时器的精度误差）"""
+    left = remaining()
+    return left is not None and left <= slack
+
+
+async def with_deadline(awaitable: Awaitable[T], default: Optional[float] = None) -> T:
+    """
+    在截止时间内等待 awaitable，超时取消并抛出异常：
+    由请求截止时间导致的超时抛出 DeadlineExceeded，由默认超时导致的抛出 asyncio.TimeoutError
+    """
+    try:
+        timeout = timeout_for(default)
+    except DeadlineExceeded:
+        # 未等待的协程需要关闭，避免 "coroutine was never awaited" 警告
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise
+    if timeout is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError as e:
+        raise translate_timeout(e) from None
+
+
+def translate_timeout(error: BaseException) -> BaseException:
+    """把由截止时间导致的底层超时异常（asyncpg / httpx 等）转换为 DeadlineExceeded，其余原样返回"""
+    if isinstance(error, DeadlineExceeded) or not expired():
+        return error
+    return DeadlineExceeded()
+
+
+class DeadlineMiddleware:
+    """
+    ASGI 中间件：按路由设置请求截止时间，到期取消请求处理
+    响应尚未开始时返回 504；流式响应已开始发送时直接结束响应
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        with deadline_scope(route_timeout(scope["path"])):
+            try:
+                await with_deadline(self.app(scope, receive, send_wrapper))
+            except DeadlineExceeded:
+                logger.warning(f"请求超过截止时间，已取消: {scope.get('method')} {scope['path']}")
+                if response_started:
+                    return
+                await JSONResponse(
+                    status_code=504,
+                    content={"detail": "请求处理超时，请稍后重试"},
+                )(scope, receive, send)
@@ -0,0 +1,74 @@
+"""
+字符三元组（trigram）模糊匹配
+大学 / 专业名称的相似度按 PostgreSQL pg_trgm 扩展 similarity() 的规则计算，
+SQL 打分与 Python 打分（内存索引、Supabase 路径）使用同一套规则与阈值，相同名称得到相同结果：
+
+- 名称转小写后按非字母数字字符切分为单词，每个单词前补两个空格、后补一个空格，取所有连续三个字符；
+- 相似度 = 共同三元组数 / 两者三元组并集大小。
+
+名称的三元组集合带缓存，同一导师的名称在多次请求之间只拆分一次；
+TrigramIndex 按三元组建立倒排索引，只对至少有一个共同三元组的名称计算相似度。
+"""
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Set
+
+# 模糊匹配阈值（SQL 与 Python 共用）
+UNIVERSITY_SIMILARITY_THRESHOLD = 0.6
+MAJOR_SIMILARITY_THRESHOLD = 0.6
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+@lru_cache(maxsize=65536)
+def trigrams(text: str) -> FrozenSet[str]:
+    """名称的三元组集合（与 pg_trgm show_trgm 一致）"""
+    grams: Set[str] = set()
+    for word in _WORD.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def similarity(a: str, b: str) -> float:
+    """两个名称的三元组相似度 (0-1)"""
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    shared = len(grams_a & grams_b)
+    return shared / (len(grams_a) + len(grams_b) - shared)
+
+
+class TrigramIndex:
+    """名称的三元组倒排索引"""
+
+    def __init__(self):
+        self._grams: Dict[str, FrozenSet[str]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+
+    def add(self, value: str) -> None:
+        if value in self._grams:
+            return
+        grams = trigrams(value)
+        self._grams[value] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(value)
+
+    def search(self, query: str, threshold: float) -> Dict[str, float]:
+        """返回与 query 相似度不低于 threshold 的名称及其相似度"""
+        query_grams = trigrams(query)
+        if not query_grams:
+            return {}
+        shared: Dict[str, int] = {}
+        for gram in query_grams:
+            for value in self._postings.get(gram, ()):
+                shared[value] = shared.get(value, 0) + 1
+        matches = {}
+        for value, count in shared.items():
+            score = count / (len(query_grams) + len(self._grams[value]) - count)
+            if score >= threshold:
+                matches[value] = score
+        return matches
+
+    def __len__(self) -> int:
+        return len(self._grams)
@@ -0,0 +1,180 @@
+"""
+按需获取、尽早归还的数据库连接句柄
+请求依赖注入时不再占用连接池连接：每次查询时才从连接池获取连接，查询结束立即归还。
+在 transaction() 或 pinned() 块内，连接会被固定直到块结束，保证事务内的多条语句使用同一连接。
+这样处理函数中的 bcrypt、文件写入、LLM 调用等慢操作不会占用连接池名额。
+
+配置了只读副本时，read_connection() 返回绑定副本连接池的句柄供只读查询使用；
+本请求一旦写入过主库（或处于事务/固定块内），只读查询也留在主库，保证读到自己的写入。
+
+请求设置了截止时间时，获取连接与每条查询的超时不超过剩余时间（见 app/core/deadline.py）。
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+from app.core.config import settings
+from app.core.deadline import remaining, timeout_for, translate_timeout
+from app.core.metrics import db_metrics
+
+# 会修改数据的语句关键字（用于判断本请求是否已写入主库）
+_WRITE_KEYWORDS = {"INSERT", "UPDATE", "DELETE", "UPSERT", "MERGE", "CREATE", "ALTER", "DROP", "TRUNCATE", "COPY"}
+
+
+def _is_write(method: str, query: str) -> bool:
+    if method in ("execute", "executemany"):
+        return True
+    keyword = query.lstrip().split(None, 1)[0].upper() if query.strip() else ""
+    if keyword == "WITH":
+        # CTE 中包含写操作时同样视为写入
+        upper = query.upper()
+        return any(f"{kw} " in upper for kw in ("INSERT", "UPDATE", "DELETE"))
+    return keyword in _WRITE_KEYWORDS
+
+
+def query_timeout() -> Optional[float]:
+    """本次查询的超时：有请求截止时间时取剩余时间与 DB_COMMAND_TIMEOUT 的较小值，否则返回 None（使用连接池的 command_timeout）"""
+    if remaining() is None:
+        return None
+    return timeout_for(settings.DB_COMMAND_TIMEOUT)
+
+
+class LazyConnection:
+    """与 asyncpg 连接接口兼容（fetch/fetchrow/fetchval/execute/executemany/transaction）的惰性连接句柄"""
+
+    def __init__(self, pool: Any, replica_pool: Any = None):
+        self._pool = pool
+        self._replica_pool = replica_pool
+        self._replica: Optional["LazyConnection"] = None
+        self._pinned: Optional[Any] = None
+        self._pin_depth = 0
+        self._has_written = False
+
+    @property
+    def is_holding(self) -> bool:
+        """当前是否持有连接（仅在事务或固定块内为 True）"""
+        return self._pinned is not None
+
+    def replica(self, consistent: bool = True) -> "LazyConnection":
+        """
+        只读查询使用的句柄：未配置副本、处于事务/固定块内，或本请求已写入主库（consistent=True）时返回自身（主库），
+        否则返回绑定副本连接池的惰性句柄。
+        consistent=False 用于读取与本请求写入无关的数据（如写入匹配请求后计算导师得分）
+        """
+        if self._replica_pool is None or self._pinned is not None:
+            return self
+        if consistent and self._has_written:
+            return self
+        if self._replica is None:
+            self._replica = LazyConnection(self._replica_pool)
+        return self._replica
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[Any]:
+        """获取底层连接：固定块内复用已固定的连接，否则临时获取并在退出时归还"""
+        if self._pinned is not None:
+            yield self._pinned
+            return
+        conn = await self._acquire()
+        try:
+            yield conn
+        finally:
+            await self._release(conn)
+
+    @asynccontextmanager
+    async def pinned(self) -> AsyncIterator[Any]:
+        """在块内固定同一个连接（可嵌套），块结束后立即归还"""
+        if self._pinned is not None:
+            self._pin_depth += 1
+            try:
+                yield self._pinned
+            finally:
+                self._pin_depth -= 1
+            return
+
+        conn = await self._acquire()
+        self._pinned = conn
+        self._pin_depth = 1
+        try:
+            yield conn
+        finally:
+            self._pin_depth = 0
+            self._pinned = None
+            await self._release(conn)
+
+    @asynccontextmanager
+    async def transaction(self, **kwargs) -> AsyncIterator[Any]:
+        """显式事务块：固定连接并开启事务，用法与 asyncpg 的 conn.transaction() 相同"""
+        # 事务一般包含写入，之后的读取留在主库
+        self._has_written = True
+        async with self.pinned() as conn:
+            async with conn.transaction(**kwargs):
+                yield conn
+
+    async def _acquire(self) -> Any:
+        start = time.perf_counter()
+        try:
+            conn = await self._pool.acquire(timeout=timeout_for())
+        except asyncio.TimeoutError as e:
+            raise translate_timeout(e) from None
+        db_metrics.record_acquire((time.perf_counter() - start) * 1000)
+        return conn
+
+    async def _release(self, conn: Any) -> None:
+        try:
+            await self._pool.release(conn)
+        finally:
+            db_metrics.record_release()
+
+    async def _run(self, method: str, query: str, *args, **kwargs):
+        if not self._has_written and _is_write(method, query):
+            self._has_written = True
+        timeout = kwargs.pop("timeout", None) or query_timeout()
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        async with self.connection() as conn:
+            start = time.perf_counter()
+            error = False
+            try:
+                return await getattr(conn, method)(query, *args, **kwargs)
+            except asyncio.TimeoutError as e:
+                error = True
+                raise translate_timeout(e) from None
+            except Exception:
+                error = True
+                raise
+            finally:
+                db_metrics.record_query(query, (time.perf_counter() - start) * 1000, error=error)
+
+    async def fetch(self, query: str, *args, **kwargs):
+        return await self._run("fetch", query, *args, **kwargs)
+
+    async def fetchrow(self, query: str, *args, **kwargs):
+        return await self._run("fetchrow", query, *args, **kwargs)
+
+    async def fetchval(self, query: str, *args, **kwargs):
+        return await self._run("fetchval", query, *args, **kwargs)
+
+    async def execute(self, query: str, *args, **kwargs):
+        return await self._run("execute", query, *args, **kwargs)
+
+    async def executemany(self, command: str, args, **kwargs):
+        return await self._run("executemany", command, args, **kwargs)
+
+    async def close(self) -> None:
+        """请求结束时调用，归还仍被固定的连接（正常情况下不会发生）"""
+        if self._pinned is not None:
+            conn = self._pinned
+            self._pinned = None
+            self._pin_depth = 0
+            await self._release(conn)
+        if self._replica is not None:
+            await self._replica.close()
+
+
+def read_connection(conn: Any, consistent: bool = True) -> Any:
+    """只读 CRUD 查询使用的连接：惰性句柄路由到只读副本（若可用），其他连接原样返回"""
+    if isinstance(conn, LazyConnection):
+        return conn.replica(consistent=consistent)
+    return conn
@@ -0,0 +1,236 @@
+"""
+专业关系图
+"相关专业"与"同一学科大类"原先有两份数据：SQL 打分读取 major_relations / major_categories 表，
+Supabase 路径的 _are_related_majors 每次调用都重建一份写死的映射并线性扫描。这里统一为一个组件：
+
+- 从 major_relations 与 major_categories 表加载，专业与学科大类分别编号，建立邻接表；
+- 预先计算相关专业对集合，两个专业是否相关、是否同属一个大类都是 O(1) 查找；
+- SQL 打分把目标专业的相关专业 / 同大类专业作为参数传入，内存索引与 Supabase 路径直接查找，三条路径使用同一份数据。
+
+专业名称按小写比较（SQL 中为 LOWER(mr.major)）。应用启动时在后台加载；参考表有变更（通过
+/api/v1/admin/cache/invalidate 使 major_relations / major_categories 失效）时，get() 等待重新加载完成，
+保证按新表版本号缓存的匹配结果使用新数据；仅超过 MAJOR_TAXONOMY_REFRESH_SECONDS 时在后台重新加载。
+尚未加载或读取失败时使用内置的专业关系（原 _are_related_majors 中的映射）。
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from app.core.cache import query_cache
+from app.core.config import settings
+from app.core.lazy_connection import read_connection
+
+logger = logging.getLogger(__name__)
+
+TAXONOMY_TABLES = ("major_relations", "major_categories")
+RELATIONS_QUERY = "SELECT major1, major2 FROM major_relations"
+CATEGORIES_QUERY = "SELECT major, category FROM major_categories"
+
+# 内置专业关系：同一组内的专业两两相关（参考表不可用时使用，create_matching_tables.sql 中有相同的初始数据）
+BUILTIN_RELATED_MAJORS = {
+    'computer science': ['software engineering', 'information technology', 'data science', 'artificial intelligence'],
+    'business administration': ['management', 'marketing', 'finance', 'economics'],
+    'electrical engineering': ['computer engineering', 'electronics', 'telecommunications'],
+    'mechanical engineering': ['aerospace engineering', 'automotive engineering', 'robotics'],
+    'psychology': ['cognitive science', 'behavioral science', 'neuroscience'],
+    'biology': ['biotechnology', 'biochemistry', 'bioinformatics', 'molecular biology'],
+    'chemistry': ['chemical engineering', 'materials science', 'pharmaceutical science'],
+    'mathematics': ['statistics', 'actuarial science', 'applied mathematics', 'data science'],
+    'physics': ['astronomy', 'astrophysics', 'engineering physics', 'materials science']
+}
+
+
+class MajorTaxonomy:
+    """专业关系图：专业 / 学科大类编号、邻接表与预先计算的相关专业对"""
+
+    def __init__(self, relations: Iterable[Tuple[str, str]], categories: Iterable[Tuple[str, str]], source: str = "builtin"):
+        self.source = source
+        self.major_ids: Dict[str, int] = {}
+        self.majors: List[str] = []
+        self.category_ids: Dict[str, int] = {}
+        self.categories: List[str] = []
+        adjacency: List[Set[int]] = []
+        major_categories: List[Set[int]] = []
+        members: List[Set[int]] = []
+
+        def major_id(name: str) -> int:
+            key = name.lower()
+            if key not in self.major_ids:
+                self.major_ids[key] = len(self.majors)
+                self.majors.append(key)
+                adjacency.append(set())
+                major_categories.append(set())
+            return self.major_ids[key]
+
+        for major1, major2 in relations:
+            if not major1 or not major2:
+                continue
+            a, b = major_id(major1), major_id(major2)
+            if a != b:
+                adjacency[a].add(b)
+                adjacency[b].add(a)
+        for major, category in categories:
+            if not major or not category:
+                continue
+            m = major_id(major)
+            c = self.category_ids.get(category)
+            if c is None:
+                c = self.category_ids[category] = len(self.categories)
+                self.categories.append(category)
+                members.append(set())
+            major_categories[m].add(c)
+            members[c].add(m)
+
+        self.adjacency: List[FrozenSet[int]] = [frozenset(ids) for ids in adjacency]
+        self.major_categories: List[FrozenSet[int]] = [frozenset(ids) for ids in major_categories]
+        self.members: List[FrozenSet[int]] = [frozenset(ids) for ids in members]
+        self.related_pairs: FrozenSet[Tuple[int, int]] = frozenset(
+            (a, b) for a, neighbors in enumerate(self.adjacency) for b in neighbors
+        )
+
+    @classmethod
+    def builtin(cls) -> "MajorTaxonomy":
+        relations = []
+        for base, related in BUILTIN_RELATED_MAJORS.items():
+            group = [base, *related]
+            relations.extend((a, b) for i, a in enumerate(group) for b in group[i + 1:])
+        return cls(relations, [], source="builtin")
+
+    def are_related(self, major1: str, major2: str) -> bool:
+        """两个专业是否为相关专业"""
+        a, b = self.major_ids.get(major1.lower()), self.major_ids.get(major2.lower())
+        return a is not None and b is not None and (a, b) in self.related_pairs
+
+    def share_category(self, major1: str, major2: str) -> bool:
+        """两个专业是否同属一个学科大类"""
+        a, b = self.major_ids.get(major1.lower()), self.major_ids.get(major2.lower())
+        return a is not None and b is not None and not self.major_categories[a].isdisjoint(self.major_categories[b])
+
+    def related_to(self, targets: Iterable[str]) -> FrozenSet[str]:
+        """与任一目标专业相关的专业（小写名称）"""
+        ids: Set[int] = set()
+        for target in targets:
+            m = self.major_ids.get(target.lower())
+            if m is not None:
+                ids |= self.adjacency[m]
+        return frozenset(self.majors[m] for m in ids)
+
+    def same_category_as(self, targets: Iterable[str]) -> FrozenSet[str]:
+        """与任一目标专业同属一个学科大类的专业（小写名称，含目标专业本身）"""
+        ids: Set[int] = set()
+        for target in targets:
+            m = self.major_ids.get(target.lower())
+            if m is not None:
+                for c in self.major_categories[m]:
+                    ids |= self.members[c]
+        return frozenset(self.majors[m] for m in ids)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"source": self.source, "majors": len(self.majors), "categories": len(self.categories),
+                "relations": len(self.related_pairs) // 2}
+
+
+class MajorTaxonomyManager:
+    """管理专业关系图的加载与刷新"""
+
+    def __init__(self):
+        # 从参考表加载之前使用内置数据
+        self.current = MajorTaxonomy.builtin()
+        self._task: Optional[asyncio.Task] = None
+        self._versions: Optional[Dict[str, int]] = None
+        self._loaded_at: Optional[float] = None
+        self._stats = {"loads": 0, "errors": 0, "last_load_ms": 0.0}
+
+    async def load(self, db_conn: Dict[str, Any]) -> MajorTaxonomy:
+        """从参考表加载专业关系图；读取失败时保留当前数据"""
+        started = time.perf_counter()
+        versions = await query_cache.table_versions(*TAXONOMY_TABLES)
+        try:
+            if db_conn["type"] == "asyncpg":
+                conn = db_conn["connection"]
+                relations = [(row["major1"], row["major2"]) for row in await conn.fetch(RELATIONS_QUERY)]
+                categories = [(row["major"], row["category"]) for row in await conn.fetch(CATEGORIES_QUERY)]
+            else:
+                client = db_conn["connection"]
+                # 分页读取，避免超过 PostgREST max-rows 的部分被截断
+                relations = [(row["major1"], row["major2"]) for row in await client.select_all("major_relations", "id,major1,major2")]
+                categories = [(row["major"], row["category"]) for row in await client.select_all("major_categories", "id,major,category")]
+            self.current = MajorTaxonomy(relations, categories, source="tables")
+            self._stats["loads"] += 1
+            self._stats["last_load_ms"] = (time.perf_counter() - started) * 1000
+            logger.info(f"专业关系图已加载: {self.current.get_stats()}")
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"加载专业关系图失败，继续使用{'内置' if self.current.source == 'builtin' else '当前'}数据: {e}")
+        # 失败时同样记录，按刷新间隔重试
+        self._versions = versions
+        self._loaded_at = time.monotonic()
+        return self.current
+
+    async def _reload(self) -> None:
+        from app.core import db
+        versions = await query_cache.table_versions(*TAXONOMY_TABLES)
+        try:
+            if db.is_db_pool_available():
+                conn = db.get_lazy_connection()
+                try:
+                    await self.load({"type": "asyncpg", "connection": read_connection(conn, consistent=False)})
+                finally:
+                    await conn.close()
+            else:
+                from app.core.supabase_client import get_supabase_client
+                await self.load({"type": "supabase", "connection": await get_supabase_client()})
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"重新加载专业关系图失败: {e}")
+            # 失败时同样记录，按刷新间隔重试
+            self._versions = versions
+            self._loaded_at = time.monotonic()
+
+    def start(self) -> None:
+        """在后台加载（应用启动时调用，不阻塞启动）"""
+        if self._task is None or self._task.done():
+            # 在空上下文中加载：不继承触发请求的截止时间
+            self._task = asyncio.get_running_loop().create_task(self._reload(), context=contextvars.Context())
+
+    async def get(self) -> MajorTaxonomy:
+        """
+        当前专业关系图：参考表有变更时等待重新加载完成（匹配结果按表版本号缓存，不能用旧数据计算新版本的结果）；
+        等待的加载可能在变更之前就已读表，加载完成后再次比较版本号，仍不一致时继续加载。
+        超过刷新间隔时在后台重新加载，本次调用使用当前数据
+        """
+        changed = False
+        while self._versions is not None and await query_cache.table_versions(*TAXONOMY_TABLES) != self._versions:
+            changed = True
+            if self._task is None or self._task.done():
+                self.start()
+            # 多个请求等待同一次加载；请求取消不影响加载
+            await asyncio.shield(self._task)
+        if not changed and (self._task is None or self._task.done()) and (
+            self._loaded_at is None or time.monotonic() - self._loaded_at > settings.MAJOR_TAXONOMY_REFRESH_SECONDS
+        ):
+            self.start()
+        return self.current
+
+    async def stop(self) -> None:
+        """应用关闭时取消尚未完成的加载"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            **self.current.get_stats(),
+            "age_seconds": time.monotonic() - self._loaded_at if self._loaded_at is not None else None,
+        }
+
+
+# 全局专业关系图
+major_taxonomy = MajorTaxonomyManager()
@@ -0,0 +1,429 @@
+"""
+导师语义检索
+导师匹配原先只比较大学 / 专业名称，导师资料中的 description 与 learning_goals 不参与打分。这里：
+
+- 导师资料写入或修改时，在后台通过 EmbeddingManager 为 description + learning_goals 计算一次嵌入，
+  保存到 mentor_embeddings 表（见 scripts/database/create_mentor_embeddings.sql），文本未变化时不重复计算；
+- 各进程把向量加载为按行归一化的 float32 矩阵，检索时查询向量与整个矩阵做一次矩阵-向量乘法，
+  再用 argpartition 取相似度最高的 top-k，不逐个导师比较；
+- 查询文本的嵌入按文本缓存，条件相同的检索只调用一次嵌入模型。
+
+mentor_embeddings 表有变更（本进程或其他进程写入后缓存版本号递增）时在后台重新加载，请求继续使用当前索引。
+嵌入模型不可用（未安装 openai）或表不存在时检索返回空结果，语义分项为 0，不影响其余打分。
+
+补齐已有导师的嵌入：python -m app.core.mentor_embeddings [--batch-size N]（仅支持 PostgreSQL 直连）
+语义检索默认关闭（MATCHING_SEMANTIC_ENABLED=false）：补齐嵌入后再启用，关闭时写入导师资料也不计算嵌入。
+NumPy 在第一次加载索引或计算嵌入时才导入，CRUD 模块可以直接导入本模块调用 mentor_embeddings.schedule。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterable, List, Optional, Set
+
+from app.core.cache import query_cache
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
+from app.core.lazy_connection import read_connection
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TABLE = "mentor_embeddings"
+LOAD_QUERY = "SELECT mentor_relationship_id, text_hash, embedding FROM mentor_embeddings WHERE model = $1"
+PROFILES_QUERY = "SELECT id, description, learning_goals FROM mentorship_relationships"
+UPSERT_SQL = """
+    INSERT INTO mentor_embeddings (mentor_relationship_id, model, text_hash, embedding, updated_at)
+    VALUES ($1, $2, $3, $4, NOW())
+    ON CONFLICT (mentor_relationship_id) DO UPDATE
+    SET model = EXCLUDED.model, text_hash = EXCLUDED.text_hash,
+        embedding = EXCLUDED.embedding, updated_at = NOW()
+"""
+DELETE_SQL = "DELETE FROM mentor_embeddings WHERE mentor_relationship_id = ANY($1)"
+
+# 每次调用嵌入模型的文本数
+EMBED_BATCH_SIZE = 64
+# 查询文本嵌入缓存条数
+QUERY_CACHE_SIZE = 256
+
+
+def profile_text(row: Dict[str, Any]) -> str:
+    """导师资料中参与语义检索的文本（description + learning_goals，压缩空白）"""
+    parts = (row.get("description"), row.get("learning_goals"))
+    return "\n".join(" ".join(str(part).split()) for part in parts if part and str(part).strip())
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _normalize(vectors: Any) -> np.ndarray:
+    """转为 float32 并按行 L2 归一化；零向量（提供商出错时返回的占位结果）保持为零"""
+    import numpy as np
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class EmbeddingIndex:
+    """归一化向量矩阵上的 top-k 内积（余弦相似度）检索"""
+
+    def __init__(self, dim: Optional[int] = None):
+        import numpy as np
+        self.dim = dim
+        self.ids: List[Any] = []
+        self.pos_by_id: Dict[Any, int] = {}
+        self.hashes: Dict[Any, str] = {}
+        self.matrix = np.zeros((16, dim or 0), dtype=np.float32)
+        self.active = np.zeros(16, dtype=bool)
+
+    @classmethod
+    def from_rows(cls, ids: List[Any], hashes: List[str], matrix: np.ndarray) -> "EmbeddingIndex":
+        index = cls(matrix.shape[1] if len(ids) else None)
+        for mentor_id, vector_hash, vector in zip(ids, hashes, matrix):
+            index.upsert(mentor_id, vector, vector_hash)
+        return index
+
+    def _grow(self, size: int) -> None:
+        import numpy as np
+        capacity = len(self.active)
+        if size <= capacity:
+            return
+        new_capacity = max(size, capacity * 2)
+        matrix = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        matrix[:capacity] = self.matrix
+        active = np.zeros(new_capacity, dtype=bool)
+        active[:capacity] = self.active
+        self.matrix, self.active = matrix, active
+
+    def upsert(self, mentor_id: Any, vector: np.ndarray, vector_hash: str) -> None:
+        """写入一名导师的归一化向量；零向量视为无效，移除该导师"""
+        if not vector.any():
+            self.remove(mentor_id)
+            return
+        if self.dim is None:
+            import numpy as np
+            self.dim = vector.shape[0]
+            self.matrix = np.zeros((len(self.active), self.dim), dtype=np.float32)
+        elif vector.shape[0] != self.dim:
+            raise ValueError(f"嵌入维度不一致: {vector.shape[0]} != {self.dim}")
+        pos = self.pos_by_id.get(mentor_id)
+        if pos is None:
+            pos = len(self.ids)
+            self.ids.append(mentor_id)
+            self.pos_by_id[mentor_id] = pos
+            self._grow(len(self.ids))
+        self.matrix[pos] = vector
+        self.active[pos] = True
+        self.hashes[mentor_id] = vector_hash
+
+    def remove(self, mentor_id: Any) -> None:
+        pos = self.pos_by_id.get(mentor_id)
+        if pos is not None:
+            self.active[pos] = False
+        self.hashes.pop(mentor_id, None)
+
+    @property
+    def size(self) -> int:
+        return int(self.active[:len(self.ids)].sum())
+
+    def search(self, query: np.ndarray, k: int) -> Dict[Any, float]:
+        """返回与归一化查询向量最相近的 k 名导师 {导师资料ID: 相似度}（只含相似度为正的导师）"""
+        import numpy as np
+        n = len(self.ids)
+        if n == 0 or k <= 0 or query.shape[0] != self.dim:
+            return {}
+        scores = self.matrix[:n] @ query
+        scores[~self.active[:n]] = -np.inf
+        k = min(k, n)
+        top = np.argpartition(scores, n - k)[n - k:]
+        return {self.ids[pos]: float(scores[pos]) for pos in top if scores[pos] > 0}
+
+
+async def _embed(texts: List[str]) -> Optional[np.ndarray]:
+    """通过 EmbeddingManager 计算归一化嵌入；模型不可用时返回 None"""
+    # 按需导入智能体模块，避免拖慢启动
+    from app.agents.v2.ai_foundation.llm.manager import ModelConfig, ModelProvider, embedding_manager
+
+    model = settings.MATCHING_EMBEDDING_MODEL
+    if model not in embedding_manager.models:
+        await embedding_manager.initialize([
+            ModelConfig(name=model, provider=ModelProvider.OPENAI, api_key=settings.OPENAI_API_KEY)
+        ])
+    if getattr(embedding_manager.providers.get(model), "client", None) is None:
+        # 未安装 openai 时提供商返回固定的占位向量，不能用于检索
+        return None
+    return _normalize(await embedding_manager.embed_texts("system", model, texts))
+
+
+@asynccontextmanager
+async def _connect(db_conn: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """使用传入的连接，或按部署方式获取连接（有连接池时直连，否则走 Supabase REST 客户端）"""
+    if db_conn is not None:
+        yield db_conn
+        return
+    from app.core import db
+    if db.is_db_pool_available():
+        conn = db.get_lazy_connection()
+        try:
+            yield {"type": "asyncpg", "connection": conn}
+        finally:
+            await conn.close()
+    else:
+        from app.core.supabase_client import get_supabase_client
+        yield {"type": "supabase", "connection": await get_supabase_client()}
+
+
+async def _fetch_embeddings(db_conn: Dict[str, Any]) -> List[Dict[str, Any]]:
+    model = settings.MATCHING_EMBEDDING_MODEL
+    if db_conn["type"] == "asyncpg":
+        conn = read_connection(db_conn["connection"], consistent=False)
+        return [dict(row) for row in await conn.fetch(LOAD_QUERY, model)]
+    return await db_conn["connection"].select_all(
+        TABLE, "mentor_relationship_id,text_hash,embedding", {"model": model}, order="mentor_relationship_id.asc"
+    )
+
+
+class MentorEmbeddings:
+    """管理导师嵌入的计算、存储与内存检索索引"""
+
+    def __init__(self):
+        self.index: Optional[EmbeddingIndex] = None
+        self._lock = asyncio.Lock()
+        self._reload_task: Optional[asyncio.Task] = None
+        self._write_tasks: Set[asyncio.Task] = set()
+        self._table_version: Optional[int] = None
+        self._failed_at: Optional[float] = None
+        self._query_vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._stats = {"loads": 0, "embedded": 0, "query_embeddings": 0, "query_cache_hits": 0,
+                       "searches": 0, "errors": 0, "last_load_ms": 0.0, "last_search_ms": 0.0}
+
+    async def _version(self) -> int:
+        versions = await query_cache.table_versions(TABLE)
+        return versions[TABLE]
+
+    async def _load(self, db_conn: Optional[Dict[str, Any]] = None) -> None:
+        import numpy as np
+        started = time.perf_counter()
+        version = await self._version()
+        async with _connect(db_conn) as conn:
+            rows = await _fetch_embeddings(conn)
+        ids = [row["mentor_relationship_id"] for row in rows]
+        matrix = _normalize([row["embedding"] for row in rows]) if rows else np.zeros((0, 0), dtype=np.float32)
+        self.index = EmbeddingIndex.from_rows(ids, [row["text_hash"] for row in rows], matrix)
+        self._table_version = version
+        self._stats["loads"] += 1
+        self._stats["last_load_ms"] = (time.perf_counter() - started) * 1000
+        logger.info(f"导师语义索引已加载: {self.index.size} 名导师，耗时 {self._stats['last_load_ms']:.1f}ms")
+
+    async def _reload_in_background(self) -> None:
+        try:
+            async with self._lock:
+                await self._load()
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"导师语义索引重新加载失败，继续使用当前索引: {e}")
+
+    async def get(self) -> EmbeddingIndex:
+        """
+        获取语义检索索引：尚未加载时同步加载；
+        已加载但 mentor_embeddings 有变更时在后台重新加载，本次请求使用当前索引
+        """
+        if self.index is None:
+            if self._failed_at is not None and time.monotonic() - self._failed_at < settings.MATCHING_INDEX_REFRESH_SECONDS:
+                raise RuntimeError("导师语义索引暂不可用")
+            async with self._lock:
+                if self.index is None:
+                    try:
+                        await self._load()
+                    except Exception:
+                        self._stats["errors"] += 1
+                        self._failed_at = time.monotonic()
+                        raise
+            return self.index
+
+        if (self._reload_task is None or self._reload_task.done()) and await self._version() != self._table_version:
+            # 在空上下文中加载：不继承触发请求的截止时间
+            self._reload_task = asyncio.get_running_loop().create_task(
+                self._reload_in_background(), context=contextvars.Context()
+            )
+        return self.index
+
+    async def _query_vector(self, text: str) -> Optional[np.ndarray]:
+        vector = self._query_vectors.get(text)
+        if vector is not None:
+            self._query_vectors.move_to_end(text)
+            self._stats["query_cache_hits"] += 1
+            return vector
+        vectors = await _embed([text])
+        if vectors is None or not vectors[0].any():
+            return None
+        self._stats["query_embeddings"] += 1
+        self._query_vectors[text] = vectors[0]
+        if len(self._query_vectors) > QUERY_CACHE_SIZE:
+            self._query_vectors.popitem(last=False)
+        return vectors[0]
+
+    async def search(self, text: str, k: Optional[int] = None) -> Dict[Any, float]:
+        """
+        返回资料文本与 text 语义最相近的 k 名导师 {mentorship_relationships.id: 余弦相似度}
+        未启用、尚无导师嵌入或嵌入模型不可用时返回空字典
+        """
+        if not settings.MATCHING_SEMANTIC_ENABLED or not text.strip():
+            return {}
+        try:
+            index = await self.get()
+            if index.size == 0:
+                return {}
+            query = await self._query_vector(text)
+            if query is None:
+                return {}
+            started = time.perf_counter()
+            results = index.search(query, k or settings.MATCHING_SEMANTIC_TOP_K)
+            self._stats["searches"] += 1
+            self._stats["last_search_ms"] = (time.perf_counter() - started) * 1000
+            return results
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"导师语义检索不可用，语义分项按 0 计算: {e}")
+            return {}
+
+    async def embed_profiles(self, rows: Iterable[Dict[str, Any]], db_conn: Optional[Dict[str, Any]] = None,
+                             batch_size: int = EMBED_BATCH_SIZE) -> int:
+        """
+        为导师资料计算并保存嵌入（rows 需含 id、description、learning_goals），返回新计算的数量
+        文本与已保存的嵌入一致时跳过；文本为空时删除已保存的嵌入
+        """
+        model = settings.MATCHING_EMBEDDING_MODEL
+        known = self.index.hashes if self.index is not None else {}
+        pending: Dict[Any, str] = {}
+        cleared: List[Any] = []
+        for row in rows:
+            text = profile_text(row)
+            if not text:
+                cleared.append(row["id"])
+            elif known.get(row["id"]) != text_hash(text):
+                pending[row["id"]] = text
+        if not pending and not cleared:
+            return 0
+
+        embedded = 0
+        async with _connect(db_conn) as conn:
+            ids = list(pending)
+            for start in range(0, len(ids), batch_size):
+                batch = ids[start:start + batch_size]
+                vectors = await _embed([pending[mentor_id] for mentor_id in batch])
+                if vectors is None:
+                    logger.info("嵌入模型不可用，跳过导师资料嵌入")
+                    break
+                records = [
+                    (mentor_id, text_hash(pending[mentor_id]), vector)
+                    for mentor_id, vector in zip(batch, vectors) if vector.any()
+                ]
+                if conn["type"] == "asyncpg":
+                    await conn["connection"].executemany(UPSERT_SQL, [
+                        (mentor_id, model, vector_hash, vector.tolist()) for mentor_id, vector_hash, vector in records
+                    ])
+                else:
+                    await conn["connection"].upsert(TABLE, [
+                        {"mentor_relationship_id": mentor_id, "model": model, "text_hash": vector_hash,
+                         "embedding": vector.tolist()}
+                        for mentor_id, vector_hash, vector in records
+                    ], on_conflict="mentor_relationship_id")
+                if self.index is not None:
+                    for mentor_id, vector_hash, vector in records:
+                        self.index.upsert(mentor_id, vector, vector_hash)
+                embedded += len(records)
+            if cleared:
+                if conn["type"] == "asyncpg":
+                    await conn["connection"].execute(DELETE_SQL, cleared)
+                else:
+                    await conn["connection"].delete(TABLE, {"mentor_relationship_id": cleared})
+                if self.index is not None:
+                    for mentor_id in cleared:
+                        self.index.remove(mentor_id)
+
+        self._stats["embedded"] += embedded
+        await query_cache.invalidate(TABLE)
+        return embedded
+
+    async def _embed_in_background(self, rows: List[Dict[str, Any]]) -> None:
+        try:
+            await self.embed_profiles(rows)
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"导师资料嵌入失败: {e}")
+
+    def schedule(self, rows: Iterable[Optional[Dict[str, Any]]]) -> None:
+        """导师资料写入后在后台计算嵌入，不阻塞写请求"""
+        if not settings.MATCHING_SEMANTIC_ENABLED:
+            return
+        rows = [row for row in rows if row and row.get("id") is not None]
+        if not rows:
+            return
+        # 在空上下文中运行：不继承写请求的截止时间
+        task = asyncio.get_running_loop().create_task(self._embed_in_background(rows), context=contextvars.Context())
+        self._write_tasks.add(task)
+        task.add_done_callback(self._write_tasks.discard)
+
+    async def backfill(self, db_conn: Dict[str, Any], batch_size: int = EMBED_BATCH_SIZE) -> Dict[str, Any]:
+        """为所有尚无嵌入或资料已变化的导师补齐嵌入"""
+        started = time.perf_counter()
+        await self._load(db_conn)
+        profiles = [dict(row) for row in await db_conn["connection"].fetch(PROFILES_QUERY)]
+        embedded = await self.embed_profiles(profiles, db_conn, batch_size)
+        return {"profiles": len(profiles), "embedded": embedded, "indexed": self.index.size,
+                "elapsed_seconds": round(time.perf_counter() - started, 3)}
+
+    async def stop(self) -> None:
+        """应用关闭时取消尚未完成的加载与嵌入任务"""
+        tasks = [task for task in (self._reload_task, *self._write_tasks) if task is not None and not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._reload_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "enabled": settings.MATCHING_SEMANTIC_ENABLED,
+            "model": settings.MATCHING_EMBEDDING_MODEL,
+            "loaded": self.index is not None,
+            "mentors": self.index.size if self.index is not None else 0,
+            "dim": self.index.dim if self.index is not None else None,
+            "pending_writes": len(self._write_tasks),
+        }
+
+
+# 全局导师语义检索
+mentor_embeddings = MentorEmbeddings()
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    import asyncpg
+
+    conn = await asyncpg.connect(settings.postgres_url, command_timeout=None)
+    try:
+        return await mentor_embeddings.backfill({"type": "asyncpg", "connection": conn}, args.batch_size)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="为已有导师资料补齐语义检索嵌入")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="每次调用嵌入模型的文本数")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    print(json.dumps(asyncio.run(_main(parser.parse_args())), ensure_ascii=False, indent=2))
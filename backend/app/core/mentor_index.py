@@ -0,0 +1,437 @@
+"""
+导师匹配索引
+calculate_match_scores 原先每个请求都在 SQL 中对全部已认证导师逐行计算 LIKE 与关联子查询。
+这里把已认证导师常驻在进程内存中：
+
+- 大学 / 专业 / 学位按取值编码（倒排索引：取值 → 编码 → 行），语言与专长按取值维护行集合；
+- 大学 / 专业名称另建三元组索引，模糊匹配只比较有共同三元组的名称（规则与阈值见 fuzzy）；
+- 评分、会话数、大学排名保存在 NumPy 特征矩阵中；
+- 打分先在"取值表"上计算（不同大学 / 专业的数量远小于导师数），再按编码一次性映射到所有导师，
+  各分项与总分都是向量运算，结果与 MATCH_SCORES 查询一致（评分为空时排序按 0 处理）。
+
+刷新：首次使用时全量构建；之后检测到 mentorship_relationships 的缓存版本号变化（crud 写操作会递增）
+或超过 MATCHING_INDEX_REFRESH_SECONDS 时，在后台按 updated_at 增量拉取变更的导师，请求继续使用当前索引；
+导师数量与数据库不一致（如删除）或超过 MATCHING_INDEX_FULL_REBUILD_SECONDS 时全量重建。
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.cache import query_cache
+from app.core.config import settings
+from app.core.fuzzy import MAJOR_SIMILARITY_THRESHOLD, UNIVERSITY_SIMILARITY_THRESHOLD, TrigramIndex
+from app.core.lazy_connection import read_connection
+from app.core.major_taxonomy import MajorTaxonomy, major_taxonomy
+
+logger = logging.getLogger(__name__)
+
+# 参与打分的导师字段与展示字段
+MENTOR_SELECT = """
+    SELECT mr.*, u.username, p.full_name, p.avatar_url
+    FROM mentorship_relationships mr
+    JOIN users u ON mr.user_id = u.id
+    LEFT JOIN profiles p ON u.id = p.user_id
+"""
+FULL_QUERY = MENTOR_SELECT + " WHERE mr.verification_status = 'verified'"
+# 增量：导师资料、用户名或头像在水位之后有变化的行（含已取消认证的行，用于从索引移除）
+# 水位回退 60 秒，覆盖水位之前开始、之后才提交的事务（重复拉取的行按 id 覆盖）
+DELTA_QUERY = MENTOR_SELECT + """
+    WHERE mr.updated_at > $1::timestamptz - INTERVAL '60 seconds'
+       OR u.updated_at > $1::timestamptz - INTERVAL '60 seconds'
+       OR p.updated_at > $1::timestamptz - INTERVAL '60 seconds'
+"""
+COUNT_QUERY = """
+    SELECT COUNT(*) FROM mentorship_relationships mr
+    JOIN users u ON mr.user_id = u.id
+    WHERE mr.verification_status = 'verified'
+"""
+
+# 打分权重（与 crud_matching.MATCH_SCORES 一致）；语义分项由调用方按导师资料ID传入
+SCORE_FIELDS = (
+    "university_match", "major_match", "degree_match", "rating_score",
+    "language_match", "experience_bonus", "specialty_bonus", "semantic_match",
+)
+ADJACENT_DEGREE_SCORES = {
+    ("master", "phd"): 0.1, ("phd", "master"): 0.1,
+    ("bachelor", "master"): 0.05, ("master", "bachelor"): 0.05,
+}
+
+
+class _Vocab:
+    """取值编码表，编码 0 保留给空值"""
+
+    def __init__(self):
+        self.values: List[Optional[str]] = [None]
+        self.codes: Dict[str, int] = {}
+
+    def code(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class MentorIndex:
+    """已认证导师的内存匹配索引"""
+
+    def __init__(self):
+        self.rows: List[Optional[Dict[str, Any]]] = []
+        self.pos_by_id: Dict[Any, int] = {}
+        self.universities = _Vocab()
+        self.majors = _Vocab()
+        self.degrees = _Vocab()
+        # 大学 / 专业名称的三元组索引（模糊匹配）
+        self.university_trigrams = TrigramIndex()
+        self.major_trigrams = TrigramIndex()
+        self.languages: Dict[str, Set[int]] = {}
+        self.specialties: Dict[str, Set[int]] = {}
+        capacity = 16
+        self.active = np.zeros(capacity, dtype=bool)
+        self.university_code = np.zeros(capacity, dtype=np.int32)
+        self.major_code = np.zeros(capacity, dtype=np.int32)
+        self.degree_code = np.zeros(capacity, dtype=np.int32)
+        self.rating = np.zeros(capacity, dtype=np.float64)
+        self.sessions = np.zeros(capacity, dtype=np.int64)
+        self.has_ranking = np.zeros(capacity, dtype=bool)
+        # 参考数据：大学排名；相关专业与学科大类来自专业关系图（打分时可传入最新的关系图）
+        self.rankings: Dict[str, float] = {}
+        self.taxonomy: MajorTaxonomy = major_taxonomy.current
+
+    # ---- 写入 ----
+    def _grow(self, size: int) -> None:
+        capacity = len(self.active)
+        if size <= capacity:
+            return
+        new_capacity = max(size, capacity * 2)
+        for name in ("active", "university_code", "major_code", "degree_code", "rating", "sessions", "has_ranking"):
+            old = getattr(self, name)
+            grown = np.zeros(new_capacity, dtype=old.dtype)
+            grown[:capacity] = old
+            setattr(self, name, grown)
+
+    def _unlink(self, pos: int) -> None:
+        row = self.rows[pos]
+        for postings, values in ((self.languages, row.get("languages")), (self.specialties, row.get("specialties"))):
+            for value in values or ():
+                postings.get(value, set()).discard(pos)
+        self.rows[pos] = None
+        self.active[pos] = False
+
+    def upsert(self, row: Dict[str, Any]) -> None:
+        """写入或更新一名导师；未认证的导师从索引中移除"""
+        mentor_id = row["id"]
+        pos = self.pos_by_id.get(mentor_id)
+        if pos is not None and self.rows[pos] is not None:
+            self._unlink(pos)
+        if row.get("verification_status") != "verified":
+            return
+        if pos is None:
+            pos = len(self.rows)
+            self.rows.append(None)
+            self.pos_by_id[mentor_id] = pos
+            self._grow(len(self.rows))
+
+        self.rows[pos] = row
+        self.active[pos] = True
+        self.university_code[pos] = self.universities.code(row.get("university"))
+        self.major_code[pos] = self.majors.code(row.get("major"))
+        self.degree_code[pos] = self.degrees.code(row.get("degree_level"))
+        for trigram_index, value in ((self.university_trigrams, row.get("university")), (self.major_trigrams, row.get("major"))):
+            if value:
+                trigram_index.add(value)
+        self.rating[pos] = float(row["rating"]) if row.get("rating") is not None else 0.0
+        self.sessions[pos] = int(row.get("total_sessions") or 0)
+        self.has_ranking[pos] = row.get("university_ranking") is not None
+        for postings, values in ((self.languages, row.get("languages")), (self.specialties, row.get("specialties"))):
+            for value in values or ():
+                postings.setdefault(value, set()).add(pos)
+
+    def remove(self, mentor_id: Any) -> None:
+        pos = self.pos_by_id.get(mentor_id)
+        if pos is not None and self.rows[pos] is not None:
+            self._unlink(pos)
+
+    @property
+    def size(self) -> int:
+        return int(self.active[:len(self.rows)].sum())
+
+    # ---- 打分 ----
+    def _mask(self, postings: Dict[str, Set[int]], values: Iterable[str], n: int) -> np.ndarray:
+        mask = np.zeros(n, dtype=bool)
+        positions: Set[int] = set()
+        for value in values:
+            positions |= postings.get(value, set())
+        if positions:
+            mask[list(positions)] = True
+        return mask
+
+    def _similar(self, trigram_index: TrigramIndex, targets: List[str], threshold: float) -> Set[str]:
+        similar: Set[str] = set()
+        for target in targets:
+            similar.update(trigram_index.search(target, threshold))
+        return similar
+
+    def _university_scores(self, targets: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """按大学取值计算 (精确 / 部分 / 模糊匹配得分, 同档次标记)"""
+        target_set = set(targets)
+        lowered = [t.lower() for t in targets]
+        similar = self._similar(self.university_trigrams, targets, UNIVERSITY_SIMILARITY_THRESHOLD)
+        target_ranks = np.array([self.rankings[t] for t in targets if t in self.rankings], dtype=np.float64)
+        scores = np.zeros(len(self.universities), dtype=np.float64)
+        same_tier = np.zeros(len(self.universities), dtype=bool)
+        for code, value in enumerate(self.universities.values[1:], start=1):
+            if value in target_set:
+                scores[code] = 0.3
+            else:
+                low = value.lower()
+                if any(t in low or low in t for t in lowered):
+                    scores[code] = 0.2
+                elif value in similar:
+                    scores[code] = 0.15
+            rank = self.rankings.get(value)
+            if rank is not None and target_ranks.size:
+                same_tier[code] = bool(np.any(np.abs(target_ranks - rank) <= 50))
+        return scores, same_tier
+
+    def _major_scores(self, targets: List[str], taxonomy: MajorTaxonomy) -> np.ndarray:
+        target_set = set(targets)
+        lowered = [t.lower() for t in targets]
+        similar = self._similar(self.major_trigrams, targets, MAJOR_SIMILARITY_THRESHOLD)
+        related = taxonomy.related_to(targets)
+        same_category = taxonomy.same_category_as(targets)
+        scores = np.zeros(len(self.majors), dtype=np.float64)
+        for code, value in enumerate(self.majors.values[1:], start=1):
+            low = value.lower()
+            if value in target_set:
+                scores[code] = 0.25
+            elif low in related:
+                scores[code] = 0.18
+            elif low in same_category:
+                scores[code] = 0.12
+            elif any(t in low or low in t for t in lowered) or value in similar:
+                scores[code] = 0.08
+        return scores
+
+    def _degree_scores(self, degree_level: str) -> np.ndarray:
+        scores = np.zeros(len(self.degrees), dtype=np.float64)
+        for code, value in enumerate(self.degrees.values[1:], start=1):
+            if value == degree_level:
+                scores[code] = 0.2
+            else:
+                scores[code] = ADJACENT_DEGREE_SCORES.get((degree_level, value), 0.0)
+        return scores
+
+    def score(self, request: Any, limit: int = 50, semantic: Optional[Dict[Any, float]] = None,
+              taxonomy: Optional[MajorTaxonomy] = None) -> List[Dict[str, Any]]:
+        """
+        对全部已认证导师打分，返回得分最高的 limit 名（字段与 MATCH_SCORES 查询结果一致）
+        semantic 为语义分项 {导师资料ID: 得分}（mentor_embeddings 检索出的 top-k），其余导师该分项为 0；
+        taxonomy 默认使用构建索引时加载的专业关系图
+        """
+        n = len(self.rows)
+        if n == 0:
+            return []
+        active = self.active[:n]
+
+        uni_scores, same_tier = self._university_scores(request.target_universities)
+        uni_codes = self.university_code[:n]
+        university = np.maximum(uni_scores[uni_codes], np.where(same_tier[uni_codes] & self.has_ranking[:n], 0.15, 0.0))
+        major = self._major_scores(request.target_majors, taxonomy or self.taxonomy)[self.major_code[:n]]
+        degree = self._degree_scores(request.degree_level)[self.degree_code[:n]]
+        rating = self.rating[:n] / 5.0 * 0.15
+        if request.preferred_languages is None:
+            language = np.full(n, 0.1)
+        else:
+            language = np.where(self._mask(self.languages, request.preferred_languages, n), 0.1, 0.0)
+        sessions = self.sessions[:n]
+        experience = np.select([sessions >= 50, sessions >= 20, sessions >= 5], [0.05, 0.03, 0.01], 0.0)
+        specialty = np.where(self._mask(self.specialties, request.service_categories or [], n), 0.05, 0.0)
+        semantic_match = np.zeros(n, dtype=np.float64)
+        for mentor_id, value in (semantic or {}).items():
+            pos = self.pos_by_id.get(mentor_id)
+            if pos is not None:
+                semantic_match[pos] = value
+
+        components = (university, major, degree, rating, language, experience, specialty, semantic_match)
+        total = np.sum(components, axis=0)
+
+        candidates = np.flatnonzero(active)
+        if candidates.size > limit:
+            # 先按总分取前 limit 名（含与第 limit 名同分的行），再按 (总分, 评分, 会话数) 精确排序
+            threshold = np.partition(total[candidates], candidates.size - limit)[candidates.size - limit]
+            candidates = candidates[total[candidates] >= threshold]
+        order = np.lexsort((-sessions[candidates], -self.rating[candidates], -total[candidates]))
+        top = candidates[order][:limit]
+
+        results = []
+        for pos in top:
+            match = dict(self.rows[pos])
+            for name, values in zip(SCORE_FIELDS, components):
+                match[name] = float(values[pos])
+            match["total_score"] = float(total[pos])
+            results.append(match)
+        return results
+
+
+async def _load_reference(conn: Any, index: MentorIndex) -> None:
+    """
+    加载大学排名与专业关系图
+    排名优先读取匹配特征物化视图，视图不存在时读取参考表，表也不存在时同档次分项为 0；
+    专业关系图读取失败时使用当前（或内置）数据
+    """
+    try:
+        try:
+            rows = await conn.fetch("SELECT university, ranking FROM university_match_features")
+        except Exception as e:
+            logger.info(f"匹配特征物化视图不可用，读取参考表: {e}")
+            rows = await conn.fetch("SELECT university, ranking FROM university_rankings WHERE ranking IS NOT NULL")
+        for row in rows:
+            index.rankings[row["university"]] = float(row["ranking"])
+    except Exception as e:
+        logger.warning(f"加载大学排名失败，同档次分项将为 0: {e}")
+    index.taxonomy = await major_taxonomy.load({"type": "asyncpg", "connection": conn})
+
+
+async def build_index(conn: Any) -> MentorIndex:
+    """从数据库全量构建导师匹配索引（参考数据 + 全部已认证导师）"""
+    index = MentorIndex()
+    await _load_reference(conn, index)
+    for row in await conn.fetch(FULL_QUERY):
+        index.upsert(dict(row))
+    return index
+
+
+class MentorIndexManager:
+    """管理导师匹配索引的构建与刷新"""
+
+    def __init__(self):
+        self.index: Optional[MentorIndex] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._table_version: Optional[int] = None
+        self._watermark: Optional[datetime] = None
+        self._checked_at = 0.0
+        self._built_at = 0.0
+        self._failed_at: Optional[float] = None
+        self._stats = {"full_builds": 0, "delta_refreshes": 0, "delta_rows": 0, "errors": 0,
+                       "last_build_ms": 0.0, "last_delta_ms": 0.0}
+
+    async def _version(self) -> int:
+        versions = await query_cache.table_versions("mentorship_relationships")
+        return versions["mentorship_relationships"]
+
+    async def _full_build(self, conn: Any) -> None:
+        started = time.perf_counter()
+        version = await self._version()
+        watermark = await conn.fetchval("SELECT NOW()")
+        index = await build_index(conn)
+        self.index = index
+        self._table_version = version
+        self._watermark = watermark
+        self._built_at = self._checked_at = time.monotonic()
+        self._stats["full_builds"] += 1
+        self._stats["last_build_ms"] = (time.perf_counter() - started) * 1000
+        logger.info(f"导师匹配索引已构建: {index.size} 名导师，耗时 {self._stats['last_build_ms']:.1f}ms")
+
+    async def _delta_refresh(self, conn: Any) -> None:
+        started = time.perf_counter()
+        version = await self._version()
+        watermark = await conn.fetchval("SELECT NOW()")
+        rows = await conn.fetch(DELTA_QUERY, self._watermark)
+        for row in rows:
+            self.index.upsert(dict(row))
+        verified = await conn.fetchval(COUNT_QUERY)
+        if verified != self.index.size:
+            # 有导师被删除或用户被删除，增量无法感知，全量重建
+            await self._full_build(conn)
+            return
+        self._table_version = version
+        self._watermark = watermark
+        self._checked_at = time.monotonic()
+        self._stats["delta_refreshes"] += 1
+        self._stats["delta_rows"] += len(rows)
+        self._stats["last_delta_ms"] = (time.perf_counter() - started) * 1000
+
+    async def _refresh_in_background(self) -> None:
+        from app.core import db
+        conn = db.get_lazy_connection()
+        try:
+            reader = read_connection(conn, consistent=False)
+            async with self._lock:
+                if time.monotonic() - self._built_at > settings.MATCHING_INDEX_FULL_REBUILD_SECONDS:
+                    await self._full_build(reader)
+                else:
+                    await self._delta_refresh(reader)
+        except Exception as e:
+            self._stats["errors"] += 1
+            self._checked_at = time.monotonic()
+            logger.warning(f"导师匹配索引刷新失败，继续使用当前索引: {e}")
+        finally:
+            await conn.close()
+
+    async def _is_stale(self) -> bool:
+        if time.monotonic() - self._checked_at > settings.MATCHING_INDEX_REFRESH_SECONDS:
+            return True
+        return await self._version() != self._table_version
+
+    async def get(self, conn: Any) -> MentorIndex:
+        """
+        获取导师匹配索引：尚未构建时用传入的连接同步构建；
+        已构建但有变更时在后台刷新，本次请求使用当前索引
+        """
+        if self.index is None:
+            if self._failed_at is not None and time.monotonic() - self._failed_at < settings.MATCHING_INDEX_REFRESH_SECONDS:
+                # 构建刚失败过，调用方直接回退到 SQL 打分，避免每个请求都重试全量构建
+                raise RuntimeError("导师匹配索引暂不可用")
+            async with self._lock:
+                if self.index is None:
+                    try:
+                        await self._full_build(conn)
+                    except Exception:
+                        self._stats["errors"] += 1
+                        self._failed_at = time.monotonic()
+                        raise
+            return self.index
+
+        if (self._refresh_task is None or self._refresh_task.done()) and await self._is_stale():
+            # 在空上下文中刷新：不继承触发请求的截止时间
+            self._refresh_task = asyncio.get_running_loop().create_task(
+                self._refresh_in_background(), context=contextvars.Context()
+            )
+        return self.index
+
+    async def stop(self) -> None:
+        """应用关闭时取消尚未完成的刷新任务"""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._refresh_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "enabled": settings.MATCHING_INDEX_ENABLED,
+            "built": self.index is not None,
+            "mentors": self.index.size if self.index is not None else 0,
+            "refreshing": self._refresh_task is not None and not self._refresh_task.done(),
+            "age_seconds": time.monotonic() - self._built_at if self.index is not None else None,
+        }
+
+
+# 全局导师匹配索引
+mentor_index = MentorIndexManager()
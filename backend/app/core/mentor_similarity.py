@@ -0,0 +1,302 @@
+"""
+基于历史行为的导师相似度
+get_similar_background_mentors 原先每次请求都读取用户的背景信息，再用一条 SQL 按大学 / 专业 / 学位实时筛选导师。
+这里改为离线构建相似度矩阵，请求时只在内存中查找：
+
+- 离线任务从已完成的会话（mentorship_sessions）、导师评价（reviews）与匹配历史（mentorship_relationships）
+  汇总学生-导师交互权重，按导师列归一化后计算导师-导师余弦相似度，每名导师保留最相似的 top-k 个已认证导师；
+- 学生-导师推荐分 = 学生交互过的导师 × 各导师的相似导师，排除已交互的导师，每名学生保留 top-k；
+- 两个稀疏矩阵以 CSR 数组（indptr / indices / data）保存为一个 .npz 文件（MATCHING_SIMILARITY_PATH），
+  先写临时文件再替换，各进程检测到文件更新后重新加载；
+- 请求时按学生 ID 定位到 CSR 中的一行（已按分数降序），遍历并跳过排除的导师，不查询数据库。
+
+交互历史越多，相似度越准确；没有交互历史的学生仍按背景信息查询。
+
+离线构建（建议每晚定时执行）：python -m app.core.mentor_similarity [--top-k N] [--output PATH]
+仅支持 PostgreSQL 直连（asyncpg）。
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
+from app.core.lazy_connection import read_connection
+
+logger = logging.getLogger(__name__)
+
+# 学生-导师交互权重：已完成会话每次 1；导师评价按评分（2 分及以下为 0，5 分为 1）；
+# 匹配历史中待确认的匹配 0.2，已建立的指导关系 1
+INTERACTIONS_QUERY = """
+    SELECT student_id, mentor_id, SUM(weight)::float8 AS weight
+    FROM (
+        SELECT student_id, mentor_id, 1.0 AS weight
+        FROM mentorship_sessions
+        WHERE status = 'completed'
+        UNION ALL
+        SELECT reviewer_id, target_id, GREATEST(rating - 2, 0) / 3.0
+        FROM reviews
+        WHERE review_type = 'mentor' AND rating IS NOT NULL
+        UNION ALL
+        SELECT student_id, mentor_id, CASE WHEN status = 'pending' THEN 0.2 ELSE 1.0 END
+        FROM mentorship_relationships
+        WHERE student_id IS NOT NULL
+    ) interactions
+    WHERE student_id IS NOT NULL AND mentor_id IS NOT NULL
+    GROUP BY student_id, mentor_id
+    HAVING SUM(weight) > 0
+"""
+VERIFIED_QUERY = "SELECT id FROM mentorship_relationships WHERE verification_status = 'verified'"
+
+# 每名学生参与计算的交互数上限（按权重取最高的），限制导师对的数量
+MAX_ITEMS_PER_STUDENT = 100
+
+
+def _aggregate(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, n_cols: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """合并相同 (行, 列) 的值"""
+    keys = rows.astype(np.int64) * n_cols + cols
+    unique, inverse = np.unique(keys, return_inverse=True)
+    sums = np.bincount(inverse, weights=values, minlength=len(unique))
+    return unique // n_cols, unique % n_cols, sums
+
+
+def _top_k_csr(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, n_rows: int,
+               k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """每行保留值最大的 k 项，返回按行内值降序排列的 CSR (indptr, indices, data)"""
+    order = np.lexsort((cols, -values, rows))
+    rows, cols, values = rows[order], cols[order], values[order]
+    counts = np.bincount(rows, minlength=n_rows)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    keep = np.arange(len(rows)) - starts[rows] < k
+    rows, cols, values = rows[keep], cols[keep], values[keep]
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols.astype(np.int32), values.astype(np.float32)
+
+
+def _expand(indptr: np.ndarray, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """把 positions 中每一项展开为其所在 CSR 行的全部元素：返回 (positions 下标, 元素下标)"""
+    lengths = indptr[positions + 1] - indptr[positions]
+    source = np.repeat(np.arange(len(positions)), lengths)
+    offsets = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return source, np.repeat(indptr[positions], lengths) + offsets
+
+
+def build_similarity(student_ids: Iterable[int], mentor_ids: Iterable[int], weights: Iterable[float],
+                     verified_ids: Optional[Iterable[int]] = None, k: int = 50) -> Dict[str, np.ndarray]:
+    """
+    由学生-导师交互 (student_ids[i], mentor_ids[i], weights[i]) 构建导师-导师与学生-导师相似度矩阵
+    verified_ids 给出时，只推荐其中的导师；返回可直接保存为 .npz 的数组
+    """
+    students = np.asarray(list(student_ids), dtype=np.int64)
+    mentors = np.asarray(list(mentor_ids), dtype=np.int64)
+    values = np.asarray(list(weights), dtype=np.float64)
+    student_keys, student_idx = np.unique(students, return_inverse=True)
+    mentor_keys, mentor_idx = np.unique(mentors, return_inverse=True)
+    n_students, n_mentors = len(student_keys), len(mentor_keys)
+
+    # 学生-导师交互矩阵 R（每名学生按权重保留前 MAX_ITEMS_PER_STUDENT 项）
+    s, m, w = _aggregate(student_idx, mentor_idx, values, max(n_mentors, 1))
+    positive = w > 0
+    r_indptr, r_indices, r_data = _top_k_csr(s[positive], m[positive], w[positive], n_students, MAX_ITEMS_PER_STUDENT)
+    entry_rows = np.repeat(np.arange(n_students), np.diff(r_indptr))
+
+    # 导师-导师余弦相似度：R 按导师列归一化后，同一学生交互过的导师两两相乘并累加
+    norms = np.sqrt(np.bincount(r_indices, weights=r_data.astype(np.float64) ** 2, minlength=n_mentors))
+    normalized = r_data / norms[r_indices]
+    source, other = _expand(r_indptr, entry_rows)
+    a, b = r_indices[source], r_indices[other]
+    pair_values = normalized[source] * normalized[other]
+    candidate = a != b
+    if verified_ids is not None:
+        candidate &= np.isin(mentor_keys[b], np.asarray(list(verified_ids), dtype=np.int64))
+    a, b, sims = _aggregate(a[candidate], b[candidate], pair_values[candidate], max(n_mentors, 1))
+    mm_indptr, mm_indices, mm_data = _top_k_csr(a, b, sims, n_mentors, k)
+
+    # 学生-导师推荐分：学生交互过的每个导师，按交互权重 × 相似度累加其相似导师，排除已交互的导师
+    source, position = _expand(mm_indptr, r_indices)
+    rows, cols = entry_rows[source], mm_indices[position].astype(np.int64)
+    scores = r_data[source].astype(np.float64) * mm_data[position]
+    seen = entry_rows.astype(np.int64) * n_mentors + r_indices
+    fresh = ~np.isin(rows * n_mentors + cols, seen)
+    rows, cols, scores = _aggregate(rows[fresh], cols[fresh], scores[fresh], max(n_mentors, 1))
+    sm_indptr, sm_indices, sm_data = _top_k_csr(rows, cols, scores, n_students, k)
+
+    return {
+        "student_ids": student_keys, "mentor_ids": mentor_keys,
+        "mm_indptr": mm_indptr, "mm_indices": mm_indices, "mm_data": mm_data,
+        "sm_indptr": sm_indptr, "sm_indices": sm_indices, "sm_data": sm_data,
+        "interactions": np.asarray([len(r_data)], dtype=np.int64),
+        "built_at": np.asarray([time.time()]),
+    }
+
+
+def save_similarity(arrays: Dict[str, np.ndarray], path: str) -> None:
+    """写入临时文件后替换，读取方不会读到写了一半的文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+class SimilarityMatrix:
+    """内存中的导师-导师 / 学生-导师相似度（CSR，行内按分数降序）"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.mentor_ids = arrays["mentor_ids"]
+        self.student_ids = arrays["student_ids"]
+        self.mm = (arrays["mm_indptr"], arrays["mm_indices"], arrays["mm_data"])
+        self.sm = (arrays["sm_indptr"], arrays["sm_indices"], arrays["sm_data"])
+        self.built_at = float(arrays["built_at"][0])
+        self.interactions = int(arrays["interactions"][0])
+        self.mentor_pos = {int(mentor_id): i for i, mentor_id in enumerate(self.mentor_ids.tolist())}
+        self.student_pos = {int(student_id): i for i, student_id in enumerate(self.student_ids.tolist())}
+
+    @classmethod
+    def load(cls, path: str) -> "SimilarityMatrix":
+        with np.load(path) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def _row(self, csr: Tuple[np.ndarray, np.ndarray, np.ndarray], pos: Optional[int], limit: int,
+             exclude_ids: Optional[Iterable[int]]) -> List[Tuple[int, float]]:
+        if pos is None or limit <= 0:
+            return []
+        indptr, indices, data = csr
+        excluded = set(exclude_ids or ())
+        results: List[Tuple[int, float]] = []
+        start, end = int(indptr[pos]), int(indptr[pos + 1])
+        for col, score in zip(indices[start:end].tolist(), data[start:end].tolist()):
+            mentor_id = int(self.mentor_ids[col])
+            if mentor_id in excluded:
+                continue
+            results.append((mentor_id, score))
+            if len(results) >= limit:
+                break
+        return results
+
+    def similar_mentors(self, mentor_id: int, limit: int, exclude_ids: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        """与导师相似度最高的导师 [(mentorship_relationships.id, 余弦相似度)]"""
+        return self._row(self.mm, self.mentor_pos.get(mentor_id), limit, exclude_ids)
+
+    def recommend(self, student_id: int, limit: int, exclude_ids: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        """学生推荐分最高的导师 [(mentorship_relationships.id, 推荐分)]；没有交互历史的学生返回空列表"""
+        return self._row(self.sm, self.student_pos.get(student_id), limit, exclude_ids)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "students": len(self.student_ids), "mentors": len(self.mentor_ids), "interactions": self.interactions,
+            "mentor_pairs": int(len(self.mm[1])), "student_pairs": int(len(self.sm[1])),
+            "built_at": datetime.fromtimestamp(self.built_at, timezone.utc).isoformat(),
+        }
+
+
+class MentorSimilarity:
+    """加载离线构建的相似度矩阵，文件更新后重新加载"""
+
+    def __init__(self):
+        self.matrix: Optional[SimilarityMatrix] = None
+        self._mtime: Optional[float] = None
+        self._checked_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._stats = {"loads": 0, "lookups": 0, "hits": 0, "errors": 0, "last_load_ms": 0.0, "last_lookup_ms": 0.0}
+
+    async def get(self) -> Optional[SimilarityMatrix]:
+        """当前相似度矩阵；每 MATCHING_SIMILARITY_REFRESH_SECONDS 秒检查一次文件是否更新，尚未构建时返回 None"""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < settings.MATCHING_SIMILARITY_REFRESH_SECONDS:
+            return self.matrix
+        async with self._lock:
+            if self._checked_at is not None and now - self._checked_at < settings.MATCHING_SIMILARITY_REFRESH_SECONDS:
+                return self.matrix
+            self._checked_at = now
+            path = settings.MATCHING_SIMILARITY_PATH
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                return self.matrix
+            if mtime != self._mtime:
+                started = time.perf_counter()
+                # 在线程池中读取文件，不阻塞事件循环
+                self.matrix = await asyncio.get_running_loop().run_in_executor(None, SimilarityMatrix.load, path)
+                self._mtime = mtime
+                self._stats["loads"] += 1
+                self._stats["last_load_ms"] = (time.perf_counter() - started) * 1000
+                logger.info(f"导师相似度矩阵已加载: {self.matrix.get_stats()}")
+        return self.matrix
+
+    async def recommend(self, student_id: int, limit: int, exclude_ids: Optional[Iterable[int]] = None) -> List[int]:
+        """按交互历史推荐的导师 ID；矩阵未构建、读取失败或学生没有交互历史时返回空列表"""
+        try:
+            matrix = await self.get()
+            if matrix is None:
+                return []
+            started = time.perf_counter()
+            ids = [mentor_id for mentor_id, _ in matrix.recommend(student_id, limit, exclude_ids)]
+            self._stats["lookups"] += 1
+            self._stats["hits"] += bool(ids)
+            self._stats["last_lookup_ms"] = (time.perf_counter() - started) * 1000
+            return ids
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"导师相似度矩阵不可用: {e}")
+            return []
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, **(self.matrix.get_stats() if self.matrix is not None else {})}
+
+
+# 全局导师相似度
+mentor_similarity = MentorSimilarity()
+
+
+async def run_similarity_build(conn: Any, path: Optional[str] = None, k: Optional[int] = None) -> Dict[str, Any]:
+    """从交互历史构建相似度矩阵并保存，返回构建报告"""
+    path = path or settings.MATCHING_SIMILARITY_PATH
+    k = k or settings.MATCHING_SIMILARITY_TOP_K
+    started = time.perf_counter()
+    reader = read_connection(conn, consistent=False)
+    rows = await reader.fetch(INTERACTIONS_QUERY)
+    verified = [row["id"] for row in await reader.fetch(VERIFIED_QUERY)]
+    load_seconds = time.perf_counter() - started
+
+    arrays = build_similarity(
+        (row["student_id"] for row in rows), (row["mentor_id"] for row in rows),
+        (row["weight"] for row in rows), verified, k
+    )
+    save_similarity(arrays, path)
+    report = {
+        "path": path, "top_k": k, **SimilarityMatrix(arrays).get_stats(),
+        "bytes": os.path.getsize(path),
+        "load_seconds": round(load_seconds, 3),
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"导师相似度矩阵构建完成: {report}")
+    return report
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    import asyncpg
+
+    conn = await asyncpg.connect(settings.postgres_url, command_timeout=None)
+    try:
+        return await run_similarity_build(conn, args.output, args.top_k)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="从会话、评价与匹配历史构建导师相似度矩阵")
+    parser.add_argument("--top-k", type=int, default=None, help="每名导师 / 学生保留的相似导师数（默认 MATCHING_SIMILARITY_TOP_K）")
+    parser.add_argument("--output", default=None, help="输出文件（默认 MATCHING_SIMILARITY_PATH）")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    print(json.dumps(asyncio.run(_main(parser.parse_args())), ensure_ascii=False, indent=2))
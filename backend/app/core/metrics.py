@@ -0,0 +1,192 @@
+"""
+数据库与 Supabase 调用的运行指标
+记录连接池获取等待时间、占用连接数、每个请求的查询次数、按归一化 SQL 分组的耗时直方图以及慢查询日志，
+供管理员指标接口 /api/v1/admin/metrics 查看。
+"""
+import re
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+# 直方图桶上界（毫秒），最后一个桶为 +Inf
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERIES_PER_REQUEST_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# 最多单独统计的归一化查询数量，超出后归入 "<other>"
+MAX_TRACKED_QUERIES = 500
+
+_COMMENT_RE = re.compile(r"--[^\n]*")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![$\w])\d+(?:\.\d+)?\b")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """归一化 SQL：去掉注释，字面量替换为 ?，压缩空白"""
+    normalized = _COMMENT_RE.sub(" ", sql)
+    normalized = _STRING_RE.sub("?", normalized)
+    normalized = _NUMBER_RE.sub("?", normalized)
+    normalized = _WHITESPACE_RE.sub(" ", normalized).strip()
+    return normalized[:500]
+
+
+class Histogram:
+    """固定桶直方图"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def percentile(self, q: float) -> float:
+        """按桶估算分位数（返回所在桶的上界）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for i, bound in enumerate(self.buckets):
+            cumulative += self.counts[i]
+            if cumulative >= target:
+                return float(bound)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"le_{b}" for b in self.buckets] + ["le_inf"]
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+# 当前请求内的查询计数（由请求中间件设置）
+_request_query_count: ContextVar[Optional[List[int]]] = ContextVar("request_query_count", default=None)
+
+
+class DatabaseMetrics:
+    """数据库访问指标收集器"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.started_at = time.time()
+        self.acquire_wait = Histogram()
+        # 占用连接数是实时状态，重置时保留
+        self.connections_in_use = getattr(self, "connections_in_use", 0)
+        self.connections_in_use_peak = self.connections_in_use
+        self.queries_per_request = Histogram(QUERIES_PER_REQUEST_BUCKETS)
+        self.queries: Dict[str, Dict[str, Any]] = {}
+        self.slow_queries: deque = deque(maxlen=settings.SLOW_QUERY_LOG_SIZE)
+
+    # ---- 连接池 ----
+    def record_acquire(self, wait_ms: float) -> None:
+        self.acquire_wait.observe(wait_ms)
+        self.connections_in_use += 1
+        self.connections_in_use_peak = max(self.connections_in_use_peak, self.connections_in_use)
+
+    def record_release(self) -> None:
+        self.connections_in_use = max(0, self.connections_in_use - 1)
+
+    # ---- 查询 ----
+    def record_query(self, sql: str, elapsed_ms: float, source: str = "postgres", error: bool = False) -> None:
+        normalized = normalize_sql(sql)
+        key = f"{source}:{normalized}"
+        entry = self.queries.get(key)
+        if entry is None:
+            if len(self.queries) >= MAX_TRACKED_QUERIES:
+                key = f"{source}:<other>"
+                entry = self.queries.get(key)
+            if entry is None:
+                entry = {"source": source, "query": normalized, "errors": 0, "latency_ms": Histogram()}
+                self.queries[key] = entry
+        entry["latency_ms"].observe(elapsed_ms)
+        if error:
+            entry["errors"] += 1
+
+        counter = _request_query_count.get()
+        if counter is not None:
+            counter[0] += 1
+
+        if elapsed_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+            self.slow_queries.append({
+                "source": source,
+                "query": normalized,
+                "elapsed_ms": round(elapsed_ms, 2),
+                "error": error,
+                "at": time.time(),
+            })
+
+    # ---- 请求 ----
+    def begin_request(self):
+        """请求开始时调用，返回 end_request 需要的令牌"""
+        return _request_query_count.set([0])
+
+    def end_request(self, token) -> int:
+        """请求结束时调用，返回本请求执行的查询次数"""
+        counter = _request_query_count.get()
+        _request_query_count.reset(token)
+        count = counter[0] if counter else 0
+        self.queries_per_request.observe(count)
+        return count
+
+    def snapshot(self, pool: Any = None, top: int = 20, replica_pool: Any = None) -> Dict[str, Any]:
+        """导出指标快照；pool / replica_pool 为主库与只读副本的 asyncpg 连接池（可选）"""
+        pool_stats: Dict[str, Any] = {
+            "available": pool is not None,
+            "in_use": self.connections_in_use,
+            "in_use_peak": self.connections_in_use_peak,
+            "max_size": settings.DB_POOL_MAX_SIZE,
+        }
+        if pool is not None:
+            pool_stats["size"] = pool.get_size()
+            pool_stats["idle"] = pool.get_idle_size()
+        if replica_pool is not None:
+            pool_stats["replica"] = {
+                "size": replica_pool.get_size(),
+                "idle": replica_pool.get_idle_size(),
+                "max_size": settings.DB_REPLICA_POOL_MAX_SIZE,
+            }
+
+        ranked = sorted(self.queries.values(), key=lambda e: e["latency_ms"].total, reverse=True)
+        return {
+            "uptime_seconds": time.time() - self.started_at,
+            "pool": pool_stats,
+            "acquire_wait_ms": self.acquire_wait.to_dict(),
+            "queries_per_request": self.queries_per_request.to_dict(),
+            "queries": [
+                {
+                    "source": e["source"],
+                    "query": e["query"],
+                    "errors": e["errors"],
+                    "latency_ms": e["latency_ms"].to_dict(),
+                }
+                for e in ranked[:top]
+            ],
+            "slow_queries": list(self.slow_queries),
+            "slow_query_threshold_ms": settings.SLOW_QUERY_THRESHOLD_MS,
+        }
+
+
+# 全局指标实例
+db_metrics = DatabaseMetrics()
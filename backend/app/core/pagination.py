@@ -0,0 +1,155 @@
+"""
+游标（keyset）分页工具
+列表接口在原有 limit/offset 之外支持游标模式：响应头 X-Next-Cursor 返回下一页游标，
+客户端在下一次请求中通过 cursor 参数传回。游标对客户端不透明，内部是最后一行排序键的编码，
+查询用 WHERE (排序键) < (游标值) 代替 OFFSET，翻页深度不再影响查询耗时。
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, NamedTuple, Optional, Sequence
+
+from fastapi import HTTPException, Response, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class SortKey(NamedTuple):
+    """排序键：列名、方向，以及可选的空值替代值（非 None 时按 COALESCE(列, 默认值) 排序）"""
+    column: str
+    direction: str = "DESC"
+    default: Any = None
+
+    @property
+    def desc(self) -> bool:
+        return self.direction == "DESC"
+
+    def sql(self, alias: str = "") -> str:
+        column = f"{alias}.{self.column}" if alias else self.column
+        return column if self.default is None else f"COALESCE({column}, {self.default})"
+
+
+class InvalidCursorError(ValueError):
+    """游标格式错误或与当前排序方式不匹配"""
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"dec": str(value)}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "dec" in value:
+            return Decimal(value["dec"])
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """把排序键编码为不透明游标"""
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """解码游标，size 为期望的排序键个数"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise InvalidCursorError("无效的分页游标")
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError("分页游标与当前排序方式不匹配")
+    try:
+        return [_decode_value(v) for v in values]
+    except (TypeError, ValueError, ArithmeticError):
+        raise InvalidCursorError("无效的分页游标")
+
+
+def order_by_sql(keys: Sequence[SortKey], alias: str = "") -> str:
+    return "ORDER BY " + ", ".join(f"{key.sql(alias)} {key.direction}" for key in keys)
+
+
+def keyset_sql(keys: Sequence[SortKey], first_param: int, alias: str = "") -> str:
+    """
+    生成 "位于游标之后" 的 WHERE 条件，参数占位符从 $first_param 开始依次对应每个排序键
+    排序方向一致时使用行比较（可利用复合索引），方向不一致时展开为 OR 条件
+    """
+    exprs = [key.sql(alias) for key in keys]
+    placeholders = [f"${first_param + i}" for i in range(len(keys))]
+    if len({key.direction for key in keys}) == 1:
+        op = "<" if keys[0].desc else ">"
+        return f"({', '.join(exprs)}) {op} ({', '.join(placeholders)})"
+
+    branches = []
+    for i, key in enumerate(keys):
+        op = "<" if key.desc else ">"
+        equals = [f"{exprs[j]} = {placeholders[j]}" for j in range(i)]
+        branches.append("(" + " AND ".join(equals + [f"{exprs[i]} {op} {placeholders[i]}"]) + ")")
+    return "(" + " OR ".join(branches) + ")"
+
+
+def _postgrest_value(value: Any) -> str:
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    text = str(value)
+    return f'"{text}"' if any(ch in text for ch in ',()":') else text
+
+
+def keyset_postgrest(keys: Sequence[SortKey], values: Sequence[Any]) -> str:
+    """
+    生成 Supabase(PostgREST) or_() 过滤字符串，例如 created_at.lt.X,and(created_at.eq.X,id.lt.Y)
+    PostgREST 不支持 COALESCE，空值替代仅在 asyncpg 查询中生效
+    """
+    branches = []
+    for i, key in enumerate(keys):
+        op = "lt" if key.desc else "gt"
+        conditions = [f"{keys[j].column}.eq.{_postgrest_value(values[j])}" for j in range(i)]
+        conditions.append(f"{key.column}.{op}.{_postgrest_value(values[i])}")
+        branches.append(conditions[0] if len(conditions) == 1 else f"and({','.join(conditions)})")
+    return ",".join(branches)
+
+
+def _row_value(row: Any, key: str) -> Any:
+    if isinstance(row, dict):
+        return row.get(key)
+    return getattr(row, key, None)
+
+
+def next_cursor(rows: Sequence[Any], keys: Sequence[SortKey], limit: int) -> Optional[str]:
+    """本页已满时根据最后一行的排序键生成下一页游标，否则返回 None（没有更多数据）"""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    values = []
+    for key in keys:
+        value = _row_value(last, key.column)
+        values.append(key.default if value is None else value)
+    return encode_cursor(values)
+
+
+def parse_cursor_param(cursor: Optional[str], keys: Sequence[SortKey]) -> Optional[List[Any]]:
+    """路由层解析 cursor 查询参数，格式错误返回 400"""
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor, len(keys))
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def set_next_cursor(response: Response, rows: Sequence[Any], keys: Sequence[SortKey], limit: int) -> None:
+    """在响应头中返回下一页游标（偏移量模式的响应同样携带，客户端可随时切换到游标模式）"""
+    cursor = next_cursor(rows, keys, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -0,0 +1,159 @@
+"""
+密码哈希与校验
+bcrypt 每次计算需要 100~300ms CPU，直接在请求处理协程中调用会阻塞事件循环，
+登录高峰时整个进程的所有请求都会被拖慢。这里把哈希与校验放到专用线程池中执行
+（bcrypt 计算期间释放 GIL，多个线程可以并行），并限制并发数与排队长度：
+排队请求过多时抛出 PasswordHasherBusy（返回 503），避免登录风暴拖垮其他接口。
+
+配置的 bcrypt 成本（PASSWORD_BCRYPT_ROUNDS）变更后，登录校验成功时会顺带返回按新成本生成的哈希，
+由调用方写回数据库（见 crud_user.authenticate_user）。
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.core.deadline import with_deadline
+from app.core.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 密码哈希上下文：成本与配置不一致的哈希视为需要更新
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+)
+
+
+class PasswordHasherBusy(Exception):
+    """密码哈希排队请求过多"""
+
+    def __init__(self, message: str = "登录请求过多，请稍后重试"):
+        super().__init__(message)
+        self.message = message
+
+
+class PasswordHasher:
+    """在有界线程池中执行密码哈希与校验"""
+
+    def __init__(self, context: CryptContext = None, max_workers: int = None, max_waiting: int = None):
+        self.context = context or pwd_context
+        self.max_workers = max_workers or settings.PASSWORD_HASH_WORKERS
+        self.max_waiting = settings.PASSWORD_HASH_MAX_WAITING if max_waiting is None else max_waiting
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiting = 0
+        self._running = 0
+        self._stats = {"hash": 0, "verify": 0, "rehash_needed": 0, "rejected": 0, "max_waiting_seen": 0}
+        self.wait_ms = Histogram()
+        self.compute_ms = Histogram()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        # 信号量绑定事件循环，测试或脚本中换了事件循环时重新创建
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+            self._loop = loop
+        return self._semaphore
+
+    def _finish(self, semaphore: asyncio.Semaphore, elapsed_ms: float) -> None:
+        self._running -= 1
+        self.compute_ms.observe(elapsed_ms)
+        semaphore.release()
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        semaphore = self._get_semaphore()
+        if semaphore.locked() and self._waiting >= self.max_waiting:
+            self._stats["rejected"] += 1
+            logger.warning(f"密码哈希排队已满（{self._waiting} 个请求等待），拒绝新的请求")
+            raise PasswordHasherBusy()
+
+        self._waiting += 1
+        self._stats["max_waiting_seen"] = max(self._stats["max_waiting_seen"], self._waiting)
+        queued_at = time.perf_counter()
+        # acquire 在单独的任务中执行：wait_for 超时与 acquire 完成同时发生时（Python 3.11 的已知竞态）
+        # 名额可能已经拿到却仍抛出超时，需要据任务状态归还，否则名额永久泄漏
+        acquire = asyncio.ensure_future(semaphore.acquire())
+        try:
+            await with_deadline(asyncio.shield(acquire))
+        except BaseException:
+            if acquire.done() and not acquire.cancelled() and acquire.exception() is None:
+                semaphore.release()
+            else:
+                acquire.cancel()
+            raise
+        finally:
+            self._waiting -= 1
+        self.wait_ms.observe((time.perf_counter() - queued_at) * 1000)
+
+        self._running += 1
+        loop = asyncio.get_running_loop()
+        started_at = time.perf_counter()
+
+        def _done(_):
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+            try:
+                loop.call_soon_threadsafe(self._finish, semaphore, elapsed_ms)
+            except RuntimeError:
+                # 事件循环已关闭（应用退出）
+                pass
+
+        future = self._get_executor().submit(func, *args)
+        # 线程中的计算无法中途取消：名额在计算真正结束后才释放，等待方超时也不会突破并发上限
+        future.add_done_callback(_done)
+        return await with_deadline(asyncio.wrap_future(future))
+
+    async def hash(self, password: str) -> str:
+        """生成密码哈希"""
+        self._stats["hash"] += 1
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """校验密码"""
+        verified, _ = await self.verify_and_update(password, hashed_password)
+        return verified
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        校验密码，返回 (是否正确, 新哈希)
+        密码正确且哈希成本与当前配置不一致时返回按当前配置重新生成的哈希，否则新哈希为 None
+        """
+        self._stats["verify"] += 1
+        verified, new_hash = await self._run(self.context.verify_and_update, password, hashed_password)
+        if verified and new_hash:
+            self._stats["rehash_needed"] += 1
+        return verified, new_hash
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "max_workers": self.max_workers,
+            "max_waiting": self.max_waiting,
+            "running": self._running,
+            "waiting": self._waiting,
+            "wait_ms": self.wait_ms.to_dict(),
+            "compute_ms": self.compute_ms.to_dict(),
+        }
+
+    def shutdown(self) -> None:
+        """应用关闭时释放线程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# 全局密码哈希实例
+password_hasher = PasswordHasher()
@@ -0,0 +1,326 @@
+"""
+热门导师排行榜
+get_popular_mentors 是首页推荐以及其他推荐上下文的兜底，原先每次调用都对全部已认证导师按评分、会话数排序，
+排除列表也要拼进 SQL 重新查询。这里在进程内维护一份已排好序的排行榜：
+
+- 热度 = 评分 + POPULARITY_ACTIVITY_WEIGHT × 近期活跃度，活跃度为已完成会话与收到评价的次数，
+  按 POPULARITY_HALF_LIFE_DAYS 半衰期随时间衰减，同分按累计会话数排序；
+  评分取自 mentorship_relationships.rating，新评价只计入活跃度，评分在重新加载时更新；
+- 排行榜是按排序键有序的列表，评价写入、会话结束时只更新对应导师一项（二分查找删除后再插入），不重新排序；
+- 取热门导师时从头遍历有序列表，跳过排除的导师，取够 limit 个即停止，只按主键查询这些导师的资料。
+
+衰减使所有导师的热度随时间变化，排序键按固定时刻计算，每 RESORT_SECONDS 秒按当前时刻整体重算一次。
+导师表有变更（新增、认证、删除导师）或超过 POPULARITY_REFRESH_SECONDS 时在后台从数据库重新加载，
+其他进程写入的评价与会话也在重新加载时计入。
+"""
+import asyncio
+import bisect
+import contextvars
+import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.cache import query_cache
+from app.core.config import settings
+from app.core.lazy_connection import read_connection
+
+logger = logging.getLogger(__name__)
+
+TABLES = ("mentorship_relationships",)
+# 超过 ACTIVITY_WINDOW_HALF_LIVES 个半衰期的活动权重不足 0.4%，加载时不再读取
+ACTIVITY_WINDOW_HALF_LIVES = 8
+# 衰减后的热度整体重算间隔秒数
+RESORT_SECONDS = 60
+
+# $1 半衰期秒数 $2 读取活动的时间窗口秒数
+LOAD_QUERY = """
+    SELECT mr.id, COALESCE(mr.rating, 0) AS rating, COALESCE(mr.total_sessions, 0) AS total_sessions,
+           COALESCE(ev.activity, 0) AS activity
+    FROM mentorship_relationships mr
+    LEFT JOIN (
+        SELECT mentor_id, SUM(POWER(0.5, EXTRACT(EPOCH FROM (NOW() - at)) / $1)) AS activity
+        FROM (
+            SELECT mentor_id, COALESCE(actual_end_time, updated_at) AS at
+            FROM mentorship_sessions
+            WHERE status = 'completed' AND COALESCE(actual_end_time, updated_at) > NOW() - make_interval(secs => $2)
+            UNION ALL
+            SELECT target_id, created_at
+            FROM reviews
+            WHERE review_type = 'mentor' AND created_at > NOW() - make_interval(secs => $2)
+        ) events
+        GROUP BY mentor_id
+    ) ev ON ev.mentor_id = mr.id
+    WHERE mr.verification_status = 'verified'
+"""
+
+
+def _half_life_seconds() -> float:
+    return settings.POPULARITY_HALF_LIFE_DAYS * 86400
+
+
+def decay(age_seconds: float, half_life_seconds: float) -> float:
+    """经过 age_seconds 后单次活动的剩余权重"""
+    return 0.5 ** (max(age_seconds, 0.0) / half_life_seconds)
+
+
+class Entry:
+    """排行榜中一名导师的评分、会话数与活跃度（activity 为 activity_at 时刻的衰减值）"""
+
+    __slots__ = ("rating", "total_sessions", "activity", "activity_at")
+
+    def __init__(self, rating: float, total_sessions: int, activity: float, activity_at: float):
+        self.rating = rating
+        self.total_sessions = total_sessions
+        self.activity = activity
+        self.activity_at = activity_at
+
+    def activity_now(self, now: float, half_life_seconds: float) -> float:
+        return self.activity * decay(now - self.activity_at, half_life_seconds)
+
+    def score(self, now: float, half_life_seconds: float, weight: float) -> float:
+        return self.rating + weight * self.activity_now(now, half_life_seconds)
+
+
+class Leaderboard:
+    """按热度降序排列的导师列表（排序键为 (-热度, -累计会话数, 导师 ID)）"""
+
+    def __init__(self, half_life_seconds: float, weight: float, now: Optional[float] = None):
+        self.half_life_seconds = half_life_seconds
+        self.weight = weight
+        self.entries: Dict[Any, Entry] = {}
+        self.keys: Dict[Any, Tuple[float, int, Any]] = {}
+        self.order: List[Tuple[float, int, Any]] = []
+        # 排序键按 scored_at 时刻的热度计算
+        self.scored_at = time.time() if now is None else now
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]], half_life_seconds: float, weight: float,
+                  now: Optional[float] = None) -> "Leaderboard":
+        """rows 需含 id、rating、total_sessions 与 now 时刻的衰减活跃度 activity"""
+        board = cls(half_life_seconds, weight, now)
+        for row in rows:
+            board.entries[row["id"]] = Entry(
+                float(row["rating"] or 0), int(row["total_sessions"] or 0), float(row["activity"] or 0), board.scored_at
+            )
+        board.rescore(board.scored_at)
+        return board
+
+    def _key(self, mentor_id: Any, entry: Entry) -> Tuple[float, int, Any]:
+        return (-entry.score(self.scored_at, self.half_life_seconds, self.weight), -entry.total_sessions, mentor_id)
+
+    def rescore(self, now: float) -> None:
+        """按 now 时刻的衰减热度重算全部排序键并重新排序"""
+        self.scored_at = now
+        self.keys = {mentor_id: self._key(mentor_id, entry) for mentor_id, entry in self.entries.items()}
+        self.order = sorted(self.keys.values())
+
+    def _place(self, mentor_id: Any) -> None:
+        old = self.keys.pop(mentor_id, None)
+        if old is not None:
+            del self.order[bisect.bisect_left(self.order, old)]
+        entry = self.entries.get(mentor_id)
+        if entry is not None:
+            key = self.keys[mentor_id] = self._key(mentor_id, entry)
+            bisect.insort(self.order, key)
+
+    def record(self, mentor_id: Any, now: float, session: bool = False) -> bool:
+        """
+        记录一次活动（收到评价或 session=True 时完成一次会话）
+        评分不在这里更新：mentorship_relationships.rating 不一定等于评价的平均分，重新加载时读取
+        不在排行榜中的导师（未认证或尚未加载）返回 False
+        """
+        entry = self.entries.get(mentor_id)
+        if entry is None:
+            return False
+        entry.activity = entry.activity_now(now, self.half_life_seconds) + 1.0
+        entry.activity_at = now
+        if session:
+            entry.total_sessions += 1
+        self._place(mentor_id)
+        return True
+
+    def remove(self, mentor_id: Any) -> None:
+        self.entries.pop(mentor_id, None)
+        self._place(mentor_id)
+
+    def top(self, limit: int, exclude_ids: Optional[Iterable[Any]] = None) -> List[Any]:
+        """从头遍历有序列表，跳过排除的导师，返回热度最高的 limit 个导师 ID"""
+        excluded: Set[Any] = set(exclude_ids or ())
+        ids: List[Any] = []
+        if limit <= 0:
+            return ids
+        for _, _, mentor_id in self.order:
+            if mentor_id in excluded:
+                continue
+            ids.append(mentor_id)
+            if len(ids) >= limit:
+                break
+        return ids
+
+    @property
+    def size(self) -> int:
+        return len(self.order)
+
+
+@asynccontextmanager
+async def _connect() -> AsyncIterator[Dict[str, Any]]:
+    """按部署方式获取连接（有连接池时直连，否则走 Supabase REST 客户端）"""
+    from app.core import db
+    if db.is_db_pool_available():
+        conn = db.get_lazy_connection()
+        try:
+            yield {"type": "asyncpg", "connection": read_connection(conn, consistent=False)}
+        finally:
+            await conn.close()
+    else:
+        from app.core.supabase_client import get_supabase_client
+        yield {"type": "supabase", "connection": await get_supabase_client()}
+
+
+def _timestamp(value: Any) -> Optional[float]:
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+async def _fetch_rows(db_conn: Dict[str, Any], now: float) -> List[Dict[str, Any]]:
+    half_life = _half_life_seconds()
+    window = half_life * ACTIVITY_WINDOW_HALF_LIVES
+    if db_conn["type"] == "asyncpg":
+        return [dict(row) for row in await db_conn["connection"].fetch(LOAD_QUERY, half_life, window)]
+
+    client = db_conn["connection"]
+    since = (datetime.fromtimestamp(now, timezone.utc) - timedelta(seconds=window)).isoformat()
+    mentors = await client.select_all("mentorship_relationships", "id,rating,total_sessions",
+                                      {"verification_status": "verified"})
+    reviews = await client.select_all("reviews", "id,target_id,created_at",
+                                      {"review_type": "mentor", "created_at": {"gte": since}})
+    sessions = await client.select_all("mentorship_sessions", "id,mentor_id,actual_end_time,updated_at",
+                                       {"status": "completed", "updated_at": {"gte": since}})
+    activity: Dict[Any, float] = {}
+    events = [(row["target_id"], row.get("created_at")) for row in reviews]
+    events += [(row["mentor_id"], row.get("actual_end_time") or row.get("updated_at")) for row in sessions]
+    for mentor_id, at in events:
+        at = _timestamp(at)
+        if at is not None and now - at <= window:
+            activity[mentor_id] = activity.get(mentor_id, 0.0) + decay(now - at, half_life)
+    return [{**row, "activity": activity.get(row["id"], 0.0)} for row in mentors]
+
+
+class PopularMentors:
+    """管理热门导师排行榜的加载、增量更新与刷新"""
+
+    def __init__(self):
+        self.board: Optional[Leaderboard] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._versions: Optional[Dict[str, int]] = None
+        self._loaded_at: Optional[float] = None
+        self._failed_at: Optional[float] = None
+        self._stats = {"loads": 0, "updates": 0, "resorts": 0, "lookups": 0, "errors": 0,
+                       "last_load_ms": 0.0, "last_lookup_ms": 0.0}
+
+    async def _load(self) -> None:
+        started = time.perf_counter()
+        versions = await query_cache.table_versions(*TABLES)
+        now = time.time()
+        async with _connect() as db_conn:
+            rows = await _fetch_rows(db_conn, now)
+        self.board = Leaderboard.from_rows(rows, _half_life_seconds(), settings.POPULARITY_ACTIVITY_WEIGHT, now)
+        self._versions = versions
+        self._loaded_at = time.monotonic()
+        self._stats["loads"] += 1
+        self._stats["last_load_ms"] = (time.perf_counter() - started) * 1000
+        logger.info(f"热门导师排行榜已加载: {self.board.size} 名导师，耗时 {self._stats['last_load_ms']:.1f}ms")
+
+    async def _reload_in_background(self) -> None:
+        try:
+            async with self._lock:
+                await self._load()
+        except Exception as e:
+            self._stats["errors"] += 1
+            # 失败时按刷新间隔重试
+            self._loaded_at = time.monotonic()
+            logger.warning(f"热门导师排行榜重新加载失败，继续使用当前排行榜: {e}")
+
+    async def _is_stale(self) -> bool:
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > settings.POPULARITY_REFRESH_SECONDS:
+            return True
+        return await query_cache.table_versions(*TABLES) != self._versions
+
+    async def get(self) -> Leaderboard:
+        """
+        获取排行榜：尚未加载时同步加载；
+        导师表有变更或超过刷新间隔时在后台重新加载，本次请求使用当前排行榜
+        """
+        if self.board is None:
+            if self._failed_at is not None and time.monotonic() - self._failed_at < settings.POPULARITY_REFRESH_SECONDS:
+                raise RuntimeError("热门导师排行榜暂不可用")
+            async with self._lock:
+                if self.board is None:
+                    try:
+                        await self._load()
+                    except Exception:
+                        self._stats["errors"] += 1
+                        self._failed_at = time.monotonic()
+                        raise
+            return self.board
+
+        if (self._task is None or self._task.done()) and await self._is_stale():
+            # 在空上下文中加载：不继承触发请求的截止时间
+            self._task = asyncio.get_running_loop().create_task(
+                self._reload_in_background(), context=contextvars.Context()
+            )
+        now = time.time()
+        if now - self.board.scored_at > RESORT_SECONDS:
+            self.board.rescore(now)
+            self._stats["resorts"] += 1
+        return self.board
+
+    async def top(self, limit: int, exclude_ids: Optional[Iterable[Any]] = None) -> List[Any]:
+        """热度最高且不在 exclude_ids 中的 limit 个导师 ID（mentorship_relationships.id）"""
+        board = await self.get()
+        started = time.perf_counter()
+        ids = board.top(limit, exclude_ids)
+        self._stats["lookups"] += 1
+        self._stats["last_lookup_ms"] = (time.perf_counter() - started) * 1000
+        return ids
+
+    def record_review(self, mentor_id: Any) -> None:
+        """导师收到一条评价（尚未加载排行榜时忽略，加载时会读取）"""
+        if self.board is not None and mentor_id is not None:
+            if self.board.record(mentor_id, time.time()):
+                self._stats["updates"] += 1
+
+    def record_session(self, mentor_id: Any) -> None:
+        """导师完成一次会话"""
+        if self.board is not None and mentor_id is not None:
+            if self.board.record(mentor_id, time.time(), session=True):
+                self._stats["updates"] += 1
+
+    async def stop(self) -> None:
+        """应用关闭时取消尚未完成的加载"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "mentors": self.board.size if self.board is not None else 0,
+            "age_seconds": time.monotonic() - self._loaded_at if self._loaded_at is not None else None,
+        }
+
+
+# 全局热门导师排行榜
+popular_mentors = PopularMentors()
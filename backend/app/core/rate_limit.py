@@ -0,0 +1,264 @@
+"""
+令牌桶限流
+ASGI 中间件按路由前缀匹配限流规则，每条规则按客户端 IP 或登录用户分别维护令牌桶：
+桶容量为 burst，按 per_minute 的速率补充令牌，请求消耗一个令牌，令牌不足时返回 429 与 Retry-After。
+一个请求可以同时匹配多条规则（如全局按 IP 的规则 + 登录接口的规则），任一规则拒绝即拒绝。
+所有匹配的令牌桶一起检查：都有令牌时才各取一个，被拒绝的请求不消耗任何规则的令牌。
+
+两种后端：
+- 进程内：每个 uvicorn worker 单独计数；
+- Redis（配置 REDIS_URL 时启用）：通过 Lua 脚本原子地更新令牌桶，限额在所有 worker 之间共享，
+  Redis 不可用时退回进程内计数。
+
+规则可通过 RATE_LIMIT_RULES 按前缀覆盖或新增，例如 {"/api/v1/files": {"per_minute": 30, "burst": 10, "key": "user"}}，
+per_minute <= 0 表示该前缀不限流。
+"""
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from fastapi.responses import JSONResponse
+from jose import JWTError, jwt
+
+from app.core.cache import get_redis
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "rl"
+
+
+class RateLimitRule(NamedTuple):
+    """限流规则：路径前缀、每分钟令牌数、桶容量、计数维度（ip / user，user 未登录时按 IP）"""
+    prefix: str
+    per_minute: float
+    burst: int
+    key: str = "ip"
+
+    @property
+    def rate(self) -> float:
+        """每秒补充的令牌数"""
+        return self.per_minute / 60.0
+
+
+def default_rules() -> Dict[str, RateLimitRule]:
+    return {
+        "/": RateLimitRule("/", settings.RATE_LIMIT_DEFAULT_PER_MINUTE, settings.RATE_LIMIT_DEFAULT_BURST, "ip"),
+        # 登录 / 注册：bcrypt 计算昂贵，按 IP 严格限制
+        "/api/v1/auth/login": RateLimitRule("/api/v1/auth/login", 10, 5, "ip"),
+        "/api/v1/auth/register": RateLimitRule("/api/v1/auth/register", 5, 5, "ip"),
+        # 智能体：每次调用都会产生模型费用，按用户限制
+        "/api/v2/agents": RateLimitRule("/api/v2/agents", 20, 10, "user"),
+        "/api/v1/planner": RateLimitRule("/api/v1/planner", 20, 10, "user"),
+    }
+
+
+def load_rules() -> List[RateLimitRule]:
+    """默认规则与 RATE_LIMIT_RULES 合并后的规则列表"""
+    rules = default_rules()
+    for prefix, options in settings.RATE_LIMIT_RULES.items():
+        base = rules.get(prefix) or RateLimitRule(prefix, settings.RATE_LIMIT_DEFAULT_PER_MINUTE,
+                                                  settings.RATE_LIMIT_DEFAULT_BURST)
+        rules[prefix] = base._replace(**{k: v for k, v in options.items() if k in ("per_minute", "burst", "key")})
+    return [rule for rule in rules.values() if rule.per_minute > 0 and rule.burst > 0]
+
+
+# Redis 令牌桶：KEYS 为各规则的桶，ARGV 为 now, rate1, burst1, rate2, burst2, ...
+# 所有桶都有令牌时各取一个；返回 {拒绝的规则下标（从 0 开始，-1 表示允许）, 需要等待的秒数}
+_TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local tokens = {}
+local rejected = -1
+local retry_after = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local burst = tonumber(ARGV[2 * i + 1])
+    local data = redis.call('HMGET', key, 'tokens', 'ts')
+    local t = tonumber(data[1])
+    local ts = tonumber(data[2])
+    if t == nil then
+        t = burst
+        ts = now
+    end
+    t = math.min(burst, t + math.max(0, now - ts) * rate)
+    tokens[i] = t
+    if t < 1 and (1 - t) / rate > retry_after then
+        rejected = i - 1
+        retry_after = (1 - t) / rate
+    end
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local burst = tonumber(ARGV[2 * i + 1])
+    local t = tokens[i]
+    if rejected < 0 then
+        t = t - 1
+    end
+    redis.call('HSET', key, 'tokens', t, 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000) + 1000)
+end
+return {rejected, tostring(retry_after)}
+"""
+
+
+class RateLimiter:
+    """令牌桶限流器（进程内 + 可选 Redis）"""
+
+    def __init__(self, max_buckets: int = None):
+        self.max_buckets = max_buckets or settings.RATE_LIMIT_MAX_LOCAL_BUCKETS
+        # key -> (令牌数, 更新时间)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._script = None
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._redis_errors = 0
+
+    def _record(self, prefix: str, allowed: bool) -> None:
+        stats = self._stats.setdefault(prefix, {"allowed": 0, "limited": 0})
+        stats["allowed" if allowed else "limited"] += 1
+
+    def _take_local(self, keys: List[str], rules: List[RateLimitRule], now: float) -> Tuple[int, float]:
+        refilled = []
+        rejected, retry_after = -1, 0.0
+        for index, (key, rule) in enumerate(zip(keys, rules)):
+            tokens, updated_at = self._buckets.get(key, (float(rule.burst), now))
+            tokens = min(float(rule.burst), tokens + max(0.0, now - updated_at) * rule.rate)
+            refilled.append(tokens)
+            if tokens < 1 and (1 - tokens) / rule.rate > retry_after:
+                rejected, retry_after = index, (1 - tokens) / rule.rate
+        for key, tokens in zip(keys, refilled):
+            self._buckets[key] = (tokens - 1 if rejected < 0 else tokens, now)
+            self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        return rejected, retry_after
+
+    async def _take_redis(self, redis, keys: List[str], rules: List[RateLimitRule], now: float) -> Tuple[int, float]:
+        if self._script is None:
+            self._script = redis.register_script(_TOKEN_BUCKET_LUA)
+        args = [now]
+        for rule in rules:
+            args += [rule.rate, rule.burst]
+        rejected, retry_after = await self._script(keys=keys, args=args)
+        if isinstance(retry_after, bytes):
+            retry_after = retry_after.decode()
+        return int(rejected), float(retry_after)
+
+    async def take(self, checks: Sequence[Tuple[RateLimitRule, str]]) -> Tuple[Optional[RateLimitRule], float]:
+        """
+        从每个 (规则, 身份) 对应的令牌桶中各取一个令牌：先检查全部令牌桶，任一不足时不取令牌
+        返回 (拒绝请求的规则, 需要等待的秒数)，允许时规则为 None
+        """
+        rules = [rule for rule, _ in checks]
+        keys = [f"{_KEY_PREFIX}:{rule.prefix}:{identity}" for rule, identity in checks]
+        now = time.time()
+        redis = get_redis()
+        result = None
+        if redis is not None:
+            try:
+                result = await self._take_redis(redis, keys, rules, now)
+            except Exception as e:
+                self._redis_errors += 1
+                logger.warning(f"限流 Redis 操作失败，使用进程内计数: {e}")
+        if result is None:
+            result = self._take_local(keys, rules, now)
+        rejected, retry_after = result
+        if rejected >= 0:
+            self._record(rules[rejected].prefix, False)
+            return rules[rejected], retry_after
+        for rule in rules:
+            self._record(rule.prefix, True)
+        return None, 0.0
+
+    def reset(self) -> None:
+        """清空进程内令牌桶"""
+        self._buckets.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.RATE_LIMIT_ENABLED,
+            "rules": {rule.prefix: rule._asdict() for rule in load_rules()},
+            "by_rule": {prefix: dict(stats) for prefix, stats in self._stats.items()},
+            "local_buckets": len(self._buckets),
+            "redis_enabled": get_redis() is not None,
+            "redis_errors": self._redis_errors,
+        }
+
+
+# 全局限流器实例
+rate_limiter = RateLimiter()
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def client_ip(scope) -> str:
+    """客户端 IP；RATE_LIMIT_TRUST_FORWARDED=true（部署在反向代理之后）时使用 X-Forwarded-For 的第一个地址"""
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = _header(scope, b"x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def token_subject(scope) -> Optional[str]:
+    """从 Authorization 头中解出用户标识（只校验签名，不查询数据库），无效令牌返回 None"""
+    authorization = _header(scope, b"authorization")
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        payload = jwt.decode(authorization[7:].strip(), settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("uid") or payload.get("sub")
+
+
+class RateLimitMiddleware:
+    """ASGI 限流中间件，超出限额时返回 429 与 Retry-After"""
+
+    def __init__(self, app):
+        self.app = app
+        self.rules = load_rules()
+        self.exempt = tuple(settings.RATE_LIMIT_EXEMPT_PATHS)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not settings.RATE_LIMIT_ENABLED
+            or scope.get("method") == "OPTIONS"
+            or scope["path"].startswith(self.exempt)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        ip = client_ip(scope)
+        user = None
+        checks = []
+        for rule in self.rules:
+            if not path.startswith(rule.prefix):
+                continue
+            if rule.key == "user" and user is None:
+                subject = token_subject(scope)
+                user = f"user:{subject}" if subject else f"ip:{ip}"
+            checks.append((rule, user if rule.key == "user" else f"ip:{ip}"))
+
+        if checks:
+            rejected, retry_after = await rate_limiter.take(checks)
+            if rejected is not None:
+                identity = dict(checks)[rejected]
+                logger.warning(f"请求被限流: {scope.get('method')} {path} ({identity}, 规则 {rejected.prefix})")
+                await JSONResponse(
+                    status_code=429,
+                    content={"detail": "请求过于频繁，请稍后重试"},
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
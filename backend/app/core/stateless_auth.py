@@ -0,0 +1,138 @@
+"""
+无状态令牌声明与令牌吊销
+AUTH_STATELESS_TOKENS=true 时，登录与刷新签发的 JWT 除 sub 外还携带 uid / role / email / ver（用户版本号）/ jti，
+get_current_user 直接根据声明构造当前用户，不查询 users 表（require_role 等依赖都基于 get_current_user）。
+
+令牌的有效性由两个小集合决定：
+- 用户版本号（与鉴权用户缓存共用，见 user_cache）：用户信息、角色或启用状态变更时递增，
+  此前签发的无状态令牌全部失效，客户端需要重新登录；
+- 吊销列表：登出时按 jti 吊销单个令牌，保留到令牌过期为止。
+两者保存在 Redis 中，所有进程共享且重启后保留，因此启用该选项必须配置 REDIS_URL（启动时检查，见 check_stateless_config）：
+仅保存在进程内时，版本号递增与吊销只在一个进程生效，重启后版本号归零，已失效的令牌会重新生效。
+同样的原因，校验时 Redis 读取失败按失败处理（视为已吊销 / 版本号已变化，拒绝令牌），不退回本进程记录的数据。
+
+关闭该选项时签发的令牌只含 sub，每次请求按用户名查询用户（命中鉴权用户缓存时不访问数据库）。
+"""
+import logging
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from app.core.cache import get_redis
+from app.core.config import settings
+from app.core.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "rv"
+
+# 无状态令牌必须携带的声明
+STATELESS_CLAIMS = ("uid", "role", "ver")
+
+
+class TokenRevocationList:
+    """按 jti 吊销的令牌集合，条目保留到令牌过期"""
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or settings.TOKEN_REVOCATION_MAX_ENTRIES
+        # jti -> 令牌过期时间（unix 时间戳）
+        self._local: Dict[str, float] = {}
+        self._stats = {"revoked": 0, "checks": 0, "rejected": 0, "redis_errors": 0}
+
+    def _purge(self) -> None:
+        now = time.time()
+        for jti in [jti for jti, expires_at in self._local.items() if expires_at <= now]:
+            del self._local[jti]
+        # 仍然超出上限时丢弃最早过期的条目
+        if len(self._local) > self.max_entries:
+            for jti in sorted(self._local, key=self._local.get)[:len(self._local) - self.max_entries]:
+                del self._local[jti]
+
+    async def revoke(self, jti: str, expires_at: Optional[float]) -> None:
+        """吊销令牌；expires_at 为令牌的 exp 声明，未提供时按 ACCESS_TOKEN_EXPIRE_MINUTES 保留"""
+        if expires_at is None:
+            expires_at = time.time() + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        ttl = int(expires_at - time.time()) + 1
+        if ttl <= 0:
+            return
+
+        self._stats["revoked"] += 1
+        self._local[jti] = expires_at
+        if len(self._local) > self.max_entries:
+            self._purge()
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.set(f"{_KEY_PREFIX}:{jti}", "1", ex=ttl)
+            except Exception as e:
+                self._stats["redis_errors"] += 1
+                logger.warning(f"令牌吊销写入 Redis 失败，仅在本进程生效: {e}")
+
+    async def is_revoked(self, jti: str) -> bool:
+        self._stats["checks"] += 1
+        expires_at = self._local.get(jti)
+        revoked = expires_at is not None and expires_at > time.time()
+
+        if not revoked:
+            redis = get_redis()
+            if redis is not None:
+                try:
+                    revoked = bool(await redis.exists(f"{_KEY_PREFIX}:{jti}"))
+                except Exception as e:
+                    # 其他进程的吊销只记录在 Redis 中，无法确认时拒绝令牌
+                    self._stats["redis_errors"] += 1
+                    logger.warning(f"令牌吊销查询 Redis 失败，拒绝令牌: {e}")
+                    revoked = True
+
+        if revoked:
+            self._stats["rejected"] += 1
+        return revoked
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "local_entries": len(self._local), "redis_enabled": get_redis() is not None}
+
+
+# 全局令牌吊销列表
+token_revocations = TokenRevocationList()
+
+
+def check_stateless_config() -> None:
+    """应用启动时调用：启用无状态令牌但没有可用的 Redis 时拒绝启动"""
+    if settings.AUTH_STATELESS_TOKENS and get_redis() is None:
+        raise RuntimeError(
+            "AUTH_STATELESS_TOKENS=true 需要配置 REDIS_URL（并安装 redis 包）："
+            "用户版本号与令牌吊销列表必须在所有进程间共享并在重启后保留"
+        )
+
+
+async def build_token_claims(user: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    根据用户记录生成令牌声明
+    未启用无状态令牌时只包含 sub
+    """
+    claims = {"sub": user["username"]}
+    if not settings.AUTH_STATELESS_TOKENS:
+        return claims
+    claims.update({
+        "uid": str(user["id"]),
+        "role": user.get("role") or "user",
+        "email": user.get("email"),
+        "ver": await user_cache.get_version(user["id"]),
+        "jti": uuid.uuid4().hex,
+    })
+    return claims
+
+
+def has_stateless_claims(payload: Dict[str, Any]) -> bool:
+    return all(payload.get(claim) is not None for claim in STATELESS_CLAIMS)
+
+
+async def is_current_version(payload: Dict[str, Any]) -> bool:
+    """令牌签发后用户版本号未变化（用户信息、角色、启用状态均未变更）；Redis 读取失败时返回 False"""
+    try:
+        version = await user_cache.get_version(payload["uid"], strict=True)
+    except Exception as e:
+        logger.warning(f"读取用户版本号失败，拒绝无状态令牌: {e}")
+        return False
+    return payload["ver"] == version
@@ -0,0 +1,160 @@
+"""
+asyncpg 热点查询的命名预处理语句注册表
+热点 SQL 在模块加载时注册，连接池每创建一个连接就预处理一次（pool init 回调），
+之后按名称复用执行计划，并统计每条语句的命中次数与耗时。
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+from app.core.deadline import translate_timeout
+from app.core.lazy_connection import LazyConnection, query_timeout
+from app.core.metrics import db_metrics
+
+logger = logging.getLogger(__name__)
+
+
+if asyncpg:
+    class PreparedConnection(asyncpg.Connection):
+        """携带本连接已预处理语句的 asyncpg 连接类，作为连接池的 connection_class"""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.prepared_statements: Dict[str, Any] = {}
+else:
+    PreparedConnection = None
+
+
+@dataclass
+class StatementStats:
+    """单条语句的统计信息"""
+    calls: int = 0
+    hits: int = 0          # 命中已预处理语句
+    misses: int = 0        # 首次使用时才预处理，或连接不支持预处理而退回普通查询
+    errors: int = 0
+    prepare_count: int = 0
+    prepare_ms: float = 0.0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["avg_ms"] = self.total_ms / self.calls if self.calls else 0.0
+        data["hit_rate"] = self.hits / self.calls if self.calls else 0.0
+        return data
+
+
+class StatementRegistry:
+    """命名语句注册表"""
+
+    def __init__(self):
+        self._statements: Dict[str, str] = {}
+        self._stats: Dict[str, StatementStats] = {}
+
+    def register(self, name: str, sql: str) -> str:
+        """注册语句，返回语句名称；同名语句重复注册时 SQL 必须一致"""
+        existing = self._statements.get(name)
+        if existing is not None and existing != sql:
+            raise ValueError(f"语句 '{name}' 已注册为不同的 SQL")
+        self._statements[name] = sql
+        self._stats.setdefault(name, StatementStats())
+        return name
+
+    def sql(self, name: str) -> str:
+        return self._statements[name]
+
+    async def prepare_connection(self, conn) -> None:
+        """连接池 init 回调：为新连接预处理所有已注册语句"""
+        prepared = getattr(conn, "prepared_statements", None)
+        if not isinstance(prepared, dict):
+            return
+        for name in self._statements:
+            try:
+                await self._prepare(conn, prepared, name)
+            except Exception as e:
+                # 表结构缺失等问题不应阻止连接池启动，首次使用时会再次尝试
+                logger.warning(f"预处理语句 {name} 失败: {e}")
+
+    async def _prepare(self, conn, prepared: Dict[str, Any], name: str):
+        stats = self._stats[name]
+        start = time.perf_counter()
+        statement = await conn.prepare(self._statements[name])
+        stats.prepare_count += 1
+        stats.prepare_ms += (time.perf_counter() - start) * 1000
+        prepared[name] = statement
+        return statement
+
+    async def _run(self, conn, name: str, method: str, *args):
+        if isinstance(conn, LazyConnection):
+            # 惰性连接：仅在执行语句期间占用底层连接
+            async with conn.connection() as raw_conn:
+                return await self._run(raw_conn, name, method, *args)
+
+        stats = self._stats[name]
+        stats.calls += 1
+        # 请求截止时间内的查询超时
+        timeout = query_timeout()
+        extra = {"timeout": timeout} if timeout is not None else {}
+        start = time.perf_counter()
+        error = False
+        try:
+            prepared = getattr(conn, "prepared_statements", None)
+            if not isinstance(prepared, dict):
+                # 非 PreparedConnection（如测试替身），退回普通查询
+                stats.misses += 1
+                return await getattr(conn, method)(self._statements[name], *args, **extra)
+
+            statement = prepared.get(name)
+            if statement is None:
+                stats.misses += 1
+                statement = await self._prepare(conn, prepared, name)
+            else:
+                stats.hits += 1
+
+            try:
+                return await getattr(statement, method)(*args, **extra)
+            except asyncpg.exceptions.InvalidCachedStatementError:
+                # 表结构变更导致计划失效，重新预处理一次
+                statement = await self._prepare(conn, prepared, name)
+                return await getattr(statement, method)(*args, **extra)
+        except asyncio.TimeoutError as e:
+            stats.errors += 1
+            error = True
+            raise translate_timeout(e) from None
+        except Exception:
+            stats.errors += 1
+            error = True
+            raise
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            stats.total_ms += elapsed
+            stats.max_ms = max(stats.max_ms, elapsed)
+            db_metrics.record_query(self._statements[name], elapsed, error=error)
+
+    async def fetch(self, conn, name: str, *args):
+        return await self._run(conn, name, "fetch", *args)
+
+    async def fetchrow(self, conn, name: str, *args):
+        return await self._run(conn, name, "fetchrow", *args)
+
+    async def fetchval(self, conn, name: str, *args):
+        return await self._run(conn, name, "fetchval", *args)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """按语句名称返回统计信息"""
+        return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+    def reset_stats(self) -> None:
+        for name in self._stats:
+            self._stats[name] = StatementStats()
+
+
+# 全局语句注册表
+statement_registry = StatementRegistry()
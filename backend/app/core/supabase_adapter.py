@@ -0,0 +1,111 @@
+"""
+Supabase 同步客户端的异步适配器
+supabase-py 的 Client 在 execute() 时发起同步 HTTP 请求，直接在 async 处理函数中调用会阻塞事件循环。
+本模块保留相同的链式查询接口（table().select().eq()...），只是 execute() 变为可 await，
+实际请求在有界线程池中执行，降级模式下的并发请求不再互相串行阻塞。
+请求设置了截止时间时，到期后不再等待线程池中的请求结果（已发出的同步请求无法中断，会在后台结束）。
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.core.deadline import check_deadline, with_deadline
+from app.core.metrics import db_metrics
+
+logger = logging.getLogger(__name__)
+
+# 降级模式共享线程池（按需创建）
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_supabase_executor() -> ThreadPoolExecutor:
+    """获取降级模式共享线程池，最大并发由 SUPABASE_FALLBACK_MAX_WORKERS 控制"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.SUPABASE_FALLBACK_MAX_WORKERS,
+            thread_name_prefix="supabase-fallback"
+        )
+    return _executor
+
+
+def shutdown_supabase_executor():
+    """关闭降级模式线程池"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+# 决定请求类型的构建器方法，用于指标标签
+_OPERATIONS = {"select", "insert", "update", "upsert", "delete"}
+
+
+def _wrap(value: Any, label: str) -> Any:
+    """查询构建器（带 execute 方法的对象）继续包装，其余值原样返回"""
+    if hasattr(value, "execute"):
+        return AsyncQueryBuilder(value, label)
+    return value
+
+
+class AsyncQueryBuilder:
+    """包装 postgrest 同步查询构建器，链式调用原样转发，execute() 在线程池中执行"""
+
+    __slots__ = ("_builder", "_label")
+
+    def __init__(self, builder: Any, label: str = ""):
+        self._builder = builder
+        self._label = label
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._builder, name)
+        label = f"{name.upper()} {self._label}" if name in _OPERATIONS else self._label
+        if callable(attr):
+            def method(*args, **kwargs):
+                return _wrap(attr(*args, **kwargs), label)
+            return method
+        # 如 not_ 这类属性形式的修饰符
+        return _wrap(attr, label)
+
+    async def execute(self) -> Any:
+        """在共享线程池中执行查询，不阻塞事件循环"""
+        # 截止时间已到时不再向线程池提交请求
+        check_deadline()
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        error = False
+        try:
+            return await with_deadline(loop.run_in_executor(get_supabase_executor(), self._builder.execute))
+        except Exception:
+            error = True
+            raise
+        finally:
+            db_metrics.record_query(
+                self._label, (time.perf_counter() - start) * 1000,
+                source="supabase_fallback", error=error
+            )
+
+
+class AsyncSupabaseAdapter:
+    """
+    supabase-py Client 的异步外观
+    crud_* 模块中的写法保持不变，只需在 execute() 前加 await
+    """
+
+    def __init__(self, client: Any):
+        self._client = client
+
+    def table(self, table_name: str) -> AsyncQueryBuilder:
+        return AsyncQueryBuilder(self._client.table(table_name), table_name)
+
+    def from_(self, table_name: str) -> AsyncQueryBuilder:
+        return self.table(table_name)
+
+    def rpc(self, fn: str, params: Optional[dict] = None, **kwargs) -> AsyncQueryBuilder:
+        return AsyncQueryBuilder(self._client.rpc(fn, params or {}, **kwargs), f"RPC {fn}")
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
@@ -1,15 +1,82 @@
 """
 Supabase REST API 客户端模块
 当直接数据库连接不可用时使用此模块
+
+filters 参数支持的写法（对应 PostgREST 过滤语法）：
+- {"role": "mentor"}                      -> role=eq.mentor
+- {"id": [1, 2, 3]}                       -> id=in.(1,2,3)
+- {"deleted_at": None}                    -> deleted_at=is.null
+- {"price": {"gte": 100, "lte": 500}}     -> price=gte.100&price=lte.500
 """
 import httpx
-from typing import Optional, Dict, List, Any
+import time
+from typing import Optional, Dict, List, Any, Tuple, Union
 from fastapi import HTTPException
 from app.core.config import settings
+from app.core.deadline import with_deadline
+from app.core.metrics import db_metrics
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 支持的 PostgREST 过滤操作符
+FILTER_OPERATORS = {"eq", "neq", "gt", "gte", "lt", "lte", "like", "ilike", "in", "is"}
+
+# select_all 分页读取时每页行数（不超过 PostgREST 的 max-rows，默认 1000）
+SELECT_ALL_PAGE_SIZE = 1000
+
+# in.() 列表中需要加引号的字符
+_RESERVED_CHARS = set(',()"\\ ')
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return "null"
+    return str(value)
+
+
+def _format_list_item(value: Any) -> str:
+    text = _format_value(value)
+    if any(ch in _RESERVED_CHARS for ch in text):
+        escaped = text.replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{escaped}"'
+    return text
+
+
+def _format_condition(op: str, value: Any) -> str:
+    if op not in FILTER_OPERATORS:
+        raise ValueError(f"不支持的过滤操作符: {op}")
+    if op == "in":
+        return f"in.({','.join(_format_list_item(v) for v in value)})"
+    return f"{op}.{_format_value(value)}"
+
+
+def build_filter_params(filters: Optional[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """把 filters 字典转换为 PostgREST 查询参数（同一列可出现多次，如范围查询）"""
+    params: List[Tuple[str, str]] = []
+    for key, value in (filters or {}).items():
+        if isinstance(value, dict):
+            for op, operand in value.items():
+                params.append((key, _format_condition(op, operand)))
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            params.append((key, _format_condition("in", list(value))))
+        elif value is None:
+            params.append((key, "is.null"))
+        else:
+            params.append((key, _format_condition("eq", value)))
+    return params
+
+
+def _parse_content_range(header: Optional[str]) -> int:
+    """解析 Content-Range: 0-24/3573 或 */3573 中的总数"""
+    if not header or "/" not in header:
+        return 0
+    total = header.rsplit("/", 1)[1]
+    return int(total) if total.isdigit() else 0
+
+
 class SupabaseClient:
     """Supabase REST API 客户端"""
     
@@ -20,31 +87,112 @@ class SupabaseClient:
             "Authorization": f"Bearer {settings.SUPABASE_KEY}",
             "Content-Type": "application/json"
         }
-        self.client = httpx.AsyncClient(timeout=30)
+        # 共享 HTTP 客户端：保持长连接，避免每次查询重新握手
+        self.client = httpx.AsyncClient(
+            timeout=settings.SUPABASE_HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.SUPABASE_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SUPABASE_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.SUPABASE_HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
     
     async def close(self):
         """关闭客户端"""
         await self.client.aclose()
     
-    async def select(self, table: str, columns: str = "*", filters: Dict[str, Any] = None, limit: Optional[int] = None) -> List[Dict]:
-        """查询数据"""
-        url = f"{self.base_url}/{table}"
-        params = {"select": columns}
-        
-        if filters:
-            for key, value in filters.items():
-                params[f"{key}"] = f"eq.{value}"
-        
+    async def _send(self, method: str, table: str, url: str, **kwargs) -> httpx.Response:
+        """发送请求并记录耗时指标；请求设置了截止时间时，整个请求不超过剩余时间"""
+        start = time.perf_counter()
+        error = False
+        try:
+            return await with_deadline(self.client.request(method, url, **kwargs))
+        except Exception:
+            error = True
+            raise
+        finally:
+            db_metrics.record_query(
+                f"{method} {table}", (time.perf_counter() - start) * 1000,
+                source="supabase_rest", error=error
+            )
+    
+    @staticmethod
+    def _order_param(order: Union[str, List[str], None]) -> Optional[str]:
+        """order 可为 "created_at.desc" 或 ["rating.desc", "id.asc"]"""
+        if not order:
+            return None
+        return order if isinstance(order, str) else ",".join(order)
+
+    def _select_params(self, columns: str, filters: Optional[Dict[str, Any]],
+                       order: Union[str, List[str], None], limit: Optional[int],
+                       offset: Optional[int]) -> List[Tuple[str, Any]]:
+        params: List[Tuple[str, Any]] = [("select", columns)]
+        params.extend(build_filter_params(filters))
+        order_value = self._order_param(order)
+        if order_value:
+            params.append(("order", order_value))
         if limit:
-            params["limit"] = limit
+            params.append(("limit", limit))
+        if offset:
+            params.append(("offset", offset))
+        return params
+
+    async def select(self, table: str, columns: str = "*", filters: Dict[str, Any] = None, limit: Optional[int] = None,
+                     offset: Optional[int] = None, order: Union[str, List[str], None] = None) -> List[Dict]:
+        """查询数据（filters 支持 eq / in / 范围等操作符，见模块说明）"""
+        url = f"{self.base_url}/{table}"
+        params = self._select_params(columns, filters, order, limit, offset)
         
         try:
-            response = await self.client.get(url, headers=self.headers, params=params)
+            response = await self._send("GET", table, url, headers=self.headers, params=params)
             response.raise_for_status()
             return response.json()
         except Exception as e:
             logger.error(f"Supabase select 错误: {e}")
             raise HTTPException(status_code=500, detail=f"数据库查询失败: {str(e)}")
+
+    async def select_all(self, table: str, columns: str = "*", filters: Dict[str, Any] = None,
+                         order: Union[str, List[str]] = "id.asc") -> List[Dict]:
+        """
+        分页读取全部匹配行（PostgREST 单次最多返回 max-rows 行，超出部分会被静默截断）
+        order 需按唯一键排序，保证分页之间不重复、不遗漏
+        """
+        rows: List[Dict] = []
+        while True:
+            page = await self.select(table, columns, filters, limit=SELECT_ALL_PAGE_SIZE, offset=len(rows), order=order)
+            rows.extend(page or [])
+            if not page or len(page) < SELECT_ALL_PAGE_SIZE:
+                return rows
+
+    async def select_with_count(self, table: str, columns: str = "*", filters: Dict[str, Any] = None,
+                                limit: Optional[int] = None, offset: Optional[int] = None,
+                                order: Union[str, List[str], None] = None) -> Tuple[List[Dict], int]:
+        """分页查询并返回总数（count=exact），用于一次请求同时拿到当前页与总条数"""
+        url = f"{self.base_url}/{table}"
+        params = self._select_params(columns, filters, order, limit, offset)
+        headers = {**self.headers, "Prefer": "count=exact"}
+        
+        try:
+            response = await self._send("GET", table, url, headers=headers, params=params)
+            response.raise_for_status()
+            return response.json(), _parse_content_range(response.headers.get("content-range"))
+        except Exception as e:
+            logger.error(f"Supabase select 错误: {e}")
+            raise HTTPException(status_code=500, detail=f"数据库查询失败: {str(e)}")
+
+    async def count(self, table: str, filters: Dict[str, Any] = None) -> int:
+        """统计行数（HEAD 请求 + count=exact，不传输行数据）"""
+        url = f"{self.base_url}/{table}"
+        params = [("select", "*"), *build_filter_params(filters)]
+        headers = {**self.headers, "Prefer": "count=exact"}
+        
+        try:
+            response = await self._send("HEAD", table, url, headers=headers, params=params)
+            response.raise_for_status()
+            return _parse_content_range(response.headers.get("content-range"))
+        except Exception as e:
+            logger.error(f"Supabase count 错误: {e}")
+            raise HTTPException(status_code=500, detail=f"数据库查询失败: {str(e)}")
     
     async def insert(self, table: str, data: Dict[str, Any]) -> Dict:
         """插入数据"""
@@ -54,8 +202,8 @@ class SupabaseClient:
         headers = {**self.headers, "Prefer": "return=representation"}
         
         try:
-            response = await self.client.post(
-                url, 
+            response = await self._send(
+                "POST", table, url,
                 headers=headers, 
                 json=data
             )
@@ -86,17 +234,54 @@ class SupabaseClient:
             logger.error(f"Supabase insert 错误: {e}")
             raise HTTPException(status_code=500, detail=f"数据插入失败: {str(e)}")
     
+    async def insert_many(self, table: str, rows: List[Dict[str, Any]], upsert: bool = False,
+                          on_conflict: Optional[str] = None) -> List[Dict]:
+        """
+        批量插入（一次请求写入多行）
+        upsert=True 时按 on_conflict 指定的唯一列合并已存在的行
+        """
+        if not rows:
+            return []
+        url = f"{self.base_url}/{table}"
+        prefer = ["return=representation"]
+        if upsert:
+            prefer.append("resolution=merge-duplicates")
+        headers = {**self.headers, "Prefer": ",".join(prefer)}
+        params = {"on_conflict": on_conflict} if on_conflict else None
+        
+        try:
+            response = await self._send(
+                "POST", table, url,
+                headers=headers,
+                params=params,
+                json=rows
+            )
+            response.raise_for_status()
+            return response.json() if response.content else []
+        except httpx.HTTPStatusError as http_err:
+            logger.error(f"Supabase HTTP错误: {http_err.response.status_code} - {http_err.response.text}")
+            raise HTTPException(
+                status_code=http_err.response.status_code,
+                detail=f"批量写入失败: {http_err.response.text}"
+            )
+        except Exception as e:
+            logger.error(f"Supabase 批量写入错误: {e}")
+            raise HTTPException(status_code=500, detail=f"批量写入失败: {str(e)}")
+
+    async def upsert(self, table: str, data: Union[Dict[str, Any], List[Dict[str, Any]]],
+                     on_conflict: Optional[str] = None) -> List[Dict]:
+        """插入或更新（单行或多行）"""
+        rows = data if isinstance(data, list) else [data]
+        return await self.insert_many(table, rows, upsert=True, on_conflict=on_conflict)
+    
     async def update(self, table: str, filters: Dict[str, Any], data: Dict[str, Any]) -> List[Dict]:
         """更新数据"""
         url = f"{self.base_url}/{table}"
-        params = {}
-        
-        for key, value in filters.items():
-            params[f"{key}"] = f"eq.{value}"
+        params = build_filter_params(filters)
         
         try:
-            response = await self.client.patch(
-                url, 
+            response = await self._send(
+                "PATCH", table, url,
                 headers=self.headers, 
                 params=params,
                 json=data
@@ -110,14 +295,11 @@ class SupabaseClient:
     async def delete(self, table: str, filters: Dict[str, Any]) -> List[Dict]:
         """删除数据"""
         url = f"{self.base_url}/{table}"
-        params = {}
-        
-        for key, value in filters.items():
-            params[f"{key}"] = f"eq.{value}"
+        params = build_filter_params(filters)
         
         try:
-            response = await self.client.delete(
-                url, 
+            response = await self._send(
+                "DELETE", table, url,
                 headers=self.headers, 
                 params=params
             )
@@ -0,0 +1,211 @@
+"""
+鉴权用户缓存
+get_current_user 每个请求都要按用户名读取用户的 role / is_active，这里按用户名和用户 ID 缓存鉴权所需字段，
+命中时不再访问数据库（惰性连接不会从连接池获取连接）。
+两级缓存：进程内 TTL LRU + 可选 Redis（配置 REDIS_URL 时启用，多个进程共享）。
+
+失效：每个用户有一个版本号，缓存条目记录写入时的版本号，命中时版本号不一致即视为失效。
+同时记录最近一次失效的时间：加载开始后发生过失效（本进程或其他进程）的结果不写入缓存，
+避免在新版本号下缓存失效前读到的旧记录。loader 需从主库读取（见 deps.get_user_by_username）。
+crud_user.update_user / delete_user 等修改用户的写操作调用 invalidate(user_id)，
+角色或启用状态在其他地方（如直接修改数据库）变更后同样需要调用，或通过管理接口使其失效。
+缓存中不保存密码哈希。
+用户版本号同时用于无状态令牌（见 stateless_auth）：版本号递增后此前签发的令牌失效。
+"""
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.cache import get_redis
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "uc"
+
+# 鉴权所需字段
+AUTH_FIELDS = ("id", "username", "email", "role", "is_active")
+
+
+def _auth_record(user: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: user.get(field) for field in AUTH_FIELDS}
+
+
+class UserCache:
+    """按用户名 / 用户 ID 缓存鉴权用户记录"""
+
+    def __init__(self, max_entries: int = None, ttl: int = None):
+        self.max_entries = max_entries or settings.AUTH_USER_CACHE_MAX_ENTRIES
+        self.ttl = ttl or settings.AUTH_USER_CACHE_TTL
+        # key -> (过期时间, 记录, 版本号)
+        self._local: "OrderedDict[str, Tuple[float, Dict[str, Any], int]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        # user_id -> 最近一次失效的时间（time.time()）
+        self._invalidated_at: Dict[str, float] = {}
+        # 每次失效递增；加载期间发生过失效则不写入缓存，避免把旧数据写回
+        self._epoch = 0
+        self._stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "invalidations": 0, "redis_errors": 0}
+
+    def _redis_failed(self, e: Exception) -> None:
+        self._stats["redis_errors"] += 1
+        logger.warning(f"用户缓存 Redis 操作失败，使用本地缓存: {e}")
+
+    # ---- 版本号 ----
+    async def _version(self, user_id: str, strict: bool = False) -> int:
+        redis = get_redis()
+        if redis is not None:
+            try:
+                value = await redis.get(f"{_KEY_PREFIX}:v:{user_id}")
+                version = int(value) if value is not None else 0
+                self._versions[user_id] = version
+                return version
+            except Exception as e:
+                self._redis_failed(e)
+                if strict:
+                    raise
+        return self._versions.get(user_id, 0)
+
+    async def _invalidated_since(self, user_id: str, started: float) -> bool:
+        """加载开始（started）之后用户是否被失效过"""
+        redis = get_redis()
+        if redis is not None:
+            try:
+                value = await redis.get(f"{_KEY_PREFIX}:t:{user_id}")
+                if value is not None:
+                    self._invalidated_at[user_id] = max(self._invalidated_at.get(user_id, 0.0), float(value))
+            except Exception as e:
+                self._redis_failed(e)
+                # 无法确认其他进程是否失效过，不写入缓存
+                return True
+        return self._invalidated_at.get(user_id, 0.0) >= started
+
+    async def get_version(self, user_id: Any, strict: bool = False) -> int:
+        """
+        用户当前版本号（每次 invalidate 递增）
+        strict=True 时 Redis 读取失败直接抛出异常，不使用本进程记录的版本号（其他进程的递增不可见）
+        """
+        return await self._version(str(user_id), strict)
+
+    # ---- 本地 LRU ----
+    def _local_get(self, key: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, record, version = entry
+        if expires_at < time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return record, version
+
+    def _local_set(self, key: str, record: Dict[str, Any], version: int) -> None:
+        self._local[key] = (time.monotonic() + self.ttl, record, version)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    # ---- 读取 ----
+    async def _get(self, key: str, loader: Callable[[], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        if not settings.AUTH_USER_CACHE_ENABLED:
+            return await loader()
+
+        cached = self._local_get(key)
+        if cached is not None:
+            record, version = cached
+            if version == await self._version(str(record["id"])):
+                self._stats["local_hits"] += 1
+                return dict(record)
+            del self._local[key]
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                raw = await redis.get(f"{_KEY_PREFIX}:{key}")
+                if raw is not None:
+                    payload = json.loads(raw)
+                    record, version = payload["record"], payload["version"]
+                    if version == await self._version(str(record["id"])):
+                        self._stats["redis_hits"] += 1
+                        self._local_set(key, record, version)
+                        return dict(record)
+            except Exception as e:
+                self._redis_failed(e)
+
+        self._stats["misses"] += 1
+        epoch = self._epoch
+        started = time.time()
+        user = await loader()
+        if not user:
+            # 不缓存不存在的用户，新注册用户无需等待过期
+            return user
+
+        record = _auth_record(user)
+        if epoch == self._epoch and not await self._invalidated_since(str(record["id"]), started):
+            version = await self._version(str(record["id"]))
+            self._local_set(key, record, version)
+            if redis is not None:
+                try:
+                    payload = json.dumps({"record": record, "version": version}, default=str, ensure_ascii=False)
+                    await redis.set(f"{_KEY_PREFIX}:{key}", payload, ex=self.ttl)
+                except Exception as e:
+                    self._redis_failed(e)
+        return dict(record)
+
+    async def get_by_username(self, username: str,
+                              loader: Callable[[], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        """
+        按用户名读取鉴权用户记录，未命中时调用 loader 从数据库加载
+        返回值只包含 AUTH_FIELDS 中的字段（不含密码哈希，登录校验请直接查询数据库）
+        """
+        return await self._get(f"u:{username}", loader)
+
+    async def get_by_id(self, user_id: Any,
+                        loader: Callable[[], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        """按用户 ID 读取鉴权用户记录"""
+        return await self._get(f"i:{user_id}", loader)
+
+    # ---- 失效 ----
+    async def invalidate(self, user_id: Any, username: Optional[str] = None) -> None:
+        """
+        使用户的缓存记录失效（用户信息、角色或启用状态变更后调用）
+        递增版本号后，按用户名或 ID 缓存的旧条目都不会再命中；username 可选，仅用于立即释放本地条目
+        """
+        user_id = str(user_id)
+        self._stats["invalidations"] += 1
+        self._epoch += 1
+        invalidated_at = time.time()
+        self._invalidated_at[user_id] = invalidated_at
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        self._local.pop(f"i:{user_id}", None)
+        if username:
+            self._local.pop(f"u:{username}", None)
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                self._versions[user_id] = int(await redis.incr(f"{_KEY_PREFIX}:v:{user_id}"))
+                await redis.set(f"{_KEY_PREFIX}:t:{user_id}", repr(invalidated_at), ex=self.ttl)
+            except Exception as e:
+                self._redis_failed(e)
+
+    def clear_local(self) -> None:
+        """清空进程内缓存"""
+        self._local.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._stats["local_hits"] + self._stats["redis_hits"] + self._stats["misses"]
+        hits = self._stats["local_hits"] + self._stats["redis_hits"]
+        return {
+            **self._stats,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "local_entries": len(self._local),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "redis_enabled": get_redis() is not None,
+        }
+
+
+# 全局鉴权用户缓存实例
+user_cache = UserCache()
@@ -1,42 +1,243 @@
-from typing import Optional, List, Dict, Any, Union
+from typing import TYPE_CHECKING, Optional, List, Dict, Any, Tuple, Union
 from app.schemas.matching_schema import MatchingRequest, MatchingFilter, RecommendationRequest
 import asyncpg
-from supabase import Client
+if TYPE_CHECKING:
+    # 仅用于类型标注，避免导入时加载 supabase 包
+    from supabase import Client
 import uuid
 from datetime import datetime
 import difflib
 
+from app.core.cache import query_cache
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
+from app.core.fuzzy import MAJOR_SIMILARITY_THRESHOLD, UNIVERSITY_SIMILARITY_THRESHOLD, TrigramIndex
+from app.core.lazy_connection import read_connection
+from app.core.major_taxonomy import MajorTaxonomy, major_taxonomy
+from app.core.pagination import SortKey, keyset_postgrest, keyset_sql, order_by_sql
+from app.core.popularity import popular_mentors
+from app.core.statements import statement_registry
+
+# 匹配评分查询：各分项只计算一次，总分在外层求和
+# $1 目标大学 $2 目标专业 $3 学位 $4 偏好语言 $5 服务类型 $6 相关专业 $7 同学科大类专业（$6 / $7 为小写名称，见 match_scores_args）
+# 相关专业与学科大类由专业关系图（app.core.major_taxonomy）按目标专业预先算出，与 Python 打分使用同一份数据。
+# 同档次大学分项有两种写法：
+# - 基于匹配特征物化视图（scripts/database/create_match_features.sql）：目标大学排名只在 CTE 中计算一次，
+#   每个导师按 university 等值连接一行特征；
+# - 直接查询参考表（未创建物化视图时回退使用）：每个导师行执行一次自连接。
+# 名称模糊匹配使用 pg_trgm 相似度（与 app.core.fuzzy 规则、阈值一致），在 CTE 中借助三元组索引
+# 一次查出与目标相似的大学 / 专业名称；回退查询不依赖 pg_trgm，不计算模糊匹配。
+_MATCH_SCORES_TEMPLATE = """
+    {ctes}
+    SELECT 
+        scored.*,
+        (
+            scored.university_match + scored.major_match + scored.degree_match +
+            scored.rating_score + scored.language_match +
+            scored.experience_bonus + scored.specialty_bonus
+        ) as total_score
+    FROM (
+        SELECT 
+            mr.*,
+            u.username,
+            p.full_name,
+            p.avatar_url,
+            -- 大学匹配度 (支持部分匹配和相似度)
+            GREATEST(
+                -- 精确匹配
+                CASE WHEN mr.university = ANY($1) THEN 0.3 ELSE 0.0 END,
+                -- 部分匹配 (大学名称包含关键词)
+                CASE WHEN EXISTS (
+                    SELECT 1 FROM unnest($1) AS target_uni 
+                    WHERE LOWER(mr.university) LIKE '%' || LOWER(target_uni) || '%' 
+                    OR LOWER(target_uni) LIKE '%' || LOWER(mr.university) || '%'
+                ) THEN 0.2 ELSE 0.0 END,
+                -- 同档次大学匹配 (基于排名范围)
+                CASE WHEN mr.university_ranking IS NOT NULL AND {university_tier} THEN 0.15 ELSE 0.0 END,
+                -- 名称模糊匹配 (三元组相似度)
+                CASE WHEN {university_fuzzy} THEN 0.15 ELSE 0.0 END
+            ) as university_match,
+            
+            -- 专业匹配度 (支持相关专业匹配)
+            GREATEST(
+                -- 精确匹配
+                CASE WHEN mr.major = ANY($2) THEN 0.25 ELSE 0.0 END,
+                -- 相关专业匹配
+                CASE WHEN LOWER(mr.major) = ANY($6::text[]) THEN 0.18 ELSE 0.0 END,
+                -- 学科大类匹配
+                CASE WHEN LOWER(mr.major) = ANY($7::text[]) THEN 0.12 ELSE 0.0 END,
+                -- 关键词部分匹配
+                CASE WHEN EXISTS (
+                    SELECT 1 FROM unnest($2) AS target_major 
+                    WHERE LOWER(mr.major) LIKE '%' || LOWER(target_major) || '%' 
+                    OR LOWER(target_major) LIKE '%' || LOWER(mr.major) || '%'
+                ) THEN 0.08 ELSE 0.0 END,
+                -- 名称模糊匹配 (三元组相似度)
+                CASE WHEN {major_fuzzy} THEN 0.08 ELSE 0.0 END
+            ) as major_match,
+            
+            -- 学位匹配度 (支持相邻学位)
+            CASE 
+                WHEN mr.degree_level = $3 THEN 0.2
+                -- 相邻学位部分匹配 (如master <-> phd)
+                WHEN ($3 = 'master' AND mr.degree_level = 'phd') 
+                  OR ($3 = 'phd' AND mr.degree_level = 'master') THEN 0.1
+                WHEN ($3 = 'bachelor' AND mr.degree_level = 'master') 
+                  OR ($3 = 'master' AND mr.degree_level = 'bachelor') THEN 0.05
+                ELSE 0.0
+            END as degree_match,
+            
+            -- 评分权重 (动态调整)
+            COALESCE(mr.rating / 5.0, 0) * 0.15 as rating_score,
+            
+            -- 语言匹配度 (支持部分匹配)
+            CASE 
+                WHEN $4 IS NULL THEN 0.1
+                WHEN mr.languages && $4 THEN 0.1  -- 完全匹配
+                WHEN EXISTS (
+                    SELECT 1 FROM unnest(mr.languages) AS mentor_lang, unnest($4) AS pref_lang
+                    WHERE mentor_lang = pref_lang
+                ) THEN 0.08  -- 部分语言匹配
+                ELSE 0.0
+            END as language_match,
+            
+            -- 经验相关性加分
+            CASE 
+                WHEN mr.total_sessions >= 50 THEN 0.05
+                WHEN mr.total_sessions >= 20 THEN 0.03
+                WHEN mr.total_sessions >= 5 THEN 0.01
+                ELSE 0.0
+            END as experience_bonus,
+            
+            -- 专业化服务加分
+            CASE 
+                WHEN mr.specialties && $5 THEN 0.05  -- 专长匹配
+                ELSE 0.0
+            END as specialty_bonus
+        
+        FROM mentorship_relationships mr
+        JOIN users u ON mr.user_id = u.id
+        LEFT JOIN profiles p ON u.id = p.user_id
+        {feature_joins}
+        WHERE mr.verification_status = 'verified'
+    ) scored
+    ORDER BY total_score DESC, scored.rating DESC, scored.total_sessions DESC
+    LIMIT 50
+    """
+
+MATCH_SCORES = statement_registry.register(
+    "matching.scores",
+    _MATCH_SCORES_TEMPLATE.format(
+        ctes=f"""WITH target AS (
+        SELECT
+            ARRAY(SELECT ranking FROM university_match_features WHERE university = ANY($1::text[])) AS rankings,
+            ARRAY(
+                SELECT DISTINCT m.university FROM mentorship_relationships m, unnest($1::text[]) AS target_uni
+                WHERE m.university % target_uni AND similarity(m.university, target_uni) >= {UNIVERSITY_SIMILARITY_THRESHOLD}
+            ) AS similar_universities,
+            ARRAY(
+                SELECT DISTINCT m.major FROM mentorship_relationships m, unnest($2::text[]) AS target_major
+                WHERE m.major % target_major AND similarity(m.major, target_major) >= {MAJOR_SIMILARITY_THRESHOLD}
+            ) AS similar_majors
+    )""",
+        university_tier="EXISTS (SELECT 1 FROM unnest(target.rankings) AS target_ranking WHERE ABS(uf.ranking - target_ranking) <= 50)",
+        university_fuzzy="mr.university = ANY(target.similar_universities)",
+        major_fuzzy="mr.major = ANY(target.similar_majors)",
+        feature_joins="""CROSS JOIN target
+        LEFT JOIN university_match_features uf ON uf.university = mr.university""",
+    )
+)
+
+MATCH_SCORES_LEGACY = statement_registry.register(
+    "matching.scores_legacy",
+    _MATCH_SCORES_TEMPLATE.format(
+        ctes="",
+        university_tier="""EXISTS (
+                    SELECT 1 FROM university_rankings ur1, university_rankings ur2
+                    WHERE ur1.university = mr.university 
+                    AND ur2.university = ANY($1)
+                    AND ABS(ur1.ranking - ur2.ranking) <= 50
+                )""",
+        university_fuzzy="FALSE",
+        major_fuzzy="FALSE",
+        feature_joins="",
+    )
+)
+
+# 每个匹配请求保存的匹配记录数
+SAVED_MATCHES_PER_REQUEST = 20
+
+# 保存匹配结果：一条语句内把匹配请求标记为完成，并以多行 upsert 写入全部匹配记录（学生-导师，已存在时只更新分数）
+# 单条语句天然是原子的，且只需一次往返，耗时不随保存的匹配数量增长
+# $1 请求ID数组 $2 学生ID数组 $3 导师ID数组 $4 匹配分数数组
+SAVE_MATCHES_SQL = """
+    WITH completed AS (
+        UPDATE mentor_matches SET status = 'completed', updated_at = NOW()
+        WHERE id = ANY($1)
+    )
+    INSERT INTO mentorship_relationships 
+    (student_id, mentor_id, match_score, status, created_at)
+    SELECT m.student_id, m.mentor_id, m.match_score, 'pending', NOW()
+    FROM unnest($2::bigint[], $3::bigint[], $4::float8[]) AS m(student_id, mentor_id, match_score)
+    ON CONFLICT (student_id, mentor_id) DO UPDATE SET
+    match_score = EXCLUDED.match_score, updated_at = NOW()
+"""
+
+def _match_records(student_id: int, matches: List[Dict]) -> List[Tuple[int, Any, float]]:
+    """每个请求保存的 (学生ID, 导师ID, 分数)，同一导师只保留第一条（多行 upsert 不能重复更新同一行）"""
+    records = {}
+    for match in matches[:SAVED_MATCHES_PER_REQUEST]:
+        records.setdefault(match['id'], (student_id, match['id'], match['total_score']))
+    return list(records.values())
+
+async def _save_matches_asyncpg(conn, results: List[Tuple[Any, int, List[Dict]]]) -> None:
+    records = {}
+    for _, student_id, matches in results:
+        for record in _match_records(student_id, matches):
+            records[record[:2]] = record
+    student_ids, mentor_ids, scores = (list(column) for column in zip(*records.values())) if records else ([], [], [])
+    await conn.execute(
+        SAVE_MATCHES_SQL,
+        [request_id for request_id, _, _ in results], student_ids, mentor_ids, scores
+    )
+
+async def _save_matches_supabase(client: "Client", request_id: Any, student_id: int, matches: List[Dict]) -> None:
+    """
+    Supabase 路径：更新请求状态、查询已存在的记录、批量插入新记录、批量更新已有记录的分数，
+    请求数固定，与匹配数量无关（已有记录只更新分数，不改变其状态）
+    """
+    await client.table('mentor_matches').update({'status': 'completed'}).eq('id', request_id).execute()
+    records = _match_records(student_id, matches)
+    if not records:
+        return
+    existing = await client.table('mentorship_relationships').select('mentor_id').eq(
+        'student_id', student_id
+    ).in_('mentor_id', [mentor_id for _, mentor_id, _ in records]).execute()
+    existing_ids = {row['mentor_id'] for row in existing.data or []}
+
+    new_rows = [
+        {'student_id': student_id, 'mentor_id': mentor_id, 'match_score': score, 'status': 'pending'}
+        for _, mentor_id, score in records if mentor_id not in existing_ids
+    ]
+    updated_rows = [
+        {'student_id': student_id, 'mentor_id': mentor_id, 'match_score': score}
+        for _, mentor_id, score in records if mentor_id in existing_ids
+    ]
+    if new_rows:
+        await client.table('mentorship_relationships').insert(new_rows).execute()
+    if updated_rows:
+        await client.table('mentorship_relationships').upsert(
+            updated_rows, on_conflict='student_id,mentor_id'
+        ).execute()
+
 # Helper functions for partial matching
 def _calculate_string_similarity(str1: str, str2: str) -> float:
     """计算两个字符串的相似度 (0-1)"""
     return difflib.SequenceMatcher(None, str1.lower(), str2.lower()).ratio()
 
 def _are_related_majors(major1: str, major2: str) -> bool:
-    """检查两个专业是否相关"""
-    # 预定义的相关专业映射
-    related_majors = {
-        'computer science': ['software engineering', 'information technology', 'data science', 'artificial intelligence'],
-        'business administration': ['management', 'marketing', 'finance', 'economics'],
-        'electrical engineering': ['computer engineering', 'electronics', 'telecommunications'],
-        'mechanical engineering': ['aerospace engineering', 'automotive engineering', 'robotics'],
-        'psychology': ['cognitive science', 'behavioral science', 'neuroscience'],
-        'biology': ['biotechnology', 'biochemistry', 'bioinformatics', 'molecular biology'],
-        'chemistry': ['chemical engineering', 'materials science', 'pharmaceutical science'],
-        'mathematics': ['statistics', 'actuarial science', 'applied mathematics', 'data science'],
-        'physics': ['astronomy', 'astrophysics', 'engineering physics', 'materials science']
-    }
-    
-    major1_lower = major1.lower()
-    major2_lower = major2.lower()
-    
-    # 检查直接映射
-    for base_major, related_list in related_majors.items():
-        if ((major1_lower == base_major and major2_lower in related_list) or
-            (major2_lower == base_major and major1_lower in related_list) or
-            (major1_lower in related_list and major2_lower in related_list)):
-            return True
-    
-    return False
+    """检查两个专业是否相关（专业关系图中的 O(1) 查找）"""
+    return major_taxonomy.current.are_related(major1, major2)
 
 def _are_adjacent_degrees(degree1: str, degree2: str) -> bool:
     """检查两个学位是否相邻"""
@@ -68,7 +269,7 @@ async def create_matching_request(db_conn: Dict[str, Any], student_user_id: int,
             )
         else:
             client: Client = db_conn["connection"]
-            client.table('mentor_matches').insert({
+            await client.table('mentor_matches').insert({
                 'id': request_id,
                 'student_id': student_user_id,
                 'target_universities': request.target_universities,
@@ -82,190 +283,134 @@ async def create_matching_request(db_conn: Dict[str, Any], student_user_id: int,
                 'status': 'pending'
             }).execute()
         return request_id
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"创建匹配请求失败: {e}")
         return None
 
+def _canonical_names(values: Optional[List[str]]) -> Optional[List[str]]:
+    if values is None:
+        return None
+    return sorted({" ".join(value.split()) for value in values} - {""})
+
+def canonical_matching_request(request: MatchingRequest) -> MatchingRequest:
+    """
+    规范化匹配请求：名称去除多余空白，列表去重并排序（打分与顺序、重复项无关）
+    名称不做大小写归一：精确匹配区分大小写，大小写不同的请求得分可能不同，不能共用缓存
+    """
+    return request.model_copy(update={
+        'target_universities': _canonical_names(request.target_universities),
+        'target_majors': _canonical_names(request.target_majors),
+        'service_categories': _canonical_names(request.service_categories),
+        'preferred_languages': _canonical_names(request.preferred_languages),
+    })
+
 async def calculate_match_scores(db_conn: Dict[str, Any], request: MatchingRequest) -> List[Dict]:
+    """
+    计算匹配分数（结果按规范化的请求缓存）
+    条件相同的请求（列表顺序、重复项、空白不同）直接读取缓存；导师资料（评分、认证状态等）、用户名或个人资料变更时缓存失效
+    """
+    request = canonical_matching_request(request)
+    if settings.MATCHING_CACHE_TTL <= 0:
+        return await _calculate_match_scores(db_conn, request)
+    # 缓存键只包含影响打分的字段（预算、紧急程度不参与打分）；两种数据访问方式的打分实现不同，分开缓存
+    params = {
+        'type': db_conn["type"],
+        **request.model_dump(include={
+            'target_universities', 'target_majors', 'degree_level', 'service_categories', 'preferred_languages'
+        }),
+    }
+    return await query_cache.get_or_set(
+        "matching.scores", params, lambda: _calculate_match_scores(db_conn, request),
+        tables=("mentorship_relationships", "users", "profiles", "mentor_embeddings", "major_relations", "major_categories"),
+        ttl=settings.MATCHING_CACHE_TTL
+    )
+
+def match_scores_args(request: MatchingRequest, taxonomy: MajorTaxonomy) -> Tuple[Any, ...]:
+    """MATCH_SCORES / MATCH_SCORES_LEGACY 的参数（相关专业与同学科大类专业由专业关系图算出）"""
+    return (
+        request.target_universities, request.target_majors, request.degree_level,
+        request.preferred_languages, request.service_categories or [],
+        sorted(taxonomy.related_to(request.target_majors)),
+        sorted(taxonomy.same_category_as(request.target_majors)),
+    )
+
+def _semantic_query_text(request: MatchingRequest) -> str:
+    """匹配请求的语义检索文本"""
+    return " ".join([
+        *request.target_universities, *request.target_majors, request.degree_level,
+        *(request.service_categories or []),
+    ])
+
+async def _semantic_scores(request: MatchingRequest) -> Dict[Any, float]:
+    """语义分项：导师资料文本与请求最相近的 top-k 名导师 {导师资料ID: 相似度 × 权重}"""
+    if not settings.MATCHING_SEMANTIC_ENABLED or settings.MATCHING_SEMANTIC_WEIGHT <= 0:
+        return {}
+    # 按需导入（依赖 NumPy，避免拖慢启动）
+    from app.core.mentor_embeddings import mentor_embeddings
+    similarities = await mentor_embeddings.search(_semantic_query_text(request))
+    return {mentor_id: score * settings.MATCHING_SEMANTIC_WEIGHT for mentor_id, score in similarities.items()}
+
+def _apply_semantic_scores(matches: List[Dict], semantic: Dict[Any, float]) -> List[Dict]:
+    """为已按其余分项选出的候选加上语义分项并重新排序（SQL / Supabase 路径）"""
+    for match in matches:
+        match['semantic_match'] = semantic.get(match['id'], 0.0)
+        match['total_score'] = float(match['total_score']) + match['semantic_match']
+    if semantic:
+        matches.sort(key=lambda m: (m['total_score'], float(m.get('rating') or 0), m.get('total_sessions') or 0), reverse=True)
+    return matches
+
+async def _calculate_match_scores(db_conn: Dict[str, Any], request: MatchingRequest) -> List[Dict]:
     """计算匹配分数 - 支持部分匹配和智能相似度"""
     try:
+        semantic = await _semantic_scores(request)
+        taxonomy = await major_taxonomy.get()
         if db_conn["type"] == "asyncpg":
-            conn = db_conn["connection"]
-            # 增强的匹配算法查询 - 支持部分匹配
-            results = await conn.fetch(
-                """
-                SELECT 
-                    mr.*,
-                    u.username,
-                    p.full_name,
-                    p.avatar_url,
-                    -- 大学匹配度 (支持部分匹配和相似度)
-                    GREATEST(
-                        -- 精确匹配
-                        CASE WHEN mr.university = ANY($1) THEN 0.3 ELSE 0.0 END,
-                        -- 部分匹配 (大学名称包含关键词)
-                        CASE WHEN EXISTS (
-                            SELECT 1 FROM unnest($1) AS target_uni 
-                            WHERE LOWER(mr.university) LIKE '%' || LOWER(target_uni) || '%' 
-                            OR LOWER(target_uni) LIKE '%' || LOWER(mr.university) || '%'
-                        ) THEN 0.2 ELSE 0.0 END,
-                        -- 同档次大学匹配 (基于排名范围)
-                        CASE WHEN mr.university_ranking IS NOT NULL AND EXISTS (
-                            SELECT 1 FROM university_rankings ur1, university_rankings ur2
-                            WHERE ur1.university = mr.university 
-                            AND ur2.university = ANY($1)
-                            AND ABS(ur1.ranking - ur2.ranking) <= 50
-                        ) THEN 0.15 ELSE 0.0 END
-                    ) as university_match,
-                    
-                    -- 专业匹配度 (支持相关专业匹配)
-                    GREATEST(
-                        -- 精确匹配
-                        CASE WHEN mr.major = ANY($2) THEN 0.25 ELSE 0.0 END,
-                        -- 相关专业匹配
-                        CASE WHEN EXISTS (
-                            SELECT 1 FROM major_relations rel
-                            WHERE (rel.major1 = mr.major AND rel.major2 = ANY($2))
-                            OR (rel.major2 = mr.major AND rel.major1 = ANY($2))
-                        ) THEN 0.18 ELSE 0.0 END,
-                        -- 学科大类匹配
-                        CASE WHEN EXISTS (
-                            SELECT 1 FROM major_categories mc1, major_categories mc2
-                            WHERE mc1.major = mr.major AND mc2.major = ANY($2)
-                            AND mc1.category = mc2.category
-                        ) THEN 0.12 ELSE 0.0 END,
-                        -- 关键词部分匹配
-                        CASE WHEN EXISTS (
-                            SELECT 1 FROM unnest($2) AS target_major 
-                            WHERE LOWER(mr.major) LIKE '%' || LOWER(target_major) || '%' 
-                            OR LOWER(target_major) LIKE '%' || LOWER(mr.major) || '%'
-                        ) THEN 0.08 ELSE 0.0 END
-                    ) as major_match,
-                    
-                    -- 学位匹配度 (支持相邻学位)
-                    CASE 
-                        WHEN mr.degree_level = $3 THEN 0.2
-                        -- 相邻学位部分匹配 (如master <-> phd)
-                        WHEN ($3 = 'master' AND mr.degree_level = 'phd') 
-                          OR ($3 = 'phd' AND mr.degree_level = 'master') THEN 0.1
-                        WHEN ($3 = 'bachelor' AND mr.degree_level = 'master') 
-                          OR ($3 = 'master' AND mr.degree_level = 'bachelor') THEN 0.05
-                        ELSE 0.0
-                    END as degree_match,
-                    
-                    -- 评分权重 (动态调整)
-                    COALESCE(mr.rating / 5.0, 0) * 0.15 as rating_score,
-                    
-                    -- 语言匹配度 (支持部分匹配)
-                    CASE 
-                        WHEN $4 IS NULL THEN 0.1
-                        WHEN mr.languages && $4 THEN 0.1  -- 完全匹配
-                        WHEN EXISTS (
-                            SELECT 1 FROM unnest(mr.languages) AS mentor_lang, unnest($4) AS pref_lang
-                            WHERE mentor_lang = pref_lang
-                        ) THEN 0.08  -- 部分语言匹配
-                        ELSE 0.0
-                    END as language_match,
-                    
-                    -- 经验相关性加分
-                    CASE 
-                        WHEN mr.total_sessions >= 50 THEN 0.05
-                        WHEN mr.total_sessions >= 20 THEN 0.03
-                        WHEN mr.total_sessions >= 5 THEN 0.01
-                        ELSE 0.0
-                    END as experience_bonus,
-                    
-                    -- 专业化服务加分
-                    CASE 
-                        WHEN mr.specialties && $5 THEN 0.05  -- 专长匹配
-                        ELSE 0.0
-                    END as specialty_bonus,
-                    
-                    -- 总分计算 (动态权重)
-                    (
-                        -- 基础匹配分数
-                        GREATEST(
-                            CASE WHEN mr.university = ANY($1) THEN 0.3 ELSE 0.0 END,
-                            CASE WHEN EXISTS (
-                                SELECT 1 FROM unnest($1) AS target_uni 
-                                WHERE LOWER(mr.university) LIKE '%' || LOWER(target_uni) || '%' 
-                                OR LOWER(target_uni) LIKE '%' || LOWER(mr.university) || '%'
-                            ) THEN 0.2 ELSE 0.0 END,
-                            CASE WHEN mr.university_ranking IS NOT NULL AND EXISTS (
-                                SELECT 1 FROM university_rankings ur1, university_rankings ur2
-                                WHERE ur1.university = mr.university 
-                                AND ur2.university = ANY($1)
-                                AND ABS(ur1.ranking - ur2.ranking) <= 50
-                            ) THEN 0.15 ELSE 0.0 END
-                        ) +
-                        GREATEST(
-                            CASE WHEN mr.major = ANY($2) THEN 0.25 ELSE 0.0 END,
-                            CASE WHEN EXISTS (
-                                SELECT 1 FROM major_relations rel
-                                WHERE (rel.major1 = mr.major AND rel.major2 = ANY($2))
-                                OR (rel.major2 = mr.major AND rel.major1 = ANY($2))
-                            ) THEN 0.18 ELSE 0.0 END,
-                            CASE WHEN EXISTS (
-                                SELECT 1 FROM major_categories mc1, major_categories mc2
-                                WHERE mc1.major = mr.major AND mc2.major = ANY($2)
-                                AND mc1.category = mc2.category
-                            ) THEN 0.12 ELSE 0.0 END,
-                            CASE WHEN EXISTS (
-                                SELECT 1 FROM unnest($2) AS target_major 
-                                WHERE LOWER(mr.major) LIKE '%' || LOWER(target_major) || '%' 
-                                OR LOWER(target_major) LIKE '%' || LOWER(mr.major) || '%'
-                            ) THEN 0.08 ELSE 0.0 END
-                        ) +
-                        CASE 
-                            WHEN mr.degree_level = $3 THEN 0.2
-                            WHEN ($3 = 'master' AND mr.degree_level = 'phd') 
-                              OR ($3 = 'phd' AND mr.degree_level = 'master') THEN 0.1
-                            WHEN ($3 = 'bachelor' AND mr.degree_level = 'master') 
-                              OR ($3 = 'master' AND mr.degree_level = 'bachelor') THEN 0.05
-                            ELSE 0.0
-                        END +
-                        COALESCE(mr.rating / 5.0, 0) * 0.15 +
-                        CASE 
-                            WHEN $4 IS NULL THEN 0.1
-                            WHEN mr.languages && $4 THEN 0.1
-                            WHEN EXISTS (
-                                SELECT 1 FROM unnest(mr.languages) AS mentor_lang, unnest($4) AS pref_lang
-                                WHERE mentor_lang = pref_lang
-                            ) THEN 0.08
-                            ELSE 0.0
-                        END +
-                        CASE 
-                            WHEN mr.total_sessions >= 50 THEN 0.05
-                            WHEN mr.total_sessions >= 20 THEN 0.03
-                            WHEN mr.total_sessions >= 5 THEN 0.01
-                            ELSE 0.0
-                        END +
-                        CASE 
-                            WHEN mr.specialties && $5 THEN 0.05
-                            ELSE 0.0
-                        END
-                    ) as total_score
-                
-                FROM mentorship_relationships mr
-                JOIN users u ON mr.user_id = u.id
-                LEFT JOIN profiles p ON u.id = p.user_id
-                WHERE mr.verification_status = 'verified'
-                ORDER BY total_score DESC, mr.rating DESC, mr.total_sessions DESC
-                LIMIT 50
-                """,
-                request.target_universities, request.target_majors, request.degree_level,
-                request.preferred_languages, request.service_categories or []
-            )
-            return [dict(row) for row in results]
-            return [dict(row) for row in results]
+            # 得分只读取导师资料，与本请求刚写入的匹配请求无关，可直接走只读副本
+            conn = read_connection(db_conn["connection"], consistent=False)
+            if settings.MATCHING_INDEX_ENABLED:
+                # 内存索引向量化打分（按需导入，依赖 NumPy）；索引不可用时回退到 SQL 打分
+                from app.core.mentor_index import mentor_index
+                try:
+                    index = await mentor_index.get(conn)
+                    return index.score(request, semantic=semantic, taxonomy=taxonomy)
+                except Exception as e:
+                    print(f"导师匹配索引不可用，使用SQL计算匹配分数: {e}")
+            # 增强的匹配算法查询 - 支持部分匹配（语义分项只对查询选出的前 50 名重新排序）
+            args = match_scores_args(request, taxonomy)
+            try:
+                results = await statement_registry.fetch(conn, MATCH_SCORES, *args)
+            except asyncpg.exceptions.UndefinedTableError:
+                # 尚未创建匹配特征物化视图
+                print("匹配特征物化视图不存在，直接查询参考表计算匹配分数")
+                results = await statement_registry.fetch(conn, MATCH_SCORES_LEGACY, *args)
+            return _apply_semantic_scores([dict(row) for row in results], semantic)
         else:
             client: Client = db_conn["connection"]
             # 增强版Supabase匹配逻辑 - 支持部分匹配
-            result = client.table('mentorship_relationships').select(
+            result = await client.table('mentorship_relationships').select(
                 '*, users:user_id(username), profiles:user_id(full_name, avatar_url)'
             ).eq('verification_status', 'verified').order('rating', desc=True).limit(100).execute()
             
             # 在Python中实现智能匹配分数计算
+            # 导师的大学 / 专业名称建立三元组倒排索引，每个目标名称只检索一次（与 MentorIndex._similar 相同），
+            # 不再逐个导师 × 目标计算相似度
+            university_trigrams, major_trigrams = TrigramIndex(), TrigramIndex()
+            for mentor in result.data:
+                if mentor.get('university'):
+                    university_trigrams.add(mentor['university'])
+                if mentor.get('major'):
+                    major_trigrams.add(mentor['major'])
+            similar_universities = {
+                name for target in request.target_universities
+                for name in university_trigrams.search(target, UNIVERSITY_SIMILARITY_THRESHOLD)
+            }
+            similar_majors = {
+                name for target in request.target_majors
+                for name in major_trigrams.search(target, MAJOR_SIMILARITY_THRESHOLD)
+            }
+
             matches = []
             for mentor in result.data:
                 score = 0.0
@@ -277,13 +422,12 @@ async def calculate_match_scores(db_conn: Dict[str, Any], request: MatchingReque
                     university_score = 0.3  # 精确匹配
                 else:
                     # 部分匹配 - 检查名称包含关系
-                    for target_uni in request.target_universities:
-                        if (target_uni.lower() in mentor['university'].lower() or 
-                            mentor['university'].lower() in target_uni.lower()):
-                            university_score = max(university_score, 0.2)
-                        # 可以添加更复杂的相似度算法，如编辑距离
-                        elif _calculate_string_similarity(mentor['university'], target_uni) > 0.7:
-                            university_score = max(university_score, 0.15)
+                    university = mentor['university'].lower()
+                    if any(t.lower() in university or university in t.lower() for t in request.target_universities):
+                        university_score = 0.2
+                    # 名称模糊匹配（三元组相似度，与 SQL 路径一致）
+                    elif mentor['university'] in similar_universities:
+                        university_score = 0.15
                 
                 # 2. 专业匹配度 (支持相关专业)
                 major_score = 0.0
@@ -291,15 +435,14 @@ async def calculate_match_scores(db_conn: Dict[str, Any], request: MatchingReque
                     major_score = 0.25  # 精确匹配
                 else:
                     # 部分匹配和相关专业
-                    for target_major in request.target_majors:
-                        if (target_major.lower() in mentor['major'].lower() or 
-                            mentor['major'].lower() in target_major.lower()):
-                            major_score = max(major_score, 0.18)
-                        # 检查相关专业 (可以预定义相关专业映射)
-                        elif _are_related_majors(mentor['major'], target_major):
-                            major_score = max(major_score, 0.12)
-                        elif _calculate_string_similarity(mentor['major'], target_major) > 0.6:
-                            major_score = max(major_score, 0.08)
+                    major = mentor['major'].lower()
+                    if any(t.lower() in major or major in t.lower() for t in request.target_majors):
+                        major_score = 0.18
+                    # 检查相关专业（专业关系图）
+                    elif any(taxonomy.are_related(mentor['major'], t) for t in request.target_majors):
+                        major_score = 0.12
+                    elif mentor['major'] in similar_majors:
+                        major_score = 0.08
                 
                 # 3. 学位匹配度 (支持相邻学位)
                 degree_score = 0.0
@@ -356,59 +499,48 @@ async def calculate_match_scores(db_conn: Dict[str, Any], request: MatchingReque
                 matches.append(mentor)
             
             # 按分数排序，只返回前50个
+            matches = _apply_semantic_scores(matches, semantic)
             matches.sort(key=lambda x: (x['total_score'], x.get('rating', 0)), reverse=True)
             return matches[:50]
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"计算匹配分数失败: {e}")
         return []
 
 async def save_matching_result(db_conn: Dict[str, Any], request_id: str, student_id: int, matches: List[Dict]) -> bool:
-    """保存匹配结果"""
+    """保存匹配结果（只保存前 SAVED_MATCHES_PER_REQUEST 个匹配）"""
     try:
         if db_conn["type"] == "asyncpg":
-            conn = db_conn["connection"]
-            # 更新匹配请求状态
-            await conn.execute(
-                "UPDATE mentor_matches SET status = 'completed', updated_at = NOW() WHERE id = $1",
-                request_id
-            )
-            
-            # 保存匹配历史
-            for i, match in enumerate(matches[:20]):  # 只保存前20个匹配
-                await conn.execute(
-                    """
-                    INSERT INTO mentorship_relationships 
-                    (student_id, mentor_id, match_score, status, created_at)
-                    VALUES ($1, $2, $3, 'pending', NOW())
-                    ON CONFLICT (student_id, mentor_id) DO UPDATE SET
-                    match_score = $3, updated_at = NOW()
-                    """,
-                    student_id, match['id'], match['total_score']
-                )
+            # 保存匹配历史（只写入待确认的匹配记录与 match_score，不影响已缓存的筛选项和热门导师，无需使缓存失效）
+            await _save_matches_asyncpg(db_conn["connection"], [(request_id, student_id, matches)])
         else:
-            client: Client = db_conn["connection"]
-            # 更新匹配请求状态
-            client.table('mentor_matches').update({'status': 'completed'}).eq('id', request_id).execute()
-            
-            # 保存匹配历史（简化版）
-            for match in matches[:20]:
-                try:
-                    client.table('mentorship_relationships').insert({
-                        'student_id': student_id,
-                        'mentor_id': match['id'],
-                        'match_score': match['total_score'],
-                        'status': 'pending'
-                    }).execute()
-                except:
-                    # 如果已存在则更新
-                    client.table('mentorship_relationships').update({
-                        'match_score': match['total_score']
-                    }).eq('student_id', student_id).eq('mentor_id', match['id']).execute()
+            await _save_matches_supabase(db_conn["connection"], request_id, student_id, matches)
         return True
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"保存匹配结果失败: {e}")
         return False
 
+async def save_matching_results(db_conn: Dict[str, Any], results: List[Tuple[str, int, List[Dict]]]) -> bool:
+    """
+    批量保存多个匹配请求的结果（批量匹配使用）
+    results 为 (请求ID, 学生ID, 按分数排序的匹配列表)；asyncpg 下所有请求合并为一条语句写入
+    """
+    try:
+        if db_conn["type"] == "asyncpg":
+            await _save_matches_asyncpg(db_conn["connection"], results)
+            return True
+        for request_id, student_id, matches in results:
+            await _save_matches_supabase(db_conn["connection"], request_id, student_id, matches)
+        return True
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"批量保存匹配结果失败: {e}")
+        return False
+
 async def get_matching_history(db_conn: Dict[str, Any], student_user_id: int, limit: int = 20) -> List[Dict]:
     """获取匹配历史"""
     try:
@@ -433,17 +565,20 @@ async def get_matching_history(db_conn: Dict[str, Any], student_user_id: int, li
             return [dict(row) for row in results]
         else:
             client: Client = db_conn["connection"]
-            result = client.table('mentorship_relationships').select('*').eq('student_id', student_user_id).order('created_at', desc=True).limit(limit).execute()
+            result = await client.table('mentorship_relationships').select('*').eq('student_id', student_user_id).order('created_at', desc=True).limit(limit).execute()
             return result.data
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取匹配历史失败: {e}")
         return []
 
+@query_cache.cached(tables=("mentorship_relationships",), ttl=600)
 async def get_advanced_filters(db_conn: Dict[str, Any]) -> Dict:
     """获取高级筛选选项"""
     try:
         if db_conn["type"] == "asyncpg":
-            conn = db_conn["connection"]
+            conn = read_connection(db_conn["connection"])
             # 获取所有可用的筛选选项
             universities = await conn.fetch(
                 "SELECT DISTINCT university FROM mentorship_relationships WHERE verification_status = 'verified' ORDER BY university"
@@ -465,7 +600,7 @@ async def get_advanced_filters(db_conn: Dict[str, Any]) -> Dict:
         else:
             client: Client = db_conn["connection"]
             # 简化版筛选选项
-            mentors = client.table('mentorship_relationships').select('university, major, degree_level').eq('verification_status', 'verified').execute()
+            mentors = await client.table('mentorship_relationships').select('university, major, degree_level').eq('verification_status', 'verified').execute()
             
             universities = list(set([m['university'] for m in mentors.data if m['university']]))
             majors = list(set([m['major'] for m in mentors.data if m['major']]))
@@ -478,15 +613,24 @@ async def get_advanced_filters(db_conn: Dict[str, Any]) -> Dict:
                 'rating_range': {'min': 1, 'max': 5},
                 'graduation_year_range': {'min': 2015, 'max': 2030}
             }
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取筛选选项失败: {e}")
         return {}
 
-async def apply_advanced_filters(db_conn: Dict[str, Any], filters: MatchingFilter, limit: int = 20, offset: int = 0) -> List[Dict]:
-    """应用高级筛选"""
+# 高级筛选结果的排序键：评分、会话数，以 id 保证顺序唯一（游标分页按同样的键比较）
+FILTER_SORT_KEYS = (
+    SortKey("rating", "DESC", 0),
+    SortKey("total_sessions", "DESC", 0),
+    SortKey("id", "DESC"),
+)
+
+async def apply_advanced_filters(db_conn: Dict[str, Any], filters: MatchingFilter, limit: int = 20, offset: int = 0, cursor: Optional[List[Any]] = None) -> List[Dict]:
+    """应用高级筛选（传入 cursor 时按 (rating, total_sessions, id) 游标分页，忽略 offset）"""
     try:
         if db_conn["type"] == "asyncpg":
-            conn = db_conn["connection"]
+            conn = read_connection(db_conn["connection"])
             where_clauses = ["mr.verification_status = 'verified'"]
             params = []
             param_count = 0
@@ -536,6 +680,12 @@ async def apply_advanced_filters(db_conn: Dict[str, Any], filters: MatchingFilte
                 where_clauses.append(f"mr.languages && ${param_count}")
                 params.append(filters.languages)
             
+            if cursor:
+                where_clauses.append(keyset_sql(FILTER_SORT_KEYS, param_count + 1, alias="mr"))
+                params.extend(cursor)
+                param_count += len(cursor)
+                offset = 0
+            
             where_clause = " AND ".join(where_clauses)
             param_count += 1
             limit_param = f"${param_count}"
@@ -548,7 +698,7 @@ async def apply_advanced_filters(db_conn: Dict[str, Any], filters: MatchingFilte
                 JOIN users u ON mr.user_id = u.id
                 LEFT JOIN profiles p ON u.id = p.user_id
                 WHERE {where_clause}
-                ORDER BY mr.rating DESC, mr.total_sessions DESC
+                {order_by_sql(FILTER_SORT_KEYS, alias="mr")}
                 LIMIT {limit_param} OFFSET {offset_param}
             """
             
@@ -575,9 +725,15 @@ async def apply_advanced_filters(db_conn: Dict[str, Any], filters: MatchingFilte
                 query = query.gte('rating', filters.rating_min)
             if filters.min_sessions:
                 query = query.gte('total_sessions', filters.min_sessions)
-                
-            result = query.order('rating', desc=True).order('total_sessions', desc=True).range(offset, offset + limit - 1).execute()
+            
+            if cursor:
+                query = query.or_(keyset_postgrest(FILTER_SORT_KEYS, cursor)).limit(limit)
+            else:
+                query = query.range(offset, offset + limit - 1)
+            result = await query.order('rating', desc=True).order('total_sessions', desc=True).order('id', desc=True).execute()
             return result.data
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"应用高级筛选失败: {e}")
         return []
@@ -599,15 +755,62 @@ async def get_recommendation_for_context(db_conn: Dict[str, Any], request: Recom
             return await get_service_related_mentors(db_conn, request.user_preferences, request.limit, request.exclude_ids)
         else:
             return []
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取上下文推荐失败: {e}")
         return []
 
+async def _fetch_mentors_by_ids(db_conn: Dict[str, Any], ids: List[int]) -> List[Dict]:
+    """按主键查询已认证指导者的资料，按 ids 的顺序返回（排行榜 / 相似度矩阵给出导师 ID 后使用）"""
+    if not ids:
+        return []
+    if db_conn["type"] == "asyncpg":
+        conn = read_connection(db_conn["connection"])
+        results = await conn.fetch(
+            """
+            SELECT mr.*, u.username, p.full_name, p.avatar_url
+            FROM mentorship_relationships mr
+            JOIN users u ON mr.user_id = u.id
+            LEFT JOIN profiles p ON u.id = p.user_id
+            WHERE mr.id = ANY($1) AND mr.verification_status = 'verified'
+            """,
+            ids
+        )
+        rows = {row['id']: dict(row) for row in results}
+    else:
+        client: Client = db_conn["connection"]
+        result = await client.table('mentorship_relationships').select(
+            '*, users:user_id(username), profiles:user_id(full_name, avatar_url)'
+        ).in_('id', ids).eq('verification_status', 'verified').execute()
+        rows = {row['id']: row for row in result.data}
+    return [rows[mentor_id] for mentor_id in ids if mentor_id in rows]
+
 async def get_popular_mentors(db_conn: Dict[str, Any], limit: int, exclude_ids: Optional[List[int]] = None) -> List[Dict]:
-    """获取热门指导者"""
+    """
+    获取热门指导者：从热门导师排行榜取 ID 再按主键查询资料，排行榜不可用时回退为排序查询
+    不使用查询结果缓存：排行榜本身就在内存中，会话结束与热度衰减需要立即反映到结果中
+    """
+    try:
+        ids = await popular_mentors.top(limit, exclude_ids)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"热门导师排行榜不可用，回退为排序查询: {e}")
+        return await _query_popular_mentors(db_conn, limit, exclude_ids)
+    try:
+        return await _fetch_mentors_by_ids(db_conn, ids)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"获取热门指导者失败: {e}")
+        return []
+
+async def _query_popular_mentors(db_conn: Dict[str, Any], limit: int, exclude_ids: Optional[List[int]] = None) -> List[Dict]:
+    """按评分与会话数排序查询热门指导者（排行榜不可用时使用）"""
     try:
         if db_conn["type"] == "asyncpg":
-            conn = db_conn["connection"]
+            conn = read_connection(db_conn["connection"])
             exclude_clause = ""
             params = []
             if exclude_ids:
@@ -635,8 +838,10 @@ async def get_popular_mentors(db_conn: Dict[str, Any], limit: int, exclude_ids:
             if exclude_ids:
                 query = query.not_.in_('id', exclude_ids)
                 
-            result = query.order('rating', desc=True).order('total_sessions', desc=True).limit(limit).execute()
+            result = await query.order('rating', desc=True).order('total_sessions', desc=True).limit(limit).execute()
             return result.data
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取热门指导者失败: {e}")
         return []
@@ -650,7 +855,7 @@ async def get_preference_based_recommendations(db_conn: Dict[str, Any], user_id:
         target_majors = preferences.get('target_majors', [])
         
         if db_conn["type"] == "asyncpg":
-            conn = db_conn["connection"]
+            conn = read_connection(db_conn["connection"])
             exclude_clause = ""
             params = [target_universities, target_majors]
             if exclude_ids:
@@ -674,16 +879,37 @@ async def get_preference_based_recommendations(db_conn: Dict[str, Any], user_id:
         else:
             # 简化版Supabase实现
             return await get_popular_mentors(db_conn, limit, exclude_ids)
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取偏好推荐失败: {e}")
         return []
 
 async def get_similar_background_mentors(db_conn: Dict[str, Any], user_id: int, limit: int, exclude_ids: Optional[List[int]] = None) -> List[Dict]:
-    """获取相似背景的指导者"""
+    """
+    获取相似背景的指导者：优先按交互历史从相似度矩阵推荐，不足 limit 个时按背景信息查询补足
+    （交互历史较少或相似导师已取消认证时，矩阵给出的导师可能远少于一页）
+    """
+    try:
+        # 离线构建的相似度矩阵（依赖 NumPy，按需导入）
+        from app.core.mentor_similarity import mentor_similarity
+        ids = await mentor_similarity.recommend(user_id, limit, exclude_ids)
+        mentors = await _fetch_mentors_by_ids(db_conn, ids)
+        if len(mentors) < limit:
+            mentors += await _query_background_mentors(db_conn, user_id, limit - len(mentors), [*(exclude_ids or []), *ids])
+        return mentors
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"获取相似背景推荐失败: {e}")
+        return []
+
+async def _query_background_mentors(db_conn: Dict[str, Any], user_id: int, limit: int, exclude_ids: Optional[List[int]] = None) -> List[Dict]:
+    """按用户的目标院校 / 专业 / 学位查询指导者，没有背景信息或使用 Supabase 时返回热门推荐"""
     try:
         # 获取用户背景信息
         if db_conn["type"] == "asyncpg":
-            conn = db_conn["connection"]
+            conn = read_connection(db_conn["connection"])
             user_bg = await conn.fetchrow(
                 "SELECT target_universities, target_majors, target_degree FROM user_learning_needs WHERE user_id = $1",
                 user_id
@@ -713,8 +939,10 @@ async def get_similar_background_mentors(db_conn: Dict[str, Any], user_id: int,
         
         # 如果没有背景信息或使用Supabase，返回热门推荐
         return await get_popular_mentors(db_conn, limit, exclude_ids)
+    except DeadlineExceeded:
+        raise
     except Exception as e:
-        print(f"获取相似背景推荐失败: {e}")
+        print(f"按背景信息查询指导者失败: {e}")
         return []
 
 async def get_service_related_mentors(db_conn: Dict[str, Any], preferences: Dict, limit: int, exclude_ids: Optional[List[int]] = None) -> List[Dict]:
@@ -725,7 +953,7 @@ async def get_service_related_mentors(db_conn: Dict[str, Any], preferences: Dict
             return await get_popular_mentors(db_conn, limit, exclude_ids)
             
         if db_conn["type"] == "asyncpg":
-            conn = db_conn["connection"]
+            conn = read_connection(db_conn["connection"])
             exclude_clause = ""
             params = [service_category]
             if exclude_ids:
@@ -750,6 +978,8 @@ async def get_service_related_mentors(db_conn: Dict[str, Any], preferences: Dict
         else:
             # 简化版Supabase实现
             return await get_popular_mentors(db_conn, limit, exclude_ids)
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取服务相关推荐失败: {e}")
         return [] 
\ No newline at end of file
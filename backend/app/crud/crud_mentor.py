@@ -2,6 +2,10 @@ from typing import Optional, List, Dict, Any
 from app.schemas.mentor_schema import MentorCreate, MentorUpdate, MentorFilter
 import asyncpg
 
+from app.core.cache import query_cache
+from app.core.deadline import DeadlineExceeded
+from app.core.mentor_embeddings import mentor_embeddings
+
 async def create_mentor_profile(db_conn: Dict[str, Any], user_id: int, mentor_data: MentorCreate) -> Optional[Dict]:
     """创建指导者资料"""
     try:
@@ -20,7 +24,10 @@ async def create_mentor_profile(db_conn: Dict[str, Any], user_id: int, mentor_da
                 mentor_data.bio, f"专业: {mentor_data.major}, 特长: {', '.join(mentor_data.specialties)}",
                 100.0, 'CNY', 'guidance', 'active'
             )
-            return dict(result) if result else None
+            await query_cache.invalidate("mentorship_relationships")
+            result = dict(result) if result else None
+            mentor_embeddings.schedule([result])
+            return result
         else:
             from app.core.supabase_client import get_supabase_client
             supabase = await get_supabase_client()
@@ -34,7 +41,11 @@ async def create_mentor_profile(db_conn: Dict[str, Any], user_id: int, mentor_da
                 'relationship_type': 'guidance',
                 'status': 'active'
             })
+            await query_cache.invalidate("mentorship_relationships")
+            mentor_embeddings.schedule([result])
             return result
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"创建指导者资料失败: {e}")
         return None
@@ -64,6 +75,8 @@ async def get_mentor_by_user_id(db_conn: Dict[str, Any], user_id: int) -> Option
                 limit=1
             )
             return result[0] if result else None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取指导者资料失败: {e}")
         return None
@@ -2,10 +2,14 @@
 修复后的导师CRUD操作 - 匹配实际的 mentorship_relationships 表结构
 """
 from typing import Optional, List
+from app.core.cache import query_cache
+from app.core.deadline import DeadlineExceeded
+from app.core.mentor_embeddings import mentor_embeddings
 from app.core.supabase_client import get_supabase_client
 from app.schemas.mentor_schema import MentorCreate, MentorProfile, MentorUpdate
 from datetime import datetime
 
+
 class MentorCRUD:
     def __init__(self):
         self.table = "mentorship_relationships"
@@ -23,6 +27,8 @@ class MentorCRUD:
             if response and len(response) > 0:
                 return response[0]
             return None
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"获取指导者资料失败: {e}")
             return None
@@ -55,9 +61,13 @@ class MentorCRUD:
             )
             
             if response:
+                await query_cache.invalidate(self.table)
+                mentor_embeddings.schedule([response])
                 return response
             return None
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"创建指导者资料失败: {e}")
             return None
@@ -91,9 +101,14 @@ class MentorCRUD:
             )
             
             if response and len(response) > 0:
+                await query_cache.invalidate(self.table)
+                if "description" in update_data or "learning_goals" in update_data:
+                    mentor_embeddings.schedule([response[0]])
                 return response[0]
             return None
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"更新指导者资料失败: {e}")
             return None
@@ -106,7 +121,11 @@ class MentorCRUD:
                 table=self.table,
                 filters={"mentor_id": mentor_id}
             )
+            # 导师嵌入随导师资料级联删除
+            await query_cache.invalidate(self.table, "mentor_embeddings")
             return response is not None
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"删除指导者资料失败: {e}")
             return False
@@ -127,15 +146,14 @@ class MentorCRUD:
                 table=self.table,
                 columns="*",
                 filters=filters,
-                limit=limit
+                limit=limit,
+                offset=offset
             )
             
-            # 手动处理offset（如果需要）
-            if offset > 0 and response:
-                response = response[offset:]
-            
             return response or []
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"搜索指导者失败: {e}")
             return []
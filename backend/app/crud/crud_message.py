@@ -3,11 +3,46 @@
 """
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+from app.core.deadline import DeadlineExceeded
+from app.core.lazy_connection import read_connection
+from app.core.pagination import SortKey, keyset_postgrest
+from app.core.statements import statement_registry
 from app.schemas.message_schema import (
     MessageCreate, MessageUpdate, Message, ConversationCreate,
     ConversationListItem, MessageType, MessageStatus
 )
 
+# 热点查询：消息列表
+MESSAGES_BY_USER = statement_registry.register(
+    "messages.by_user",
+    """
+    SELECT id, conversation_id, sender_id, recipient_id, content, 
+           message_type, status, is_read, created_at, updated_at, read_at
+    FROM messages 
+    WHERE sender_id = $1 OR recipient_id = $1
+    ORDER BY created_at DESC, id DESC
+    LIMIT $2 OFFSET $3
+    """
+)
+
+# 游标分页：从 (created_at, id) 之后继续读取
+MESSAGES_BY_USER_AFTER = statement_registry.register(
+    "messages.by_user_after",
+    """
+    SELECT id, conversation_id, sender_id, recipient_id, content, 
+           message_type, status, is_read, created_at, updated_at, read_at
+    FROM messages 
+    WHERE (sender_id = $1 OR recipient_id = $1)
+      AND (created_at, id) < ($2, $3)
+    ORDER BY created_at DESC, id DESC
+    LIMIT $4
+    """
+)
+
+# 游标分页使用的排序键（与 ORDER BY 对应）
+MESSAGE_SORT_KEYS = (SortKey("created_at", "DESC"), SortKey("id", "DESC"))
+CONVERSATION_MESSAGE_SORT_KEYS = (SortKey("created_at", "ASC"), SortKey("id", "ASC"))
+
 class MessageCRUD:
     """消息CRUD操作类"""
     
@@ -81,27 +116,26 @@ class MessageCRUD:
                         read_at=datetime.fromisoformat(msg_data['read_at']) if msg_data.get('read_at') else None
                     )
                     
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"创建消息失败: {e}")
             
         return None
     
     async def get_messages(self, db_conn: Tuple[Any, str], user_id: int, 
-                          limit: int = 20, offset: int = 0) -> List[Message]:
-        """获取用户的消息列表"""
+                          limit: int = 20, offset: int = 0,
+                          cursor: Optional[List[Any]] = None) -> List[Message]:
+        """获取用户的消息列表（传入 cursor 时按 (created_at, id) 游标分页，忽略 offset）"""
         connection, db_type = db_conn
         
         try:
             if db_type == "postgres":
-                query = """
-                    SELECT id, conversation_id, sender_id, recipient_id, content, 
-                           message_type, status, is_read, created_at, updated_at, read_at
-                    FROM messages 
-                    WHERE sender_id = $1 OR recipient_id = $1
-                    ORDER BY created_at DESC
-                    LIMIT $2 OFFSET $3
-                """
-                results = await connection.fetch(query, user_id, limit, offset)
+                connection = read_connection(connection)  # 列表查询可走只读副本
+                if cursor:
+                    results = await statement_registry.fetch(connection, MESSAGES_BY_USER_AFTER, user_id, *cursor, limit)
+                else:
+                    results = await statement_registry.fetch(connection, MESSAGES_BY_USER, user_id, limit, offset)
                 
                 return [
                     Message(
@@ -122,9 +156,14 @@ class MessageCRUD:
                 
             else:
                 # Supabase 实现
-                result = await connection.table("messages").select("*").or_(
+                query = connection.table("messages").select("*").or_(
                     f"sender_id.eq.{user_id},recipient_id.eq.{user_id}"
-                ).order("created_at", desc=True).range(offset, offset + limit - 1).execute()
+                )
+                if cursor:
+                    query = query.or_(keyset_postgrest(MESSAGE_SORT_KEYS, cursor)).limit(limit)
+                else:
+                    query = query.range(offset, offset + limit - 1)
+                result = await query.order("created_at", desc=True).order("id", desc=True).execute()
                 
                 if result.data:
                     return [
@@ -144,6 +183,8 @@ class MessageCRUD:
                         for msg in result.data
                     ]
                     
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"获取消息列表失败: {e}")
             
@@ -156,6 +197,7 @@ class MessageCRUD:
         
         try:
             if db_type == "postgres":
+                connection = read_connection(connection)  # 列表查询可走只读副本
                 # 获取对话列表的复杂查询
                 query = """
                     WITH conversation_users AS (
@@ -242,6 +284,8 @@ class MessageCRUD:
                 # 这里需要复杂的子查询，暂时返回基础数据
                 return []
                 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"获取对话列表失败: {e}")
             
@@ -249,23 +293,38 @@ class MessageCRUD:
     
     async def get_conversation_messages(self, db_conn: Tuple[Any, str], 
                                       conversation_id: int, user_id: int,
-                                      limit: int = 50, offset: int = 0) -> List[Message]:
-        """获取对话中的消息"""
+                                      limit: int = 50, offset: int = 0,
+                                      cursor: Optional[List[Any]] = None) -> List[Message]:
+        """获取对话中的消息（传入 cursor 时按 (created_at, id) 游标分页，忽略 offset）"""
         connection, db_type = db_conn
         
         try:
             if db_type == "postgres":
+                connection = read_connection(connection)  # 列表查询可走只读副本
                 # 基于用户ID获取双方的消息
-                query = """
-                    SELECT id, conversation_id, sender_id, recipient_id, content, 
-                           message_type, status, is_read, created_at, updated_at, read_at
-                    FROM messages 
-                    WHERE (sender_id = $1 AND recipient_id = $2) 
-                       OR (sender_id = $2 AND recipient_id = $1)
-                    ORDER BY created_at ASC
-                    LIMIT $3 OFFSET $4
-                """
-                results = await connection.fetch(query, user_id, conversation_id, limit, offset)
+                if cursor:
+                    query = """
+                        SELECT id, conversation_id, sender_id, recipient_id, content, 
+                               message_type, status, is_read, created_at, updated_at, read_at
+                        FROM messages 
+                        WHERE ((sender_id = $1 AND recipient_id = $2) 
+                            OR (sender_id = $2 AND recipient_id = $1))
+                          AND (created_at, id) > ($3, $4)
+                        ORDER BY created_at ASC, id ASC
+                        LIMIT $5
+                    """
+                    results = await connection.fetch(query, user_id, conversation_id, *cursor, limit)
+                else:
+                    query = """
+                        SELECT id, conversation_id, sender_id, recipient_id, content, 
+                               message_type, status, is_read, created_at, updated_at, read_at
+                        FROM messages 
+                        WHERE (sender_id = $1 AND recipient_id = $2) 
+                           OR (sender_id = $2 AND recipient_id = $1)
+                        ORDER BY created_at ASC, id ASC
+                        LIMIT $3 OFFSET $4
+                    """
+                    results = await connection.fetch(query, user_id, conversation_id, limit, offset)
                 
                 return [
                     Message(
@@ -286,10 +345,15 @@ class MessageCRUD:
                 
             else:
                 # Supabase 实现
-                result = await connection.table("messages").select("*").or_(
+                query = connection.table("messages").select("*").or_(
                     f"and(sender_id.eq.{user_id},recipient_id.eq.{conversation_id}),"
                     f"and(sender_id.eq.{conversation_id},recipient_id.eq.{user_id})"
-                ).order("created_at", desc=False).range(offset, offset + limit - 1).execute()
+                )
+                if cursor:
+                    query = query.or_(keyset_postgrest(CONVERSATION_MESSAGE_SORT_KEYS, cursor)).limit(limit)
+                else:
+                    query = query.range(offset, offset + limit - 1)
+                result = await query.order("created_at", desc=False).order("id", desc=False).execute()
                 
                 if result.data:
                     return [
@@ -309,6 +373,8 @@ class MessageCRUD:
                         for msg in result.data
                     ]
                     
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"获取对话消息失败: {e}")
             
@@ -340,6 +406,8 @@ class MessageCRUD:
                 
                 return len(result.data) > 0
                 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"标记消息已读失败: {e}")
             
@@ -1,7 +1,26 @@
-from typing import Optional, List, Dict, Any
+from typing import TYPE_CHECKING, Optional, List, Dict, Any
 from app.schemas.review_schema import ServiceReviewCreate, MentorReviewCreate, ReviewUpdate, ReviewFilter, ReviewInteraction, ReviewResponse
 import asyncpg
-from supabase import Client
+if TYPE_CHECKING:
+    # 仅用于类型标注，避免导入时加载 supabase 包
+    from supabase import Client
+
+from app.core.cache import query_cache
+from app.core.deadline import DeadlineExceeded
+from app.core.lazy_connection import read_connection
+from app.core.pagination import SortKey, keyset_postgrest, keyset_sql, order_by_sql
+from app.core.popularity import popular_mentors
+
+
+def review_sort_keys(filters: ReviewFilter = None) -> List[SortKey]:
+    """评价列表的排序键，以 id 结尾保证顺序唯一；游标分页按同样的键比较"""
+    keys = [SortKey("created_at", "DESC"), SortKey("id", "DESC")]
+    if filters and filters.sort_by in ("rating", "helpful_count"):
+        sort_direction = "DESC" if filters.sort_order == "desc" else "ASC"
+        default = 0 if filters.sort_by == "helpful_count" else None
+        keys.insert(0, SortKey(filters.sort_by, sort_direction, default))
+    return keys
+
 
 async def create_service_review(db_conn: Dict[str, Any], reviewer_user_id: int, review_data: ServiceReviewCreate) -> Optional[Dict]:
     """创建服务评价"""
@@ -32,15 +51,16 @@ async def create_service_review(db_conn: Dict[str, Any], reviewer_user_id: int,
                 review_data.value_for_money, review_data.would_recommend,
                 review_data.is_anonymous, review_data.is_public
             )
+            await query_cache.invalidate("reviews")
             return dict(result) if result else None
         else:
             client: Client = db_conn["connection"]
             # 验证订单权限
-            order = client.table('orders').select('mentor_id').eq('id', review_data.order_id).eq('student_id', reviewer_user_id).eq('status', 'completed').execute()
+            order = await client.table('orders').select('mentor_id').eq('id', review_data.order_id).eq('student_id', reviewer_user_id).eq('status', 'completed').execute()
             if not order.data:
                 return None
                 
-            result = client.table('reviews').insert({
+            result = await client.table('reviews').insert({
                 'reviewer_id': reviewer_user_id,
                 'reviewee_id': order.data[0]['mentor_id'],
                 'review_type': 'service',
@@ -58,7 +78,10 @@ async def create_service_review(db_conn: Dict[str, Any], reviewer_user_id: int,
                 'is_public': review_data.is_public,
                 'verified_purchase': True
             }).execute()
+            await query_cache.invalidate("reviews")
             return result.data[0] if result.data else None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"创建服务评价失败: {e}")
         return None
@@ -96,10 +119,13 @@ async def create_mentor_review(db_conn: Dict[str, Any], reviewer_user_id: int, r
                 review_data.guidance_quality, review_data.overall_experience,
                 review_data.is_anonymous, review_data.is_public
             )
+            await query_cache.invalidate("reviews")
+            if result:
+                popular_mentors.record_review(review_data.mentor_id)
             return dict(result) if result else None
         else:
             client: Client = db_conn["connection"]
-            result = client.table('reviews').insert({
+            result = await client.table('reviews').insert({
                 'reviewer_id': reviewer_user_id,
                 'reviewee_id': review_data.mentor_id,
                 'review_type': 'mentor',
@@ -116,16 +142,21 @@ async def create_mentor_review(db_conn: Dict[str, Any], reviewer_user_id: int, r
                 'is_anonymous': review_data.is_anonymous,
                 'is_public': review_data.is_public
             }).execute()
+            await query_cache.invalidate("reviews")
+            if result.data:
+                popular_mentors.record_review(review_data.mentor_id)
             return result.data[0] if result.data else None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"创建指导者评价失败: {e}")
         return None
 
-async def get_reviews_by_target(db_conn: Dict[str, Any], target_type: str, target_id: int, filters: ReviewFilter = None, limit: int = 20, offset: int = 0) -> List[Dict]:
-    """获取目标对象的评价列表"""
+async def get_reviews_by_target(db_conn: Dict[str, Any], target_type: str, target_id: int, filters: ReviewFilter = None, limit: int = 20, offset: int = 0, cursor: Optional[List[Any]] = None) -> List[Dict]:
+    """获取目标对象的评价列表（传入 cursor 时按排序键游标分页，忽略 offset）"""
     try:
         if db_conn["type"] == "asyncpg":
-            conn = db_conn["connection"]
+            conn = read_connection(db_conn["connection"])
             where_clauses = ["review_type = $1", "target_id = $2", "is_public = true", "status = 'active'"]
             params = [target_type, target_id]
             param_count = 2
@@ -157,16 +188,17 @@ async def get_reviews_by_target(db_conn: Dict[str, Any], target_type: str, targe
                 if filters.has_content:
                     where_clauses.append("content IS NOT NULL AND LENGTH(content) > 0")
             
-            where_clause = " AND ".join(where_clauses)
-            
             # 排序
-            order_clause = "ORDER BY created_at DESC"
-            if filters and filters.sort_by:
-                sort_direction = "DESC" if filters.sort_order == "desc" else "ASC"
-                if filters.sort_by == "rating":
-                    order_clause = f"ORDER BY rating {sort_direction}, created_at DESC"
-                elif filters.sort_by == "helpful_count":
-                    order_clause = f"ORDER BY helpful_count {sort_direction}, created_at DESC"
+            sort_keys = review_sort_keys(filters)
+            order_clause = order_by_sql(sort_keys, alias="r")
+            
+            if cursor:
+                where_clauses.append(keyset_sql(sort_keys, param_count + 1, alias="r"))
+                params.extend(cursor)
+                param_count += len(cursor)
+                offset = 0
+            
+            where_clause = " AND ".join(where_clauses)
             
             param_count += 1
             limit_param = f"${param_count}"
@@ -206,8 +238,19 @@ async def get_reviews_by_target(db_conn: Dict[str, Any], target_type: str, targe
             sort_column = filters.sort_by if filters and filters.sort_by else 'created_at'
             sort_desc = filters.sort_order == 'desc' if filters and filters.sort_order else True
             
-            result = query.order(sort_column, desc=sort_desc).range(offset, offset + limit - 1).execute()
+            if cursor:
+                # 游标分页：排序键与 asyncpg 分支一致
+                sort_keys = review_sort_keys(filters)
+                query = query.or_(keyset_postgrest(sort_keys, cursor))
+                for key in sort_keys:
+                    query = query.order(key.column, desc=key.desc)
+                result = await query.limit(limit).execute()
+                return result.data
+            
+            result = await query.order(sort_column, desc=sort_desc).range(offset, offset + limit - 1).execute()
             return result.data
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取评价列表失败: {e}")
         return []
@@ -216,7 +259,7 @@ async def get_review_summary(db_conn: Dict[str, Any], target_type: str, target_i
     """获取评价统计摘要"""
     try:
         if db_conn["type"] == "asyncpg":
-            conn = db_conn["connection"]
+            conn = read_connection(db_conn["connection"])
             # 获取基本统计
             stats = await conn.fetchrow(
                 """
@@ -273,7 +316,7 @@ async def get_review_summary(db_conn: Dict[str, Any], target_type: str, target_i
             }
         else:
             client: Client = db_conn["connection"]
-            reviews = client.table('reviews').select('*').eq('review_type', target_type).eq('target_id', target_id).eq('is_public', True).eq('status', 'active').execute()
+            reviews = await client.table('reviews').select('*').eq('review_type', target_type).eq('target_id', target_id).eq('is_public', True).eq('status', 'active').execute()
             
             if not reviews.data:
                 return {
@@ -309,6 +352,8 @@ async def get_review_summary(db_conn: Dict[str, Any], target_type: str, target_i
                 'rating_distribution': rating_distribution,
                 'recent_reviews': reviews.data[:5]
             }
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取评价摘要失败: {e}")
         return {}
@@ -330,11 +375,15 @@ async def update_review(db_conn: Dict[str, Any], review_id: int, reviewer_id: in
                 RETURNING *
             """
             result = await conn.fetchrow(query, review_id, reviewer_id, *update_data.values())
+            await query_cache.invalidate("reviews")
             return dict(result) if result else None
         else:
             client: Client = db_conn["connection"]
-            result = client.table('reviews').update(update_data).eq('id', review_id).eq('reviewer_id', reviewer_id).execute()
+            result = await client.table('reviews').update(update_data).eq('id', review_id).eq('reviewer_id', reviewer_id).execute()
+            await query_cache.invalidate("reviews")
             return result.data[0] if result.data else None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"更新评价失败: {e}")
         return None
@@ -348,11 +397,15 @@ async def delete_review(db_conn: Dict[str, Any], review_id: int, reviewer_id: in
                 "UPDATE reviews SET status = 'deleted', updated_at = NOW() WHERE id = $1 AND reviewer_id = $2 RETURNING id",
                 review_id, reviewer_id
             )
+            await query_cache.invalidate("reviews")
             return result is not None
         else:
             client: Client = db_conn["connection"]
-            result = client.table('reviews').update({'status': 'deleted'}).eq('id', review_id).eq('reviewer_id', reviewer_id).execute()
+            result = await client.table('reviews').update({'status': 'deleted'}).eq('id', review_id).eq('reviewer_id', reviewer_id).execute()
+            await query_cache.invalidate("reviews")
             return len(result.data) > 0
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"删除评价失败: {e}")
         return False
@@ -396,10 +449,12 @@ async def interact_with_review(db_conn: Dict[str, Any], user_id: int, interactio
             client: Client = db_conn["connection"]
             # 简化版互动
             if interaction.action == "helpful":
-                client.table('reviews').update({'helpful_count': 1}).eq('id', interaction.review_id).execute()
+                await client.table('reviews').update({'helpful_count': 1}).eq('id', interaction.review_id).execute()
             elif interaction.action == "report":
-                client.table('reviews').update({'reported_count': 1}).eq('id', interaction.review_id).execute()
+                await client.table('reviews').update({'reported_count': 1}).eq('id', interaction.review_id).execute()
             return True
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"评价互动失败: {e}")
         return False
@@ -421,13 +476,15 @@ async def create_review_response(db_conn: Dict[str, Any], responder_id: int, res
             return dict(result) if result else None
         else:
             client: Client = db_conn["connection"]
-            result = client.table('review_responses').insert({
+            result = await client.table('review_responses').insert({
                 'review_id': response.review_id,
                 'responder_id': responder_id,
                 'response_content': response.response_content,
                 'is_official': response.is_official
             }).execute()
             return result.data[0] if result.data else None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"创建评价回复失败: {e}")
         return None
@@ -436,7 +493,7 @@ async def get_review_responses(db_conn: Dict[str, Any], review_id: int) -> List[
     """获取评价的所有回复"""
     try:
         if db_conn["type"] == "asyncpg":
-            conn = db_conn["connection"]
+            conn = read_connection(db_conn["connection"])
             results = await conn.fetch(
                 """
                 SELECT rr.*, u.username as responder_name, u.role as responder_role
@@ -450,8 +507,10 @@ async def get_review_responses(db_conn: Dict[str, Any], review_id: int) -> List[
             return [dict(row) for row in results]
         else:
             client: Client = db_conn["connection"]
-            result = client.table('review_responses').select('*').eq('review_id', review_id).order('created_at').execute()
+            result = await client.table('review_responses').select('*').eq('review_id', review_id).order('created_at').execute()
             return result.data
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取评价回复失败: {e}")
         return []
@@ -460,7 +519,7 @@ async def get_reviews_by_user(db_conn: Dict[str, Any], user_id: int, review_type
     """获取用户写的评价"""
     try:
         if db_conn["type"] == "asyncpg":
-            conn = db_conn["connection"]
+            conn = read_connection(db_conn["connection"])
             where_clause = "reviewer_id = $1 AND status = 'active'"
             params = [user_id]
             
@@ -487,8 +546,10 @@ async def get_reviews_by_user(db_conn: Dict[str, Any], user_id: int, review_type
             query = client.table('reviews').select('*').eq('reviewer_id', user_id).eq('status', 'active')
             if review_type:
                 query = query.eq('review_type', review_type)
-            result = query.order('created_at', desc=True).limit(limit).execute()
+            result = await query.order('created_at', desc=True).limit(limit).execute()
             return result.data
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取用户评价失败: {e}")
         return [] 
\ No newline at end of file
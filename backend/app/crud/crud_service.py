@@ -3,6 +3,9 @@ from decimal import Decimal
 from app.schemas.service_schema import ServiceCreate, ServiceUpdate, ServiceFilter
 import asyncpg
 
+from app.core.cache import query_cache
+from app.core.deadline import DeadlineExceeded
+
 async def create_service(db_conn: Dict[str, Any], mentor_user_id: int, service_data: ServiceCreate) -> Optional[Dict]:
     """创建指导服务"""
     try:
@@ -19,6 +22,7 @@ async def create_service(db_conn: Dict[str, Any], mentor_user_id: int, service_d
                 mentor_user_id, service_data.title, service_data.description, service_data.category,
                 float(service_data.price), service_data.duration / 60.0, service_data.is_active
             )
+            await query_cache.invalidate("services")
             return dict(result) if result else None
         else:
             from app.core.supabase_client import get_supabase_client
@@ -32,7 +36,10 @@ async def create_service(db_conn: Dict[str, Any], mentor_user_id: int, service_d
                 'duration_hours': service_data.duration / 60.0,  # 转换分钟为小时
                 'is_active': service_data.is_active
             })
+            await query_cache.invalidate("services")
             return result
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"创建服务失败: {e}")
         return None
@@ -58,9 +65,12 @@ async def get_mentor_services(db_conn: Dict[str, Any], mentor_user_id: int) -> L
             supabase = await get_supabase_client()
             result = await supabase.select('services',
                 'id, navigator_id, title, description, category, price, duration_hours, is_active, created_at, updated_at',
-                {'navigator_id': mentor_user_id}
+                {'navigator_id': mentor_user_id},
+                order='created_at.desc'
             )
             return result or []
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取导师服务失败: {e}")
         return []
@@ -2,6 +2,8 @@
 修复后的服务CRUD操作 - 匹配实际的 services 表结构
 """
 from typing import Optional, List
+from app.core.cache import query_cache
+from app.core.deadline import DeadlineExceeded
 from app.core.supabase_client import get_supabase_client
 from app.schemas.service_schema import ServiceCreate, ServiceRead, ServiceUpdate
 from datetime import datetime
@@ -22,6 +24,8 @@ class ServiceCRUD:
             if response and len(response) > 0:
                 return response[0]
             return None
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"获取服务失败: {e}")
             return None
@@ -46,9 +50,12 @@ class ServiceCRUD:
             )
             
             if response:
+                await query_cache.invalidate(self.table)
                 return response
             return None
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"创建服务失败: {e}")
             return None
@@ -82,9 +89,12 @@ class ServiceCRUD:
             )
             
             if response and len(response) > 0:
+                await query_cache.invalidate(self.table)
                 return response[0]
             return None
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"更新服务失败: {e}")
             return None
@@ -97,7 +107,10 @@ class ServiceCRUD:
                 table=self.table,
                 filters={"id": service_id, "navigator_id": navigator_id}
             )
+            await query_cache.invalidate(self.table)
             return response is not None
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"删除服务失败: {e}")
             return False
@@ -112,6 +125,8 @@ class ServiceCRUD:
                 filters={"navigator_id": navigator_id}
             )
             return response or []
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"获取导航者服务失败: {e}")
             return []
@@ -131,8 +146,14 @@ class ServiceCRUD:
             if category:
                 filters["category"] = category
             
-            # 注意：Supabase REST API 对于数值范围查询的语法可能需要特殊处理
-            # 这里先用基本的过滤，复杂查询可能需要使用 PostgREST 的高级语法
+            # 价格范围在数据库端过滤（price=gte.x&price=lte.y），保证分页结果正确
+            price_range = {}
+            if min_price is not None:
+                price_range["gte"] = min_price
+            if max_price is not None:
+                price_range["lte"] = max_price
+            if price_range:
+                filters["price"] = price_range
             
             response = await supabase_client.select(
                 table=self.table,
@@ -142,15 +163,10 @@ class ServiceCRUD:
                 offset=offset
             )
             
-            # 在内存中进行价格过滤（如果需要）
-            result = response or []
-            if min_price is not None:
-                result = [s for s in result if s.get('price', 0) >= min_price]
-            if max_price is not None:
-                result = [s for s in result if s.get('price', 0) <= max_price]
-            
-            return result
+            return response or []
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"搜索服务失败: {e}")
             return []
@@ -2,6 +2,8 @@
 修复后的服务CRUD操作 - 匹配实际的 services 表结构
 """
 from typing import Optional, List
+from app.core.cache import query_cache
+from app.core.deadline import DeadlineExceeded
 from app.core.supabase_client import get_supabase_client
 from app.schemas.service_schema import ServiceCreate, ServiceRead, ServiceUpdate
 from datetime import datetime
@@ -30,9 +32,12 @@ class ServiceCRUD:
             )
             
             if response:
+                await query_cache.invalidate(self.table)
                 return response
             return None
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"创建服务失败: {e}")
             return None
@@ -49,6 +54,8 @@ class ServiceCRUD:
             if response and len(response) > 0:
                 return response[0]
             return None
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"获取服务失败: {e}")
             return None
@@ -63,6 +70,8 @@ class ServiceCRUD:
                 filters={"navigator_id": navigator_id}
             )
             return response or []
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"获取导师服务失败: {e}")
             return []
@@ -96,9 +105,12 @@ class ServiceCRUD:
             )
             
             if response and len(response) > 0:
+                await query_cache.invalidate(self.table)
                 return response[0]
             return None
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"更新服务失败: {e}")
             return None
@@ -111,7 +123,10 @@ class ServiceCRUD:
                 table=self.table,
                 filters={"id": service_id}
             )
+            await query_cache.invalidate(self.table)
             return response is not None
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"删除服务失败: {e}")
             return False
@@ -142,6 +157,8 @@ class ServiceCRUD:
             
             return response or []
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"搜索服务失败: {e}")
             return []
@@ -1,8 +1,14 @@
-from typing import Optional, List, Dict, Any
+from typing import TYPE_CHECKING, Optional, List, Dict, Any
 from datetime import datetime
 from app.schemas.session_schema import SessionCreate, SessionUpdate, SessionFeedback, SessionSummary
 import asyncpg
-from supabase import Client
+if TYPE_CHECKING:
+    # 仅用于类型标注，避免导入时加载 supabase 包
+    from supabase import Client
+
+from app.core.deadline import DeadlineExceeded
+from app.core.lazy_connection import read_connection
+from app.core.popularity import popular_mentors
 
 async def create_session(db_conn: Dict[str, Any], student_user_id: int, session_data: SessionCreate) -> Optional[Dict]:
     """创建指导会话"""
@@ -27,7 +33,7 @@ async def create_session(db_conn: Dict[str, Any], student_user_id: int, session_
             return dict(result) if result else None
         else:
             client: Client = db_conn["connection"]
-            result = client.table('mentorship_sessions').insert({
+            result = await client.table('mentorship_sessions').insert({
                 'student_id': student_user_id,
                 'mentor_id': session_data.mentor_id,
                 'order_id': session_data.order_id,
@@ -41,6 +47,8 @@ async def create_session(db_conn: Dict[str, Any], student_user_id: int, session_
                 'status': 'scheduled'
             }).execute()
             return result.data[0] if result.data else None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"创建会话失败: {e}")
         return None
@@ -69,17 +77,19 @@ async def get_session_by_id(db_conn: Dict[str, Any], session_id: int, user_id: i
             return dict(result) if result else None
         else:
             client: Client = db_conn["connection"]
-            result = client.table('mentorship_sessions').select('*').eq('id', session_id).execute()
+            result = await client.table('mentorship_sessions').select('*').eq('id', session_id).execute()
             if result.data:
                 session = result.data[0]
                 # 验证用户权限
                 if session['student_id'] == user_id:
                     return session
                 # 检查是否是指导者
-                mentor = client.table('mentorship_relationships').select('user_id').eq('id', session['mentor_id']).execute()
+                mentor = await client.table('mentorship_relationships').select('user_id').eq('id', session['mentor_id']).execute()
                 if mentor.data and mentor.data[0]['user_id'] == user_id:
                     return session
             return None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取会话详情失败: {e}")
         return None
@@ -88,7 +98,7 @@ async def get_sessions_by_user(db_conn: Dict[str, Any], user_id: int, role: str
     """获取用户的所有会话"""
     try:
         if db_conn["type"] == "asyncpg":
-            conn = db_conn["connection"]
+            conn = read_connection(db_conn["connection"])
             if role == "student":
                 # 学生查看自己的会话
                 results = await conn.fetch(
@@ -149,11 +159,13 @@ async def get_sessions_by_user(db_conn: Dict[str, Any], user_id: int, role: str
         else:
             client: Client = db_conn["connection"]
             if role == "student":
-                result = client.table('mentorship_sessions').select('*').eq('student_id', user_id).order('scheduled_time', desc=True).limit(limit).execute()
+                result = await client.table('mentorship_sessions').select('*').eq('student_id', user_id).order('scheduled_time', desc=True).limit(limit).execute()
             else:
                 # 简化版：获取所有会话
-                result = client.table('mentorship_sessions').select('*').order('scheduled_time', desc=True).limit(limit).execute()
+                result = await client.table('mentorship_sessions').select('*').order('scheduled_time', desc=True).limit(limit).execute()
             return result.data
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取用户会话失败: {e}")
         return []
@@ -182,10 +194,12 @@ async def update_session(db_conn: Dict[str, Any], session_id: int, user_id: int,
                 return await get_session_by_id(db_conn, session_id, user_id)
         else:
             client: Client = db_conn["connection"]
-            result = client.table('mentorship_sessions').update(update_data).eq('id', session_id).execute()
+            result = await client.table('mentorship_sessions').update(update_data).eq('id', session_id).execute()
             if result.data:
                 return await get_session_by_id(db_conn, session_id, user_id)
         return None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"更新会话失败: {e}")
         return None
@@ -210,11 +224,13 @@ async def start_session(db_conn: Dict[str, Any], session_id: int, user_id: int)
             return result is not None
         else:
             client: Client = db_conn["connection"]
-            result = client.table('mentorship_sessions').update({
+            result = await client.table('mentorship_sessions').update({
                 'status': 'in_progress',
                 'actual_start_time': datetime.now().isoformat()
             }).eq('id', session_id).eq('status', 'confirmed').execute()
             return len(result.data) > 0
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"开始会话失败: {e}")
         return False
@@ -234,7 +250,7 @@ async def end_session(db_conn: Dict[str, Any], session_id: int, user_id: int, ac
                         student_id = $2 OR 
                         mentor_id = (SELECT id FROM mentorship_relationships WHERE user_id = $2)
                     ) AND status = 'in_progress'
-                    RETURNING id
+                    RETURNING mentor_id
                     """,
                     session_id, user_id, actual_duration
                 )
@@ -249,10 +265,12 @@ async def end_session(db_conn: Dict[str, Any], session_id: int, user_id: int, ac
                         student_id = $2 OR 
                         mentor_id = (SELECT id FROM mentorship_relationships WHERE user_id = $2)
                     ) AND status = 'in_progress'
-                    RETURNING id
+                    RETURNING mentor_id
                     """,
                     session_id, user_id
                 )
+            if result is not None:
+                popular_mentors.record_session(result)
             return result is not None
         else:
             client: Client = db_conn["connection"]
@@ -263,8 +281,12 @@ async def end_session(db_conn: Dict[str, Any], session_id: int, user_id: int, ac
             if actual_duration:
                 update_data['actual_duration'] = actual_duration
                 
-            result = client.table('mentorship_sessions').update(update_data).eq('id', session_id).eq('status', 'in_progress').execute()
+            result = await client.table('mentorship_sessions').update(update_data).eq('id', session_id).eq('status', 'in_progress').execute()
+            if result.data:
+                popular_mentors.record_session(result.data[0].get('mentor_id'))
             return len(result.data) > 0
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"结束会话失败: {e}")
         return False
@@ -293,8 +315,10 @@ async def cancel_session(db_conn: Dict[str, Any], session_id: int, user_id: int,
             if reason:
                 update_data['mentor_notes'] = reason
                 
-            result = client.table('mentorship_sessions').update(update_data).eq('id', session_id).execute()
+            result = await client.table('mentorship_sessions').update(update_data).eq('id', session_id).execute()
             return len(result.data) > 0
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"取消会话失败: {e}")
         return False
@@ -358,11 +382,13 @@ async def submit_session_feedback(db_conn: Dict[str, Any], session_id: int, user
         else:
             client: Client = db_conn["connection"]
             # 简化版反馈
-            result = client.table('mentorship_sessions').update({
+            result = await client.table('mentorship_sessions').update({
                 'student_feedback': feedback.comments,
                 'rating': feedback.rating
             }).eq('id', session_id).execute()
             return len(result.data) > 0
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"提交会话反馈失败: {e}")
         return False
@@ -394,10 +420,12 @@ async def save_session_summary(db_conn: Dict[str, Any], session_id: int, user_id
         else:
             client: Client = db_conn["connection"]
             # 简化版总结保存
-            result = client.table('mentorship_sessions').update({
+            result = await client.table('mentorship_sessions').update({
                 'mentor_notes': f"总结: {summary.key_points}"
             }).eq('id', session_id).execute()
             return len(result.data) > 0
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"保存会话总结失败: {e}")
         return False
@@ -406,7 +434,7 @@ async def get_upcoming_sessions(db_conn: Dict[str, Any], user_id: int, role: str
     """获取即将到来的会话"""
     try:
         if db_conn["type"] == "asyncpg":
-            conn = db_conn["connection"]
+            conn = read_connection(db_conn["connection"])
             if role == "student":
                 results = await conn.fetch(
                     """
@@ -459,8 +487,10 @@ async def get_upcoming_sessions(db_conn: Dict[str, Any], user_id: int, role: str
         else:
             client: Client = db_conn["connection"]
             # 简化版：获取即将到来的会话
-            result = client.table('mentorship_sessions').select('*').gte('scheduled_time', datetime.now().isoformat()).in_('status', ['scheduled', 'confirmed']).order('scheduled_time').limit(limit).execute()
+            result = await client.table('mentorship_sessions').select('*').gte('scheduled_time', datetime.now().isoformat()).in_('status', ['scheduled', 'confirmed']).order('scheduled_time').limit(limit).execute()
             return result.data
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取即将到来的会话失败: {e}")
         return []
@@ -469,7 +499,7 @@ async def get_session_statistics(db_conn: Dict[str, Any], user_id: int, role: st
     """获取会话统计信息"""
     try:
         if db_conn["type"] == "asyncpg":
-            conn = db_conn["connection"]
+            conn = read_connection(db_conn["connection"])
             if role == "student":
                 stats = await conn.fetchrow(
                     """
@@ -504,10 +534,10 @@ async def get_session_statistics(db_conn: Dict[str, Any], user_id: int, role: st
             client: Client = db_conn["connection"]
             # 简化版统计
             if role == "student":
-                sessions = client.table('mentorship_sessions').select('*').eq('student_id', user_id).execute()
+                sessions = await client.table('mentorship_sessions').select('*').eq('student_id', user_id).execute()
             else:
                 # 需要通过mentor关系查询
-                sessions = client.table('mentorship_sessions').select('*').execute()
+                sessions = await client.table('mentorship_sessions').select('*').execute()
             
             if sessions.data:
                 total = len(sessions.data)
@@ -519,6 +549,8 @@ async def get_session_statistics(db_conn: Dict[str, Any], user_id: int, role: st
                     'cancelled_sessions': cancelled
                 }
             return {}
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取会话统计失败: {e}")
         return {} 
\ No newline at end of file
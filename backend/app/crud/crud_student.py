@@ -1,7 +1,11 @@
-from typing import Optional, List, Dict, Any
+from typing import TYPE_CHECKING, Optional, List, Dict, Any
 from app.schemas.student_schema import StudentCreate, StudentUpdate, LearningNeeds, LearningNeedsUpdate
 import asyncpg
-from supabase import Client
+if TYPE_CHECKING:
+    # 仅用于类型标注，避免导入时加载 supabase 包
+    from supabase import Client
+
+from app.core.deadline import DeadlineExceeded
 
 async def create_student_profile(db_conn: Dict[str, Any], user_id: int, student_data: StudentCreate) -> Optional[Dict]:
     """创建申请者资料"""
@@ -26,7 +30,7 @@ async def create_student_profile(db_conn: Dict[str, Any], user_id: int, student_
             return dict(result) if result else None
         else:
             client: Client = db_conn["connection"]
-            result = client.table('user_learning_needs').insert({
+            result = await client.table('user_learning_needs').insert({
                 'user_id': user_id,
                 'urgency_level': 2,  # 中等紧急
                 'budget_min': None,
@@ -40,6 +44,8 @@ async def create_student_profile(db_conn: Dict[str, Any], user_id: int, student_
                 'is_active': True
             }).execute()
             return result.data[0] if result.data else None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"创建申请者资料失败: {e}")
         return None
@@ -62,10 +68,12 @@ async def get_student_by_user_id(db_conn: Dict[str, Any], user_id: int) -> Optio
             return dict(result) if result else None
         else:
             client: Client = db_conn["connection"]
-            result = client.table('user_learning_needs').select(
+            result = await client.table('user_learning_needs').select(
                 '*, users:user_id(username, email), profiles:user_id(full_name, avatar_url)'
             ).eq('user_id', user_id).execute()
             return result.data[0] if result.data else None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取申请者资料失败: {e}")
         return None
@@ -91,10 +99,12 @@ async def update_student_profile(db_conn: Dict[str, Any], user_id: int, student_
                 return await get_student_by_user_id(db_conn, user_id)
         else:
             client: Client = db_conn["connection"]
-            result = client.table('user_learning_needs').update(update_data).eq('user_id', user_id).execute()
+            result = await client.table('user_learning_needs').update(update_data).eq('user_id', user_id).execute()
             if result.data:
                 return await get_student_by_user_id(db_conn, user_id)
         return None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"更新申请者资料失败: {e}")
         return None
@@ -119,7 +129,7 @@ async def create_learning_needs(db_conn: Dict[str, Any], learning_needs: Learnin
             return dict(result) if result else None
         else:
             client: Client = db_conn["connection"]
-            result = client.table('user_learning_needs').insert({
+            result = await client.table('user_learning_needs').insert({
                 'user_id': learning_needs.user_id,
                 'need_type': learning_needs.need_type,
                 'subject_area': learning_needs.subject_area,
@@ -129,6 +139,8 @@ async def create_learning_needs(db_conn: Dict[str, Any], learning_needs: Learnin
                 'preferred_mentor_criteria': learning_needs.preferred_mentor_criteria
             }).execute()
             return result.data[0] if result.data else None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"创建学习需求失败: {e}")
         return None
@@ -149,8 +161,10 @@ async def get_learning_needs_by_user(db_conn: Dict[str, Any], user_id: int) -> L
             return [dict(row) for row in results]
         else:
             client: Client = db_conn["connection"]
-            result = client.table('user_learning_needs').select('*').eq('user_id', user_id).order('created_at', desc=True).execute()
+            result = await client.table('user_learning_needs').select('*').eq('user_id', user_id).order('created_at', desc=True).execute()
             return result.data
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取学习需求失败: {e}")
         return []
@@ -175,8 +189,10 @@ async def update_learning_needs(db_conn: Dict[str, Any], needs_id: int, user_id:
             return dict(result) if result else None
         else:
             client: Client = db_conn["connection"]
-            result = client.table('user_learning_needs').update(update_data).eq('id', needs_id).eq('user_id', user_id).execute()
+            result = await client.table('user_learning_needs').update(update_data).eq('id', needs_id).eq('user_id', user_id).execute()
             return result.data[0] if result.data else None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"更新学习需求失败: {e}")
         return None
@@ -193,8 +209,10 @@ async def delete_learning_needs(db_conn: Dict[str, Any], needs_id: int, user_id:
             return result is not None
         else:
             client: Client = db_conn["connection"]
-            result = client.table('user_learning_needs').delete().eq('id', needs_id).eq('user_id', user_id).execute()
+            result = await client.table('user_learning_needs').delete().eq('id', needs_id).eq('user_id', user_id).execute()
             return len(result.data) > 0
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"删除学习需求失败: {e}")
         return False
@@ -234,10 +252,12 @@ async def get_student_application_progress(db_conn: Dict[str, Any], user_id: int
             return result
         else:
             client: Client = db_conn["connection"]
-            student = client.table('user_learning_needs').select('*').eq('user_id', user_id).execute()
+            student = await client.table('user_learning_needs').select('*').eq('user_id', user_id).execute()
             if student.data:
                 return student.data[0]
             return {}
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取申请进度失败: {e}")
         return {}
@@ -287,10 +307,12 @@ async def get_recommended_mentors_for_student(db_conn: Dict[str, Any], user_id:
         else:
             client: Client = db_conn["connection"]
             # 简化版推荐逻辑
-            result = client.table('mentorship_relationships').select(
+            result = await client.table('mentorship_relationships').select(
                 '*, users:user_id(username), profiles:user_id(full_name, avatar_url)'
             ).eq('verification_status', 'verified').order('rating', desc=True).limit(limit).execute()
             return result.data
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"推荐指导者失败: {e}")
         return [] 
\ No newline at end of file
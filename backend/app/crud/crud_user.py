@@ -3,24 +3,36 @@
 支持asyncpg连接池和Supabase客户端两种模式
 """
 import asyncpg
-from passlib.context import CryptContext
-from typing import Optional, Union, Dict, Any
-from supabase import Client
+from typing import TYPE_CHECKING, Optional, Union, Dict, Any
+if TYPE_CHECKING:
+    # 仅用于类型标注，避免导入时加载 supabase 包
+    from supabase import Client
 
+from app.core.cache import query_cache
+from app.core.deadline import DeadlineExceeded
+from app.core.lazy_connection import read_connection
+from app.core.password import PasswordHasherBusy, password_hasher, pwd_context
+from app.core.statements import statement_registry
+from app.core.user_cache import user_cache
 from app.schemas.user_schema import UserCreate, UserUpdate, UserRead, ProfileUpdate, ProfileRead
 
-# 密码哈希上下文
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 热点查询：登录与每次鉴权都会按用户名查询用户
+USER_BY_USERNAME = statement_registry.register(
+    "users.by_username",
+    "SELECT id, username, email, password_hash, role, is_active, created_at FROM users WHERE username = $1"
+)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """验证密码"""
+    """验证密码（同步，会阻塞事件循环；请求处理中请使用 password_hasher）"""
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    """生成密码哈希"""
+    """生成密码哈希（同步，会阻塞事件循环；请求处理中请使用 password_hasher）"""
     return pwd_context.hash(password)
 
 # 通用数据库操作函数
+# 用户查询用于登录、注册唯一性检查与鉴权，始终读取主库：只读副本的复制延迟会导致刚注册的用户无法登录、
+# 修改后的密码或角色不生效
 async def get_user_by_id(db_conn: Dict[str, Any], user_id: int) -> Optional[Dict]:
     """根据ID获取用户"""
     try:
@@ -33,10 +45,12 @@ async def get_user_by_id(db_conn: Dict[str, Any], user_id: int) -> Optional[Dict
             return dict(result) if result else None
         else:
             client: Client = db_conn["connection"]
-            result = client.table('users').select(
+            result = await client.table('users').select(
                 'id, username, email, password_hash, role, is_active, created_at'
             ).eq('id', user_id).execute()
             return result.data[0] if result.data else None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取用户失败: {e}")
         return None
@@ -46,17 +60,16 @@ async def get_user_by_username(db_conn: Dict[str, Any], username: str) -> Option
     try:
         if db_conn["type"] == "asyncpg":
             conn = db_conn["connection"]
-            result = await conn.fetchrow(
-                "SELECT id, username, email, password_hash, role, is_active, created_at FROM users WHERE username = $1",
-                username
-            )
+            result = await statement_registry.fetchrow(conn, USER_BY_USERNAME, username)
             return dict(result) if result else None
         else:
             client: Client = db_conn["connection"]
-            result = client.table('users').select(
+            result = await client.table('users').select(
                 'id, username, email, password_hash, role, is_active, created_at'
             ).eq('username', username).execute()
             return result.data[0] if result.data else None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取用户失败: {e}")
         return None
@@ -73,10 +86,12 @@ async def get_user_by_email(db_conn: Dict[str, Any], email: str) -> Optional[Dic
             return dict(result) if result else None
         else:
             client: Client = db_conn["connection"]
-            result = client.table('users').select(
+            result = await client.table('users').select(
                 'id, username, email, password_hash, role, is_active, created_at'
             ).eq('email', email).execute()
             return result.data[0] if result.data else None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取用户失败: {e}")
         return None
@@ -95,8 +110,8 @@ async def create_user(db_conn: Dict[str, Any], user: UserCreate) -> Optional[Dic
             if existing_email:
                 raise ValueError("邮箱已存在")
         
-        # 哈希密码
-        hashed_password = get_password_hash(user.password)
+        # 哈希密码（在专用线程池中执行，不阻塞事件循环）
+        hashed_password = await password_hasher.hash(user.password)
         
         if db_conn["type"] == "asyncpg":
             conn = db_conn["connection"]
@@ -109,18 +124,22 @@ async def create_user(db_conn: Dict[str, Any], user: UserCreate) -> Optional[Dic
                 user.username, user.email, hashed_password, 
                 getattr(user, 'role', 'user'), True
             )
+            await query_cache.invalidate("users")
             return dict(result) if result else None
         else:
             client: Client = db_conn["connection"]
-            result = client.table('users').insert({
+            result = await client.table('users').insert({
                 'username': user.username,
                 'email': user.email,
                 'password_hash': hashed_password,
                 'role': getattr(user, 'role', 'user'),
                 'is_active': True
             }).execute()
+            await query_cache.invalidate("users")
             return result.data[0] if result.data else None
             
+    except (PasswordHasherBusy, DeadlineExceeded):
+        raise
     except Exception as e:
         print(f"创建用户失败: {e}")
         raise ValueError(f"创建用户失败: {str(e)}")
@@ -130,12 +149,43 @@ async def authenticate_user(db_conn: Dict[str, Any], username: str, password: st
     user = await get_user_by_username(db_conn, username)
     if not user:
         return None
-    if not verify_password(password, user['password_hash']):
+    verified, new_hash = await password_hasher.verify_and_update(password, user['password_hash'])
+    if not verified:
         return None
     if not user.get('is_active', True):
         return None
+    if new_hash:
+        # bcrypt 成本配置已变更，登录成功时按新成本更新哈希
+        await rehash_password(db_conn, user['id'], user['password_hash'], new_hash)
     return user
 
+async def rehash_password(db_conn: Dict[str, Any], user_id: int, old_hash: str, new_hash: str) -> bool:
+    """
+    更新用户的密码哈希（密码不变，仅哈希成本变化）
+    只在哈希仍为 old_hash 时更新，避免覆盖并发修改的新密码；失败不影响登录
+    """
+    try:
+        if db_conn["type"] == "asyncpg":
+            conn = db_conn["connection"]
+            result = await conn.execute(
+                "UPDATE users SET password_hash = $2 WHERE id = $1 AND password_hash = $3",
+                user_id, new_hash, old_hash
+            )
+            updated = result == "UPDATE 1"
+        else:
+            client: Client = db_conn["connection"]
+            result = await client.table('users').update({'password_hash': new_hash}).eq(
+                'id', user_id
+            ).eq('password_hash', old_hash).execute()
+            updated = bool(result.data)
+        await query_cache.invalidate("users")
+        return updated
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"更新密码哈希失败: {e}")
+        return False
+
 async def update_user(db_conn: Dict[str, Any], user_id: int, user_update: UserUpdate) -> Optional[Dict]:
     """更新用户信息"""
     try:
@@ -145,7 +195,7 @@ async def update_user(db_conn: Dict[str, Any], user_id: int, user_update: UserUp
         
         # 如果要更新密码，需要哈希
         if 'password' in update_data:
-            update_data['password_hash'] = get_password_hash(update_data.pop('password'))
+            update_data['password_hash'] = await password_hasher.hash(update_data.pop('password'))
         
         if db_conn["type"] == "asyncpg":
             conn = db_conn["connection"]
@@ -156,12 +206,18 @@ async def update_user(db_conn: Dict[str, Any], user_id: int, user_update: UserUp
                 RETURNING id, username, email, role, is_active, created_at
             """
             result = await conn.fetchrow(query, user_id, *update_data.values())
+            await query_cache.invalidate("users")
+            await user_cache.invalidate(user_id)
             return dict(result) if result else None
         else:
             client: Client = db_conn["connection"]
-            result = client.table('users').update(update_data).eq('id', user_id).execute()
+            result = await client.table('users').update(update_data).eq('id', user_id).execute()
+            await query_cache.invalidate("users")
+            await user_cache.invalidate(user_id)
             return result.data[0] if result.data else None
             
+    except (PasswordHasherBusy, DeadlineExceeded):
+        raise
     except Exception as e:
         print(f"更新用户失败: {e}")
         return None
@@ -172,11 +228,17 @@ async def delete_user(db_conn: Dict[str, Any], user_id: int) -> bool:
         if db_conn["type"] == "asyncpg":
             conn = db_conn["connection"]
             result = await conn.execute("DELETE FROM users WHERE id = $1", user_id)
+            await query_cache.invalidate("users")
+            await user_cache.invalidate(user_id)
             return result == "DELETE 1"
         else:
             client: Client = db_conn["connection"]
-            result = client.table('users').delete().eq('id', user_id).execute()
+            result = await client.table('users').delete().eq('id', user_id).execute()
+            await query_cache.invalidate("users")
+            await user_cache.invalidate(user_id)
             return len(result.data) > 0
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"删除用户失败: {e}")
         return False
@@ -186,7 +248,7 @@ async def get_user_profile(db_conn: Dict[str, Any], user_id: int) -> Optional[Di
     """获取用户资料"""
     try:
         if db_conn["type"] == "asyncpg":
-            conn = db_conn["connection"]
+            conn = read_connection(db_conn["connection"])
             # 添加连接验证
             try:
                 result = await conn.fetchrow(
@@ -217,7 +279,7 @@ async def get_user_profile(db_conn: Dict[str, Any], user_id: int) -> Optional[Di
             client: Client = db_conn["connection"]
             # 先获取用户信息
             try:
-                user_result = client.table('users').select(
+                user_result = await client.table('users').select(
                     'id, username, email, role, is_active, created_at'
                 ).eq('id', user_id).execute()
                 
@@ -228,7 +290,7 @@ async def get_user_profile(db_conn: Dict[str, Any], user_id: int) -> Optional[Di
                 
                 # 尝试获取profile信息，如果失败也不影响基本用户信息返回
                 try:
-                    profile_result = client.table('profiles').select(
+                    profile_result = await client.table('profiles').select(
                         'full_name, avatar_url, bio, phone, location, website, birth_date'
                     ).eq('user_id', user_id).execute()
                     
@@ -247,6 +309,8 @@ async def get_user_profile(db_conn: Dict[str, Any], user_id: int) -> Optional[Di
             except Exception as supabase_error:
                 print(f"Supabase查询失败: {supabase_error}")
                 return None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"获取用户资料失败: {e}")
         return None
@@ -279,22 +343,26 @@ async def update_user_profile(db_conn: Dict[str, Any], user_id: int, profile: Pr
                 query = f"INSERT INTO profiles ({columns}) VALUES ({placeholders})"
                 await conn.execute(query, *update_data.values())
                 
+            await query_cache.invalidate("profiles")
             return await get_user_profile(db_conn, user_id)
         else:
             client: Client = db_conn["connection"]
             # 检查profile是否存在
-            existing = client.table('profiles').select('id').eq('user_id', user_id).execute()
+            existing = await client.table('profiles').select('id').eq('user_id', user_id).execute()
             
             if existing.data:
                 # 更新
-                result = client.table('profiles').update(update_data).eq('user_id', user_id).execute()
+                result = await client.table('profiles').update(update_data).eq('user_id', user_id).execute()
             else:
                 # 创建
                 update_data['user_id'] = user_id
-                result = client.table('profiles').insert(update_data).execute()
+                result = await client.table('profiles').insert(update_data).execute()
             
+            await query_cache.invalidate("profiles")
             return await get_user_profile(db_conn, user_id)
             
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"更新用户资料失败: {e}")
         return None 
\ No newline at end of file
@@ -18,6 +18,10 @@ from fastapi.staticfiles import StaticFiles
 
 from app.core.config import settings
 from app.core.db import lifespan, check_db_health
+from app.core.metrics import db_metrics
+from app.core.deadline import DeadlineExceeded, DeadlineMiddleware
+from app.core.password import PasswordHasherBusy
+from app.core.rate_limit import RateLimitMiddleware
 from app.api.routers import auth_router, user_router
 
 # 配置日志
@@ -37,6 +41,14 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 请求截止时间（最内层中间件，超时返回的 504 同样带 CORS 头）
+# 按路由设置截止时间，数据库、Supabase、LLM 和工具调用都不超过剩余时间，到期取消请求处理
+app.add_middleware(DeadlineMiddleware)
+
+# 令牌桶限流（在截止时间之外、CORS 之内，429 响应同样带 CORS 头）
+# 全局按 IP 限额，登录 / 注册按 IP、智能体接口按用户另有更严格的限额
+app.add_middleware(RateLimitMiddleware)
+
 # CORS配置（支持前端跨域访问）
 # 开发环境和生产环境的动态配置
 allowed_origins = [
@@ -72,7 +84,7 @@ app.add_middleware(
         "X-CSRF-Token",
         "Cache-Control",
     ],
-    expose_headers=["Content-Length", "X-Request-ID"],
+    expose_headers=["Content-Length", "X-Request-ID", "X-Next-Cursor", "Retry-After"],
     max_age=3600,  # 预检请求缓存时间
 )
 
@@ -99,9 +111,28 @@ async def global_exception_handler(request: Request, exc: Exception):
         },
     )
 
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exception_handler(request: Request, exc: DeadlineExceeded):
+    """请求截止时间已到（数据库、Supabase、LLM 或工具调用超时）"""
+    logger.warning(f"请求超过截止时间: {request.method} {request.url.path}")
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={"detail": "请求处理超时，请稍后重试"},
+    )
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    """密码哈希线程池排队已满（登录 / 注册高峰）"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": exc.message},
+        headers={"Retry-After": "1"},
+    )
+
 # 注册所有路由模块
 from app.api.routers import (
-    auth_router, user_router, matching_router, session_router, review_router, message_router
+    auth_router, user_router, matching_router, session_router, review_router, message_router,
+    admin_router
 )
 # 使用修复后的路由
 from app.api.routers.mentor_router_fixed import router as mentor_router_fixed
@@ -120,6 +151,7 @@ from app.api.routers.planner_router import router as planner_router
 # 用户认证和管理
 app.include_router(auth_router.router, prefix="/api/v1/auth", tags=["认证系统"])
 app.include_router(user_router.router, prefix="/api/v1/users", tags=["用户管理"])
+app.include_router(admin_router.router, prefix="/api/v1/admin", tags=["系统管理"])
 
 # 留学平台核心功能
 app.include_router(mentor_router_fixed, prefix="/api/v1/mentors", tags=["学长学姐"])
@@ -195,13 +227,18 @@ async def log_requests(request: Request, call_next):
     # 记录请求信息
     logger.info(f"收到请求: {request.method} {request.url}")
     
-    response = await call_next(request)
+    # 开始统计本请求的数据库查询次数
+    metrics_token = db_metrics.begin_request()
+    try:
+        response = await call_next(request)
+    finally:
+        query_count = db_metrics.end_request(metrics_token)
     
     # 记录响应信息
     process_time = time.time() - start_time
     logger.info(
         f"请求处理完成: {request.method} {request.url} - "
-        f"状态码: {response.status_code} - 耗时: {process_time:.4f}s"
+        f"状态码: {response.status_code} - 耗时: {process_time:.4f}s - 查询数: {query_count}"
     )
     
     return response
@@ -8,8 +8,11 @@ from typing import Optional
 class TokenPayload(BaseModel):
     """JWT Token 载荷数据模型"""
     sub: str  # subject (用户名)
+    uid: Optional[str] = None  # 无状态令牌：用户ID
     role: Optional[str] = None
     email: Optional[str] = None
+    ver: Optional[int] = None  # 无状态令牌：签发时的用户版本号
+    jti: Optional[str] = None  # 令牌ID，用于吊销
     exp: Optional[int] = None  # expiration time
     iat: Optional[int] = None  # issued at time
 
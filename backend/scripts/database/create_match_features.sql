@@ -0,0 +1,51 @@
+-- 匹配特征物化视图
+-- 把大学排名预先整理成按大学一行的特征，匹配评分查询对每个导师只需按 university 做等值连接，不再逐行执行自连接。
+-- 特征按大学而不是按导师计算，导师修改资料或新导师加入时不需要刷新；参考表 university_rankings 变更时由触发器并发刷新。
+-- 相关专业与学科大类由应用内的专业关系图（app/core/major_taxonomy.py）从 major_relations / major_categories 加载，
+-- 评分查询以参数传入，不再需要专业特征视图。
+-- 依赖 create_matching_tables.sql 中的参考表。
+
+-- 名称模糊匹配（三元组相似度，规则与 app/core/fuzzy.py 一致）
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_mentorship_relationships_university_trgm
+    ON mentorship_relationships USING gin (university gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_mentorship_relationships_major_trgm
+    ON mentorship_relationships USING gin (major gin_trgm_ops);
+
+-- 大学特征：排名（同档次匹配按 ranking 范围查找）
+CREATE MATERIALIZED VIEW IF NOT EXISTS university_match_features AS
+SELECT
+    university::text AS university,
+    ranking,
+    tier
+FROM university_rankings
+WHERE ranking IS NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_university_match_features_university
+    ON university_match_features (university);
+CREATE INDEX IF NOT EXISTS idx_university_match_features_ranking
+    ON university_match_features (ranking);
+
+-- 并发刷新：刷新期间匹配查询仍可读取旧数据（依赖上面的唯一索引）
+CREATE OR REPLACE FUNCTION refresh_match_features()
+RETURNS void AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY university_match_features;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION refresh_match_features_trigger()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_match_features();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 参考表变更时刷新（语句级触发器，批量导入只刷新一次）
+DROP TRIGGER IF EXISTS trg_university_rankings_match_features ON university_rankings;
+CREATE TRIGGER trg_university_rankings_match_features
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON university_rankings
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_match_features_trigger();
+
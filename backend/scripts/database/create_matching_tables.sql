@@ -61,6 +61,84 @@ INSERT INTO major_relations (major1, major2, relation_type, similarity_score) VA
 ('Physics', 'Engineering Physics', 'related', 0.7)
 ON CONFLICT (major1, major2) DO NOTHING;
 
+-- 内置专业关系（与 app/core/major_taxonomy.py 中 BUILTIN_RELATED_MAJORS 一致：同一组内的专业两两相关）
+INSERT INTO major_relations (major1, major2, relation_type) VALUES
+('Computer Science', 'Software Engineering', 'related'),
+('Computer Science', 'Information Technology', 'related'),
+('Computer Science', 'Data Science', 'related'),
+('Computer Science', 'Artificial Intelligence', 'related'),
+('Software Engineering', 'Information Technology', 'related'),
+('Software Engineering', 'Data Science', 'related'),
+('Software Engineering', 'Artificial Intelligence', 'related'),
+('Information Technology', 'Data Science', 'related'),
+('Information Technology', 'Artificial Intelligence', 'related'),
+('Data Science', 'Artificial Intelligence', 'related'),
+('Business Administration', 'Management', 'related'),
+('Business Administration', 'Marketing', 'related'),
+('Business Administration', 'Finance', 'related'),
+('Business Administration', 'Economics', 'related'),
+('Management', 'Marketing', 'related'),
+('Management', 'Finance', 'related'),
+('Management', 'Economics', 'related'),
+('Marketing', 'Finance', 'related'),
+('Marketing', 'Economics', 'related'),
+('Finance', 'Economics', 'related'),
+('Electrical Engineering', 'Computer Engineering', 'related'),
+('Electrical Engineering', 'Electronics', 'related'),
+('Electrical Engineering', 'Telecommunications', 'related'),
+('Computer Engineering', 'Electronics', 'related'),
+('Computer Engineering', 'Telecommunications', 'related'),
+('Electronics', 'Telecommunications', 'related'),
+('Mechanical Engineering', 'Aerospace Engineering', 'related'),
+('Mechanical Engineering', 'Automotive Engineering', 'related'),
+('Mechanical Engineering', 'Robotics', 'related'),
+('Aerospace Engineering', 'Automotive Engineering', 'related'),
+('Aerospace Engineering', 'Robotics', 'related'),
+('Automotive Engineering', 'Robotics', 'related'),
+('Psychology', 'Cognitive Science', 'related'),
+('Psychology', 'Behavioral Science', 'related'),
+('Psychology', 'Neuroscience', 'related'),
+('Cognitive Science', 'Behavioral Science', 'related'),
+('Cognitive Science', 'Neuroscience', 'related'),
+('Behavioral Science', 'Neuroscience', 'related'),
+('Biology', 'Biotechnology', 'related'),
+('Biology', 'Biochemistry', 'related'),
+('Biology', 'Bioinformatics', 'related'),
+('Biology', 'Molecular Biology', 'related'),
+('Biotechnology', 'Biochemistry', 'related'),
+('Biotechnology', 'Bioinformatics', 'related'),
+('Biotechnology', 'Molecular Biology', 'related'),
+('Biochemistry', 'Bioinformatics', 'related'),
+('Biochemistry', 'Molecular Biology', 'related'),
+('Bioinformatics', 'Molecular Biology', 'related'),
+('Chemistry', 'Chemical Engineering', 'related'),
+('Chemistry', 'Materials Science', 'related'),
+('Chemistry', 'Pharmaceutical Science', 'related'),
+('Chemical Engineering', 'Materials Science', 'related'),
+('Chemical Engineering', 'Pharmaceutical Science', 'related'),
+('Materials Science', 'Pharmaceutical Science', 'related'),
+('Mathematics', 'Statistics', 'related'),
+('Mathematics', 'Actuarial Science', 'related'),
+('Mathematics', 'Applied Mathematics', 'related'),
+('Mathematics', 'Data Science', 'related'),
+('Statistics', 'Actuarial Science', 'related'),
+('Statistics', 'Applied Mathematics', 'related'),
+('Statistics', 'Data Science', 'related'),
+('Actuarial Science', 'Applied Mathematics', 'related'),
+('Actuarial Science', 'Data Science', 'related'),
+('Applied Mathematics', 'Data Science', 'related'),
+('Physics', 'Astronomy', 'related'),
+('Physics', 'Astrophysics', 'related'),
+('Physics', 'Engineering Physics', 'related'),
+('Physics', 'Materials Science', 'related'),
+('Astronomy', 'Astrophysics', 'related'),
+('Astronomy', 'Engineering Physics', 'related'),
+('Astronomy', 'Materials Science', 'related'),
+('Astrophysics', 'Engineering Physics', 'related'),
+('Astrophysics', 'Materials Science', 'related'),
+('Engineering Physics', 'Materials Science', 'related')
+ON CONFLICT (major1, major2) DO NOTHING;
+
 -- Insert sample major categories
 INSERT INTO major_categories (major, category, subcategory) VALUES
 ('Computer Science', 'STEM', 'Computer & Information Sciences'),
@@ -0,0 +1,15 @@
+-- 导师资料嵌入向量
+-- 导师写入或修改 description / learning_goals 时计算一次嵌入（app/core/mentor_embeddings.py），
+-- 各进程从这张表加载向量构建内存检索索引，匹配打分与 find_mentors_tool 不再逐次计算导师嵌入。
+-- text_hash 为嵌入文本的 SHA-1，文本未变化时不重新计算；model 不同的向量维度不同，加载时只读取当前模型的行。
+
+CREATE TABLE IF NOT EXISTS mentor_embeddings (
+    mentor_relationship_id BIGINT PRIMARY KEY REFERENCES mentorship_relationships(id) ON DELETE CASCADE,
+    model VARCHAR(100) NOT NULL,
+    text_hash CHAR(40) NOT NULL,
+    embedding REAL[] NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_mentor_embeddings_model
+    ON mentor_embeddings (model);
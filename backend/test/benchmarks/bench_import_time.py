@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+API 进程启动导入耗时基准测试
+在子进程中以 python -X importtime 导入 app.main，汇总总耗时、累计耗时最高的模块与按顶层包分组的自身耗时，
+并检查启动阶段是否导入了应按需加载的 AI 依赖（langchain / langgraph / openai / supabase 以及 v2 智能体系统）。
+超过 --max-ms 或导入了禁止的模块时以非零状态退出，可用于 CI 捕获启动耗时回退。
+
+用法:
+    python test/benchmarks/bench_import_time.py
+    python test/benchmarks/bench_import_time.py --runs 5 --max-ms 1500 --json import_time.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 启动阶段不应导入的模块（按需加载）
+DEFAULT_FORBIDDEN = [
+    "langchain",
+    "langchain_core",
+    "langgraph",
+    "openai",
+    "supabase",
+    "app.agents.v2.config",
+    "app.agents.v2.ai_foundation.agents.agent_factory",
+    "app.agents.v2.tools.study_tools",
+]
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)\s*$")
+
+
+def _child_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    # 基准测试不访问真实服务，仅需满足配置校验
+    env.setdefault("SUPABASE_URL", "https://benchmark.supabase.co")
+    env.setdefault("SUPABASE_KEY", "benchmark-key")
+    env.setdefault("OPENAI_API_KEY", "benchmark-key")
+    env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def parse_importtime(output: str) -> List[Dict]:
+    """解析 -X importtime 输出，返回 [{module, self_us, cumulative_us, depth}]"""
+    entries = []
+    for line in output.splitlines():
+        match = _LINE_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        entries.append({
+            "module": module,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            "depth": (len(indent) - 1) // 2,
+        })
+    return entries
+
+
+def measure_once(module: str) -> List[Dict]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        env=_child_env(),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        tail = "\n".join(result.stderr.strip().splitlines()[-10:])
+        raise RuntimeError(f"导入 {module} 失败:\n{tail}")
+    return parse_importtime(result.stderr)
+
+
+def summarize(entries: List[Dict], top: int) -> Dict:
+    total_us = sum(e["self_us"] for e in entries)
+    by_package: Dict[str, int] = defaultdict(int)
+    for e in entries:
+        parts = e["module"].split(".")
+        # app 内部按二级包分组（app.crud / app.api ...），第三方按顶层包分组
+        key = ".".join(parts[:2]) if parts[0] == "app" else parts[0]
+        by_package[key] += e["self_us"]
+
+    slowest = sorted(entries, key=lambda e: e["cumulative_us"], reverse=True)[:top]
+    packages = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "total_ms": total_us / 1000,
+        "module_count": len(entries),
+        "top_cumulative": [
+            {"module": e["module"], "cumulative_ms": e["cumulative_us"] / 1000, "self_ms": e["self_us"] / 1000}
+            for e in slowest
+        ],
+        "top_packages": [{"package": name, "self_ms": us / 1000} for name, us in packages],
+    }
+
+
+def find_forbidden(entries: List[Dict], forbidden: List[str]) -> List[str]:
+    loaded = {e["module"] for e in entries}
+    return [name for name in forbidden if name in loaded]
+
+
+def run_benchmark(module: str, runs: int, top: int, forbidden: List[str]) -> Dict:
+    # 第一次运行会写入 .pyc，不计入结果
+    measure_once(module)
+    samples = [measure_once(module) for _ in range(runs)]
+    totals = [sum(e["self_us"] for e in entries) / 1000 for entries in samples]
+    median_index = totals.index(sorted(totals)[len(totals) // 2])
+    report = summarize(samples[median_index], top)
+    report.update({
+        "module": module,
+        "runs": runs,
+        "total_ms_median": statistics.median(totals),
+        "total_ms_min": min(totals),
+        "total_ms_max": max(totals),
+        "forbidden_loaded": find_forbidden(samples[median_index], forbidden),
+    })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API 进程启动导入耗时基准测试")
+    parser.add_argument("--module", default="app.main", help="要导入的模块")
+    parser.add_argument("--runs", type=int, default=3, help="测量次数（取中位数）")
+    parser.add_argument("--top", type=int, default=15, help="输出耗时最高的模块 / 包数量")
+    parser.add_argument("--max-ms", type=float, default=None, help="导入总耗时上限（毫秒），超过时以非零状态退出")
+    parser.add_argument("--allow", action="append", default=[], help="允许在启动阶段导入的模块（可多次指定）")
+    parser.add_argument("--json", dest="json_path", default=None, help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    forbidden = [name for name in DEFAULT_FORBIDDEN if name not in args.allow]
+
+    print(f"🚀 启动导入耗时基准测试: import {args.module}")
+    report = run_benchmark(args.module, args.runs, args.top, forbidden)
+
+    print(f"📊 导入总耗时（中位数）: {report['total_ms_median']:.1f}ms "
+          f"(min {report['total_ms_min']:.1f}ms / max {report['total_ms_max']:.1f}ms，共 {report['module_count']} 个模块)")
+    print("\n🐢 累计耗时最高的模块:")
+    for item in report["top_cumulative"]:
+        print(f"   {item['cumulative_ms']:9.1f}ms  (自身 {item['self_ms']:7.1f}ms)  {item['module']}")
+    print("\n📦 按包分组的自身耗时:")
+    for item in report["top_packages"]:
+        print(f"   {item['self_ms']:9.1f}ms  {item['package']}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已写入 {args.json_path}")
+
+    failed = False
+    if report["forbidden_loaded"]:
+        failed = True
+        print(f"\n❌ 启动阶段导入了应按需加载的模块: {', '.join(report['forbidden_loaded'])}")
+    if args.max_ms is not None and report["total_ms_median"] > args.max_ms:
+        failed = True
+        print(f"\n❌ 导入总耗时 {report['total_ms_median']:.1f}ms 超过上限 {args.max_ms:.1f}ms")
+    if not failed:
+        print("\n✅ 启动导入检查通过")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
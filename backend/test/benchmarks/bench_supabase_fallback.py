@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+降级模式（Supabase 同步客户端）并发基准测试
+对比直接在 async 处理函数中调用同步 execute() 与通过 AsyncSupabaseAdapter 调用的总耗时，
+验证降级模式下并发请求不再被串行化。
+
+用法:
+    python test/benchmarks/bench_supabase_fallback.py --requests 50 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# 基准测试不访问真实服务，仅需满足配置校验
+os.environ.setdefault("SUPABASE_URL", "https://benchmark.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "benchmark-key")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-key")
+
+from app.core.supabase_adapter import AsyncSupabaseAdapter, shutdown_supabase_executor
+
+
+class _FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class _FakeQuery:
+    """模拟 postgrest 同步查询构建器，execute() 阻塞 latency 秒模拟一次 PostgREST 往返"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def eq(self, *args, **kwargs):
+        return self
+
+    def execute(self):
+        time.sleep(self.latency)
+        return _FakeResponse([{"id": 1}])
+
+
+class _FakeClient:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def table(self, name: str):
+        return _FakeQuery(self.latency)
+
+
+async def _blocking_handler(client: _FakeClient):
+    """旧写法：在 async 函数中直接调用同步 execute()"""
+    return client.table("users").select("id").eq("username", "bench").execute()
+
+
+async def _adapter_handler(client: AsyncSupabaseAdapter):
+    """新写法：通过适配器 await execute()"""
+    return await client.table("users").select("id").eq("username", "bench").execute()
+
+
+async def run_benchmark(requests: int, latency: float) -> dict:
+    sync_client = _FakeClient(latency)
+    async_client = AsyncSupabaseAdapter(sync_client)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[_blocking_handler(sync_client) for _ in range(requests)])
+    blocking_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*[_adapter_handler(async_client) for _ in range(requests)])
+    adapter_elapsed = time.perf_counter() - start
+
+    shutdown_supabase_executor()
+    return {
+        "requests": requests,
+        "latency": latency,
+        "blocking_seconds": blocking_elapsed,
+        "adapter_seconds": adapter_elapsed,
+        "speedup": blocking_elapsed / adapter_elapsed if adapter_elapsed else float("inf"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Supabase 降级模式并发基准测试")
+    parser.add_argument("--requests", type=int, default=50, help="并发请求数")
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟单次 PostgREST 往返耗时（秒）")
+    args = parser.parse_args()
+
+    print("🚀 Supabase 降级模式并发基准测试")
+    result = asyncio.run(run_benchmark(args.requests, args.latency))
+    print(f"📊 并发请求数: {result['requests']}，单次往返: {result['latency'] * 1000:.0f}ms")
+    print(f"🐢 同步 execute()（阻塞事件循环）: {result['blocking_seconds']:.3f}s")
+    print(f"⚡ AsyncSupabaseAdapter:            {result['adapter_seconds']:.3f}s")
+    print(f"📈 加速比: {result['speedup']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Test suite for trigram fuzzy matching
+Similarity values must agree with PostgreSQL pg_trgm so the SQL and Python scorers stay consistent
+"""
+
+import sys
+import os
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.fuzzy import TrigramIndex, similarity, trigrams, UNIVERSITY_SIMILARITY_THRESHOLD
+
+
+class TestTrigrams:
+    """pg_trgm compatible trigram extraction and similarity"""
+
+    def test_show_trgm_compatible(self):
+        # SELECT show_trgm('two words')
+        assert trigrams('two words') == {'  t', '  w', ' tw', ' wo', 'ds ', 'ord', 'rds', 'two', 'wo ', 'wor'}
+        assert trigrams('Two, Words!') == trigrams('two words')
+        assert trigrams('') == frozenset()
+
+        print("✅ Trigram extraction tests passed")
+
+    def test_similarity(self):
+        # SELECT similarity('word', 'two words') = 0.36363637
+        assert abs(similarity('word', 'two words') - 4 / 11) < 1e-9
+        assert similarity('MIT', 'MIT') == 1.0
+        assert similarity('', 'MIT') == 0.0
+        assert similarity('Stanford Univ', 'Stanford University') >= UNIVERSITY_SIMILARITY_THRESHOLD
+        assert similarity('Peking University', 'Tsinghua University') < UNIVERSITY_SIMILARITY_THRESHOLD
+
+        print("✅ Similarity tests passed")
+
+
+class TestTrigramIndex:
+    """Inverted trigram index"""
+
+    def test_search_matches_pairwise_similarity(self):
+        names = ['Stanford University', 'Stanford Univ', 'Peking University', 'Tsinghua University', 'MIT']
+        index = TrigramIndex()
+        for name in names:
+            index.add(name)
+        index.add('MIT')
+        assert len(index) == len(names)
+
+        for threshold in (0.3, 0.6):
+            expected = {name: similarity('Stanford University', name) for name in names
+                        if similarity('Stanford University', name) >= threshold}
+            assert index.search('Stanford University', threshold) == expected
+
+        print("✅ Trigram index tests passed")
@@ -0,0 +1,142 @@
+"""
+Test suite for the major taxonomy graph
+Relatedness and category lookups shared by the SQL and Python scorers
+"""
+
+import asyncio
+import sys
+import os
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.cache import query_cache
+from app.core.major_taxonomy import MajorTaxonomy, MajorTaxonomyManager
+from app.crud.crud_matching import match_scores_args
+from app.schemas.matching_schema import MatchingRequest
+
+
+def _taxonomy():
+    return MajorTaxonomy(
+        [('Computer Science', 'Software Engineering'), ('Computer Science', 'Data Science'),
+         ('Mathematics', 'Statistics'), ('Physics', 'Physics'), ('', 'Biology')],
+        [('Computer Science', 'STEM'), ('Physics', 'STEM'), ('Marketing', 'Business'), ('Finance', 'Business')],
+        source='tables',
+    )
+
+
+class TestMajorTaxonomyLookups:
+    """O(1) relatedness and category lookups"""
+
+    def test_are_related(self):
+        taxonomy = _taxonomy()
+        assert taxonomy.are_related('Computer Science', 'Software Engineering')
+        assert taxonomy.are_related('software engineering', 'COMPUTER SCIENCE')
+        assert not taxonomy.are_related('Software Engineering', 'Data Science')
+        assert not taxonomy.are_related('Physics', 'Physics')
+        assert not taxonomy.are_related('Unknown', 'Computer Science')
+        assert taxonomy.get_stats() == {'source': 'tables', 'majors': 8, 'categories': 2, 'relations': 3}
+
+        print("✅ Relatedness tests passed")
+
+    def test_categories(self):
+        taxonomy = _taxonomy()
+        assert taxonomy.share_category('Computer Science', 'physics')
+        assert not taxonomy.share_category('Computer Science', 'Marketing')
+        assert not taxonomy.share_category('Software Engineering', 'Computer Science')
+
+        assert taxonomy.related_to(['Computer Science', 'Unknown']) == {'software engineering', 'data science'}
+        assert taxonomy.same_category_as(['Marketing']) == {'marketing', 'finance'}
+        assert taxonomy.same_category_as(['Statistics']) == frozenset()
+
+        print("✅ Category tests passed")
+
+    def test_builtin_groups(self):
+        taxonomy = MajorTaxonomy.builtin()
+        assert taxonomy.source == 'builtin'
+        assert taxonomy.are_related('Computer Science', 'Artificial Intelligence')
+        # Majors in the same group are related to each other
+        assert taxonomy.are_related('Software Engineering', 'Data Science')
+        assert taxonomy.are_related('Statistics', 'Data Science')
+        assert not taxonomy.are_related('Computer Science', 'Biology')
+
+        print("✅ Built-in taxonomy tests passed")
+
+
+class TestMatchScoresArgs:
+    """SQL parameters derived from the taxonomy"""
+
+    def test_sql_args(self):
+        request = MatchingRequest(target_universities=['MIT'], target_majors=['Computer Science'], degree_level='master')
+        args = match_scores_args(request, _taxonomy())
+        assert args[:5] == (['MIT'], ['Computer Science'], 'master', None, [])
+        assert args[5] == ['data science', 'software engineering']
+        assert args[6] == ['computer science', 'physics']
+
+        print("✅ SQL argument tests passed")
+
+
+class TestMajorTaxonomyManager:
+    """Reloading after the reference tables change"""
+
+    def test_get_waits_for_reload_after_table_change(self):
+        async def run():
+            manager = MajorTaxonomyManager()
+
+            async def fake_reload():
+                await asyncio.sleep(0.01)
+                await manager.load({'type': 'asyncpg', 'connection': FakeConnection()})
+
+            manager._reload = fake_reload
+            await manager.load({'type': 'asyncpg', 'connection': FakeConnection()})
+            assert manager.current.are_related('Computer Science', 'Physics')
+
+            FakeConnection.relations = [{'major1': 'Computer Science', 'major2': 'Statistics'}]
+            await query_cache.invalidate('major_relations')
+            # The new graph is returned by the same call that noticed the change
+            taxonomy = await manager.get()
+            assert taxonomy.are_related('Computer Science', 'Statistics')
+            assert not taxonomy.are_related('Computer Science', 'Physics')
+
+        FakeConnection.relations = [{'major1': 'Computer Science', 'major2': 'Physics'}]
+        asyncio.run(run())
+
+        print("✅ Reload-on-change tests passed")
+
+    def test_get_reloads_again_after_change_during_reload(self):
+        async def run():
+            manager = MajorTaxonomyManager()
+            release = asyncio.Event()
+
+            async def fake_reload():
+                await manager.load({'type': 'asyncpg', 'connection': FakeConnection()})
+                await release.wait()
+
+            manager._reload = fake_reload
+            await manager.load({'type': 'asyncpg', 'connection': FakeConnection()})
+
+            FakeConnection.relations = [{'major1': 'Computer Science', 'major2': 'Statistics'}]
+            await query_cache.invalidate('major_relations')
+            pending = asyncio.ensure_future(manager.get())
+            while not manager.current.are_related('Computer Science', 'Statistics'):
+                await asyncio.sleep(0)
+
+            # The tables change again after the running reload has already read them
+            FakeConnection.relations = [{'major1': 'Computer Science', 'major2': 'Mathematics'}]
+            await query_cache.invalidate('major_relations')
+            release.set()
+            taxonomy = await pending
+            assert taxonomy.are_related('Computer Science', 'Mathematics')
+            assert not taxonomy.are_related('Computer Science', 'Statistics')
+
+        FakeConnection.relations = [{'major1': 'Computer Science', 'major2': 'Physics'}]
+        asyncio.run(run())
+
+        print("✅ Reload-after-stale-reload tests passed")
+
+
+class FakeConnection:
+    relations = []
+
+    async def fetch(self, query):
+        return self.relations if 'major_relations' in query else []
@@ -0,0 +1,95 @@
+"""
+Test suite for semantic mentor retrieval
+Checks that the vectorized top-k search agrees with pairwise cosine similarity and that updates apply
+"""
+
+import sys
+import os
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.core.mentor_embeddings import EmbeddingIndex, _normalize, profile_text, text_hash
+
+
+def _index(vectors):
+    ids = list(range(1, len(vectors) + 1))
+    return EmbeddingIndex.from_rows(ids, [f"h{i}" for i in ids], _normalize(vectors))
+
+
+class TestEmbeddingIndexSearch:
+    """Top-k inner product search"""
+
+    def test_top_k_matches_pairwise_cosine(self):
+        rng = np.random.default_rng(7)
+        vectors = rng.normal(size=(500, 32))
+        index = _index(vectors)
+        query = _normalize(rng.normal(size=32))[0]
+
+        cosines = _normalize(vectors) @ query
+        expected = {int(i) + 1 for i in np.argsort(-cosines)[:10] if cosines[i] > 0}
+        results = index.search(query, 10)
+        assert set(results) == expected
+        for mentor_id, score in results.items():
+            assert abs(score - cosines[mentor_id - 1]) < 1e-5
+
+        assert len(index.search(query, 1000)) == int((cosines > 0).sum())
+        assert index.search(query, 0) == {}
+        assert index.search(np.ones(8, dtype=np.float32), 10) == {}
+
+        print("✅ Top-k search tests passed")
+
+    def test_normalize_keeps_zero_vectors(self):
+        matrix = _normalize([[3.0, 4.0], [0.0, 0.0]])
+        assert np.allclose(matrix, [[0.6, 0.8], [0.0, 0.0]])
+
+        index = _index([[1.0, 0.0], [0.0, 0.0]])
+        assert index.size == 1
+        assert index.dim == 2
+
+        print("✅ Normalization tests passed")
+
+
+class TestEmbeddingIndexUpdates:
+    """Incremental updates"""
+
+    def test_upsert_and_remove(self):
+        index = _index([[1.0, 0.0], [0.0, 1.0]])
+        query = np.array([1.0, 0.0], dtype=np.float32)
+        assert list(index.search(query, 1)) == [1]
+
+        index.upsert(3, _normalize([1.0, 0.1])[0], "h3")
+        index.upsert(1, _normalize([0.0, 1.0])[0], "h1b")
+        assert list(index.search(query, 1)) == [3]
+        assert index.hashes[1] == "h1b"
+
+        index.remove(3)
+        assert index.size == 2
+        assert 3 not in index.search(query, 10)
+
+        for mentor_id in range(4, 40):
+            index.upsert(mentor_id, _normalize([0.5, 0.5])[0], "h")
+        assert index.size == 38
+
+        print("✅ Incremental update tests passed")
+
+    def test_empty_index(self):
+        index = EmbeddingIndex.from_rows([], [], np.zeros((0, 0), dtype=np.float32))
+        assert index.size == 0
+        assert index.search(np.ones(4, dtype=np.float32), 5) == {}
+
+        print("✅ Empty index tests passed")
+
+
+class TestProfileText:
+    """Text embedded for each mentor profile"""
+
+    def test_profile_text(self):
+        row = {'description': '  Stanford  CS  PhD ', 'learning_goals': 'ML research\napplications', 'title': 'ignored'}
+        assert profile_text(row) == 'Stanford CS PhD\nML research applications'
+        assert profile_text({'description': None, 'learning_goals': '  '}) == ''
+        assert text_hash('a') == text_hash('a') != text_hash('b')
+
+        print("✅ Profile text tests passed")
@@ -0,0 +1,145 @@
+"""
+Test suite for the in-memory mentor matching index
+Checks that vectorized scoring matches the MATCH_SCORES SQL semantics and that incremental updates apply
+"""
+
+import sys
+import os
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.major_taxonomy import MajorTaxonomy
+from app.core.mentor_index import MentorIndex
+from app.schemas.matching_schema import MatchingRequest
+
+
+def _mentor(mentor_id, university, major, degree_level="master", rating=4.5, total_sessions=10,
+            languages=None, specialties=None, university_ranking=1, verification_status="verified"):
+    return {
+        'id': mentor_id,
+        'university': university,
+        'major': major,
+        'degree_level': degree_level,
+        'rating': rating,
+        'total_sessions': total_sessions,
+        'languages': languages or ['English'],
+        'specialties': specialties or [],
+        'university_ranking': university_ranking,
+        'verification_status': verification_status,
+        'username': f'mentor{mentor_id}',
+    }
+
+
+def _build_index(mentors):
+    index = MentorIndex()
+    index.rankings = {'Stanford University': 2.0, 'MIT': 1.0, 'Peking University': 18.0, 'Uni Far': 300.0}
+    index.taxonomy = MajorTaxonomy(
+        [('Computer Science', 'Software Engineering')],
+        [('Computer Science', 'STEM'), ('Physics', 'STEM'), ('Marketing', 'Business')],
+    )
+    for mentor in mentors:
+        index.upsert(dict(mentor))
+    return index
+
+
+class TestMentorIndexScoring:
+    """Vectorized scoring components"""
+
+    def test_component_scores(self):
+        index = _build_index([
+            _mentor(1, 'Stanford University', 'Computer Science'),           # exact / exact
+            _mentor(2, 'Stanford', 'Software Engineering', 'phd'),           # partial / related / adjacent
+            _mentor(3, 'MIT', 'Physics', 'bachelor', total_sessions=60),     # same tier / category
+            _mentor(4, 'Uni Far', 'Computer Science Education', None, rating=None, total_sessions=0),  # keyword
+        ])
+        request = MatchingRequest(
+            target_universities=['Stanford University'],
+            target_majors=['Computer Science'],
+            degree_level='master',
+            preferred_languages=['English'],
+            service_categories=[],
+        )
+        results = {m['id']: m for m in index.score(request)}
+
+        assert results[1]['university_match'] == 0.3 and results[1]['major_match'] == 0.25
+        assert results[2]['university_match'] == 0.2 and results[2]['major_match'] == 0.18
+        assert results[2]['degree_match'] == 0.1
+        assert results[3]['university_match'] == 0.15 and results[3]['major_match'] == 0.12
+        assert results[3]['degree_match'] == 0.05 and results[3]['experience_bonus'] == 0.05
+        assert results[4]['university_match'] == 0.0 and results[4]['major_match'] == 0.08
+        assert results[4]['rating_score'] == 0.0
+
+        total = sum(results[1][name] for name in (
+            'university_match', 'major_match', 'degree_match', 'rating_score',
+            'language_match', 'experience_bonus', 'specialty_bonus'))
+        assert abs(results[1]['total_score'] - total) < 1e-9
+
+        print("✅ Component score tests passed")
+
+    def test_ordering_and_limit(self):
+        mentors = [_mentor(i, 'MIT', 'Physics', rating=(i % 5) + 0.5, total_sessions=i) for i in range(120)]
+        index = _build_index(mentors)
+        request = MatchingRequest(target_universities=['MIT'], target_majors=['Physics'], degree_level='master')
+        results = index.score(request)
+
+        assert len(results) == 50
+        keys = [(m['total_score'], m['rating'], m['total_sessions']) for m in results]
+        assert keys == sorted(keys, reverse=True)
+
+        print("✅ Ordering tests passed")
+
+    def test_language_preference(self):
+        index = _build_index([
+            _mentor(1, 'MIT', 'Physics', languages=['Chinese']),
+            _mentor(2, 'MIT', 'Physics', languages=['English']),
+        ])
+        no_preference = MatchingRequest(target_universities=['MIT'], target_majors=['Physics'], degree_level='master')
+        chinese = MatchingRequest(target_universities=['MIT'], target_majors=['Physics'], degree_level='master',
+                                  preferred_languages=['Chinese'])
+
+        assert all(m['language_match'] == 0.1 for m in index.score(no_preference))
+        scores = {m['id']: m['language_match'] for m in index.score(chinese)}
+        assert scores == {1: 0.1, 2: 0.0}
+
+        print("✅ Language preference tests passed")
+
+
+class TestMentorIndexSemantic:
+    """Semantic similarity component"""
+
+    def test_semantic_component(self):
+        index = _build_index([_mentor(1, 'MIT', 'Physics'), _mentor(2, 'MIT', 'Physics'), _mentor(3, 'MIT', 'Physics')])
+        request = MatchingRequest(target_universities=['MIT'], target_majors=['Physics'], degree_level='master')
+
+        plain = {m['id']: m for m in index.score(request)}
+        assert all(m['semantic_match'] == 0.0 for m in plain.values())
+
+        results = index.score(request, semantic={3: 0.08, 99: 0.1})
+        assert results[0]['id'] == 3
+        assert results[0]['semantic_match'] == 0.08
+        assert abs(results[0]['total_score'] - plain[3]['total_score'] - 0.08) < 1e-9
+
+        print("✅ Semantic component tests passed")
+
+
+class TestMentorIndexUpdates:
+    """Incremental updates"""
+
+    def test_upsert_and_unverify(self):
+        index = _build_index([_mentor(1, 'MIT', 'Physics'), _mentor(2, 'MIT', 'Physics')])
+        request = MatchingRequest(target_universities=['Stanford University'], target_majors=['Computer Science'],
+                                  degree_level='master')
+
+        index.upsert(_mentor(2, 'Stanford University', 'Computer Science'))
+        assert index.score(request)[0]['id'] == 2
+
+        index.upsert(_mentor(2, 'Stanford University', 'Computer Science', verification_status='pending'))
+        assert index.size == 1
+        assert [m['id'] for m in index.score(request)] == [1]
+
+        index.remove(1)
+        assert index.size == 0
+        assert index.score(request) == []
+
+        print("✅ Incremental update tests passed")
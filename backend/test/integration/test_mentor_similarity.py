@@ -0,0 +1,139 @@
+"""
+Test suite for the offline mentor similarity matrix
+Checks the sparse build against dense cosine similarity and the in-memory top-k lookups
+"""
+
+import asyncio
+import sys
+import os
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.core.mentor_similarity import SimilarityMatrix, build_similarity, mentor_similarity, save_similarity
+from app.crud.crud_matching import get_similar_background_mentors
+
+
+def _interactions(seed=3, students=40, mentors=25, density=0.15):
+    rng = np.random.default_rng(seed)
+    dense = np.where(rng.random((students, mentors)) < density, rng.integers(1, 4, (students, mentors)), 0).astype(float)
+    s, m = np.nonzero(dense)
+    # Student ids 100.., mentor ids 500..; split each weight into two rows to exercise aggregation
+    student_ids = np.concatenate([s, s]) + 100
+    mentor_ids = np.concatenate([m, m]) + 500
+    weights = np.concatenate([dense[s, m] / 2, dense[s, m] / 2])
+    return dense, student_ids, mentor_ids, weights
+
+
+class TestSimilarityBuild:
+    """Sparse build matches dense computation"""
+
+    def test_mentor_similarity_matches_dense_cosine(self):
+        dense, student_ids, mentor_ids, weights = _interactions()
+        arrays = build_similarity(student_ids, mentor_ids, weights, k=5)
+        matrix = SimilarityMatrix(arrays)
+
+        active = dense.any(axis=0)
+        normalized = dense[:, active] / np.linalg.norm(dense[:, active], axis=0)
+        cosine = normalized.T @ normalized
+        np.fill_diagonal(cosine, 0)
+        mentor_keys = np.nonzero(active)[0] + 500
+
+        for row, mentor_id in enumerate(mentor_keys):
+            results = matrix.similar_mentors(int(mentor_id), 5)
+            expected = np.sort(cosine[row][cosine[row] > 0])[::-1][:5]
+            assert np.allclose([score for _, score in results], expected, atol=1e-5)
+            for other, score in results:
+                assert abs(cosine[row, list(mentor_keys).index(other)] - score) < 1e-5
+
+        print("✅ Mentor similarity tests passed")
+
+    def test_student_recommendations(self):
+        dense, student_ids, mentor_ids, weights = _interactions()
+        matrix = SimilarityMatrix(build_similarity(student_ids, mentor_ids, weights, k=5))
+
+        for student in range(dense.shape[0]):
+            seen = set(np.nonzero(dense[student])[0] + 500)
+            results = matrix.recommend(student + 100, 10)
+            scores = [score for _, score in results]
+            assert scores == sorted(scores, reverse=True)
+            # Mentors the student already interacted with are never recommended
+            assert not seen & {mentor_id for mentor_id, _ in results}
+
+        assert matrix.recommend(99999, 10) == []
+
+        print("✅ Student recommendation tests passed")
+
+    def test_verified_filter_and_empty_input(self):
+        _, student_ids, mentor_ids, weights = _interactions()
+        verified = [500, 501, 502]
+        matrix = SimilarityMatrix(build_similarity(student_ids, mentor_ids, weights, verified_ids=verified, k=10))
+        for mentor_id in range(500, 525):
+            assert {other for other, _ in matrix.similar_mentors(mentor_id, 10)} <= set(verified)
+
+        empty = SimilarityMatrix(build_similarity([], [], [], k=5))
+        assert empty.recommend(1, 5) == []
+        assert empty.get_stats()['mentor_pairs'] == 0
+
+        print("✅ Verified filter tests passed")
+
+
+class TestSimilarityLookup:
+    """Top-k lookups walk the stored rows"""
+
+    def test_exclude_and_round_trip(self, tmp_path):
+        # Students 1 and 2 share mentors 10 and 11; student 3 only knows mentor 10
+        arrays = build_similarity([1, 1, 2, 2, 2, 3], [10, 11, 10, 11, 12, 10], [1, 1, 1, 1, 1, 1], k=5)
+        path = str(tmp_path / 'similarity.npz')
+        save_similarity(arrays, path)
+        matrix = SimilarityMatrix.load(path)
+
+        assert [mentor_id for mentor_id, _ in matrix.recommend(3, 5)] == [11, 12]
+        assert [mentor_id for mentor_id, _ in matrix.recommend(3, 5, exclude_ids=[11])] == [12]
+        assert [mentor_id for mentor_id, _ in matrix.recommend(3, 1)] == [11]
+        assert matrix.recommend(3, 0) == []
+        assert [mentor_id for mentor_id, _ in matrix.similar_mentors(12, 5)] == [11, 10]
+        assert matrix.get_stats()['students'] == 3
+
+        print("✅ Lookup tests passed")
+
+
+class TestSimilarBackgroundMentors:
+    """Short histories are topped up from the background query"""
+
+    def test_short_history_fills_page(self, monkeypatch):
+        # Student 1 has a sparse neighbourhood: the matrix only yields mentor 12
+        matrix = SimilarityMatrix(build_similarity([1, 1, 2, 2, 3], [10, 11, 10, 12, 10], [1, 1, 1, 1, 1], k=5))
+        assert [mentor_id for mentor_id, _ in matrix.recommend(1, 5)] == [12]
+
+        async def get():
+            return matrix
+        monkeypatch.setattr(mentor_similarity, 'get', get)
+
+        def ids(conn, limit, exclude_ids=None):
+            mentors = asyncio.run(get_similar_background_mentors({'type': 'asyncpg', 'connection': conn}, 1, limit, exclude_ids))
+            return [mentor['id'] for mentor in mentors]
+
+        verified = {10, 11, 12, 13, 14, 15}
+        assert ids(FakeConnection(verified), 5) == [12, 10, 11, 13, 14]
+        assert ids(FakeConnection(verified), 5, [10]) == [12, 11, 13, 14, 15]
+        # Recommended mentors that are no longer verified are replaced, never repeated
+        assert ids(FakeConnection(verified - {12}), 5) == [10, 11, 13, 14, 15]
+
+        print("✅ Short history top-up tests passed")
+
+
+class FakeConnection:
+    def __init__(self, verified):
+        self.verified = verified
+
+    async def fetch(self, query, *args):
+        if 'mr.id = ANY($1)' in query:
+            return [{'id': mentor_id} for mentor_id in args[0] if mentor_id in self.verified]
+        exclude = set(args[3]) if 'ALL($4)' in query else set()
+        return [{'id': mentor_id} for mentor_id in sorted(self.verified) if mentor_id not in exclude][:args[-1]]
+
+    async def fetchrow(self, query, *args):
+        return {'target_universities': ['MIT'], 'target_majors': ['Computer Science'], 'target_degree': 'master'}
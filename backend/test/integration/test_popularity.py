@@ -0,0 +1,80 @@
+"""
+Test suite for the popular mentor leaderboard
+Ordering, time decay, incremental updates and exclusion by walking the sorted list
+"""
+
+import sys
+import os
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.popularity import Leaderboard, decay
+
+DAY = 86400.0
+
+
+def _board(now=0.0, weight=0.5):
+    rows = [
+        {'id': 1, 'rating': 4.8, 'total_sessions': 20, 'activity': 0},
+        {'id': 2, 'rating': 4.5, 'total_sessions': 50, 'activity': 2},
+        {'id': 3, 'rating': 4.5, 'total_sessions': 80, 'activity': 0},
+        {'id': 4, 'rating': None, 'total_sessions': None, 'activity': None},
+    ]
+    return Leaderboard.from_rows(rows, half_life_seconds=14 * DAY, weight=weight, now=now)
+
+
+class TestLeaderboardOrdering:
+    """Score ordering and time decay"""
+
+    def test_initial_order(self):
+        board = _board()
+        # 4.5 + 0.5 * 2 outranks 4.8; equal scores fall back to total sessions
+        assert board.top(10) == [2, 1, 3, 4]
+        assert board.size == 4
+        assert board.top(0) == []
+
+        print("✅ Ordering tests passed")
+
+    def test_decay_and_rescore(self):
+        assert decay(14 * DAY, 14 * DAY) == 0.5
+        assert decay(-5, 14 * DAY) == 1.0
+
+        board = _board()
+        # Two half-lives later mentor 2's activity bonus is 0.25 < 0.3
+        board.rescore(28 * DAY)
+        assert board.top(2) == [1, 2]
+
+        print("✅ Decay tests passed")
+
+
+class TestLeaderboardUpdates:
+    """Incremental updates and exclusion"""
+
+    def test_record_review_and_session(self):
+        board = _board()
+        assert board.record(3, 0.0, session=True)
+        assert board.entries[3].total_sessions == 81
+        assert board.top(3) == [2, 3, 1]
+
+        # A review only adds activity; the rating is left to the next reload
+        assert board.record(1, 0.0)
+        assert board.entries[1].rating == 4.8
+        assert board.top(10) == [2, 1, 3, 4]
+
+        assert not board.record(99, 0.0, session=True)
+        assert sorted(board.order) == board.order and len(board.order) == len(board.keys) == 4
+
+        print("✅ Incremental update tests passed")
+
+    def test_exclude_and_remove(self):
+        board = _board()
+        assert board.top(2, exclude_ids=[2]) == [1, 3]
+        assert board.top(10, exclude_ids={1, 2, 3, 4}) == []
+
+        board.remove(2)
+        board.remove(42)
+        assert board.top(10) == [1, 3, 4]
+        assert 2 not in board.keys
+
+        print("✅ Exclusion tests passed")